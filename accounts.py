@@ -0,0 +1,71 @@
+"""
+accounts.py
+
+Account work that runs as jobs (jobs.py) instead of on the login path:
+
+* ``queue_rehash`` stores the new hash ``passwords.verify`` made for an
+  outdated one. The ``rehash_password`` job writes it only if the stored hash
+  is still the one that was checked, so a password changed in the meantime
+  wins. It is keyed by user, so repeated logins queue it once.
+* ``audit`` records a login, logout or deletion in ``audit_log``. The time and
+  address are taken from the request; the ``audit_log`` job only inserts
+  the row.
+
+Both add their job to the caller's transaction; the caller commits.
+"""
+
+import uuid
+from datetime import datetime
+
+from flask import has_request_context, request
+
+from db import db, dialect_insert
+from jobs import job_queue, task
+from models import AuditLogModel, UserModel
+
+
+def queue_rehash(user, new_hash):
+    return job_queue.enqueue(
+        "rehash_password",
+        {"user_id": user.id, "old_hash": user.pwd, "new_hash": new_hash},
+        key=f"rehash_password:{user.id}",
+    )
+
+
+def audit(event, user_id):
+    return job_queue.enqueue(
+        "audit_log",
+        {
+            "id": uuid.uuid4().hex,
+            "event": event,
+            "user_id": user_id,
+            "remote_addr": request.remote_addr if has_request_context() else None,
+            "at": datetime.utcnow().isoformat(),
+        },
+    )
+
+
+@task("rehash_password")
+def rehash_password_job(user_id, old_hash, new_hash):
+    user = db.session.get(UserModel, user_id)
+    if user is None or user.pwd != old_hash:
+        return {"rehashed": False}
+    user.pwd = new_hash
+    db.session.commit()
+    return {"rehashed": True}
+
+
+@task("audit_log")
+def audit_log_job(id, event, user_id, remote_addr, at):
+    db.session.execute(
+        dialect_insert(AuditLogModel.__table__)
+        .values(
+            id=id,
+            event=event,
+            user_id=user_id,
+            remote_addr=remote_addr,
+            created_at=datetime.fromisoformat(at),
+        )
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+    db.session.commit()
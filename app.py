@@ -1,28 +1,32 @@
-from flask import Flask, jsonify, render_template, url_for, redirect, session, request, flash
-from flask_smorest import Api
-from passlib.hash import pbkdf2_sha256
-from flask_jwt_extended import create_access_token
 import os
-from flask_jwt_extended import jwt_manager, JWTManager
-from flask_migrate import Migrate
+
 from dotenv import load_dotenv
-from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
-from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager
 
 from db import db
+from engine import configure_engine, engine_profile
+from routing import configure_replicas, read_routing
 from blocklist import BLOCKLIST
-import models
-
-from models import UserModel
-from models import HabitModel
-from schemas import UserSchema, HabitSchema
-from resources.user import UserLogin
+from passwords import passwords
+from ratelimit import login_limiter
+from identity import identity_cache
+from dashboard_cache import dashboard_cache
+from jobs import job_queue
+from purge import user_purge
+from rollups import rollups
+from search import habit_search
+from profiling import profiler
+from openapi import Api
 
 from resources.habit import blp as HabitBlueprint
 from resources.user import blp as UserBlueprint
-from forms import LoginForm, RegisterForm
+from resources.export import blp as ExportBlueprint
+from resources.analytics import blp as AnalyticsBlueprint
+from resources.jobs import blp as JobsBlueprint
+from commands import register_commands
 
-def create_app(db_url=None): 
+def create_app(db_url=None, config=None): 
     app = Flask(__name__)
     load_dotenv()
 
@@ -36,22 +40,52 @@ def create_app(db_url=None):
     app.config["OPENAPI_SWAGGER_UI_PATH"] = "/swagger-ui"
     app.config["OPENAPI_SWAGGER_UI_URL"] = "https://cdn.jsdelivr.net/npm/swagger-ui-dist/"
     app.config["SQLALCHEMY_DATABASE_URI"] = db_url or os.getenv("DATABASE_URL", "sqlite:///data.db")
+    # Comma-separated read replicas of DATABASE_URL, see routing.py.
+    app.config["DATABASE_REPLICA_URLS"] = os.getenv("DATABASE_REPLICA_URLS", "")
+    # Comma-separated ids of the users who may search every account's habits.
+    app.config["SEARCH_STAFF_USER_IDS"] = os.getenv("SEARCH_STAFF_USER_IDS", "")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    
+    if config:
+        app.config.update(config)
+    # The HTML pages and Flask-Migrate are only imported when wanted; the
+    # flask CLI (``flask db upgrade``) always gets Migrate.
+    app.config.setdefault("HTML_ENABLED", True)
+    app.config.setdefault("MIGRATE_ENABLED", os.environ.get("FLASK_RUN_FROM_CLI") == "true")
+    # Job worker threads per process (gunicorn worker), see jobs.py.
+    app.config.setdefault("JOBS_WORKERS", int(os.getenv("JOBS_WORKERS", "2")))
+    # Pre-generated document (``flask openapi write``), relative to the instance folder.
+    app.config.setdefault("OPENAPI_SPEC_FILE", os.getenv("OPENAPI_SPEC_FILE"))
+
+    configure_engine(app)
+    configure_replicas(app)
     db.init_app(app)
-    migrate = Migrate(app, db)
+    engine_profile.init_app(app)
+    read_routing.init_app(app)
+    BLOCKLIST.init_app(app)
+    passwords.init_app(app)
+    login_limiter.init_app(app)
+    identity_cache.init_app(app)
+    dashboard_cache.init_app(app)
+    job_queue.init_app(app)
+    user_purge.init_app(app)
+    rollups.init_app(app)
+    habit_search.init_app(app)
+    profiler.init_app(app)
+    if app.config["MIGRATE_ENABLED"]:
+        from flask_migrate import Migrate
+        Migrate(app, db)
     api = Api(app)
     api.register_blueprint(HabitBlueprint)
     api.register_blueprint(UserBlueprint)
+    api.register_blueprint(ExportBlueprint)
+    api.register_blueprint(AnalyticsBlueprint)
+    api.register_blueprint(JobsBlueprint)
+    register_commands(app)
 
     app.config["JWT_SECRET_KEY"] = "uros"
     app.config["SECRET_KEY"] = "KEY"
     jwt = JWTManager(app)   
 
-    login_manager = LoginManager()
-    login_manager.init_app(app)
-    login_manager.login_view = "login"
-
     @jwt.token_in_blocklist_loader
     def check_if_token_in_blocklist(jwt_header, jwt_payload):
         return jwt_payload["jti"] in BLOCKLIST
@@ -105,90 +139,8 @@ def create_app(db_url=None):
             401,
         )
 
-    with app.app_context():
-        #db.create_all()
-        pass
-
-    @login_manager.user_loader
-    def load_user(user_id):
-        return UserModel.query.get_or_404(user_id)
-
-    @app.route("/")
-    def base():
-        return redirect(url_for('loginUser'))
-
-    @app.route('/register_user', methods=["GET","POST"])
-    def registerUser():
-        form = RegisterForm()
-        if form.validate_on_submit():
-            hashed_pwd = pbkdf2_sha256.hash(form.pwd.data)
-            user = UserModel(username = form.username.data, pwd = hashed_pwd)
-            try:
-                db.session.add(user)
-                db.session.commit()
-            except IntegrityError:
-                abort(400, message="User with that name alredy exists.")
-            except SQLAlchemyError:
-                abort(500, message="Cant add user.")
-            print(user)
-            return redirect(url_for('loginUser'))
-        return render_template("register_page.html", form=form)
-
-    @app.route('/login_user', methods=["GET","POST"])
-    def loginUser():
-        form = LoginForm()
-        if form.validate_on_submit():
-            user = UserModel.query.filter(UserModel.username == form.username.data).first()
-            if user and pbkdf2_sha256.verify(form.pwd.data, user.pwd):
-                login_user(user)
-                print("Form data: ", form.data)
-                session['access_token'] = create_access_token(identity=user.id)
-                return redirect(url_for('dashboard'))
-        return render_template('login_page.html', form=form)
-
-    def is_logged_in():
-        return 'access_token' in session
-
-    @app.route('/dashboard', methods=['GET', 'POST'])
-    def dashboard():
-        if is_logged_in():
-            user_name = current_user.username
-            user_id = current_user.id
-            habits = HabitModel.query.filter_by(user_id=user_id).all()
-
-            if request.method == 'POST':
-                if 'delete' in request.form:
-                    habit_id = request.form.get('habit_id')
-                    habit = HabitModel.query.get(habit_id)
-                    if habit and habit.user_id == user_id:
-                        db.session.delete(habit)
-                        db.session.commit()
-                
-                elif 'update' in request.form:
-                    habit_id = request.form.get('habit_id')
-                    checked = request.form.get('checked')
-                    habit = HabitModel.query.get(habit_id)
-                    if habit and habit.user_id == user_id:
-                        habit.checked = checked
-                        db.session.commit()
-
-                elif 'add' in request.form:
-                    habit_name = request.form.get('habit_name')
-                    new_habit = HabitModel(name=habit_name, checked='No', user_id=user_id)
-                    db.session.add(new_habit)
-                    db.session.commit()
-
-                return redirect(url_for('dashboard'))
-
-            return render_template('dashboard.html', habits=habits, user_name=user_name)
-        else:
-            return redirect(url_for('loginUser'))
-
-    @app.route('/logout', methods=['GET', 'POST'])
-    @login_required
-    def logout_button():
-        logout_user()
-        session.pop('access_token', None)
-        return redirect(url_for('loginUser'))
+    if app.config["HTML_ENABLED"]:
+        from views import init_views
+        init_views(app)
 
     return app
\ No newline at end of file
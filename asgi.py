@@ -0,0 +1,217 @@
+"""
+asgi.py
+
+Async serving mode:
+
+    uvicorn --factory asgi:create_asgi_app --workers 4
+
+Listing, reading and creating habits (``GET /habit``, ``GET /habit/<id>``,
+``POST /habit``), ``POST /register`` and ``POST /login`` are served by the
+coroutines in async_views.py on SQLAlchemy's async engine (aiosqlite or
+asyncpg for ``DATABASE_URL``, see engine.py), so a request waiting on the
+database or on a password hash holds no thread. They run in a request context
+of the same app, with its before/after request hooks and error handlers.
+Async requests always use the primary; read replicas (routing.py) only serve
+the sync views.
+
+Every other request (the rest of both blueprints, the HTML pages) is handed
+to the Flask app as WSGI on a pool of ``ASGI_THREADS`` threads per worker,
+once its body has arrived. The thread pool, the hashing pool and both engines
+are shut down with the server through the ASGI lifespan protocol.
+"""
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from async_views import VIEWS
+from db import db
+from engine import async_engine_options, async_engine_url, install_sqlite_pragmas
+from profiling import watch_engine
+
+
+def build_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+        environ["REMOTE_PORT"] = str(scope["client"][1])
+    for name, value in scope["headers"]:
+        name = name.decode("latin1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = f"HTTP_{name.upper().replace('-', '_')}"
+        value = value.decode("latin1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def read_body(receive):
+    """The whole request body, or None if the client went away."""
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body.extend(message.get("body", b""))
+        if not message.get("more_body"):
+            return bytes(body)
+
+
+def start_message(status, headers):
+    return {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers],
+    }
+
+
+class AsgiApp:
+    def __init__(self, app):
+        self.app = app
+        self.engine = create_async_engine(async_engine_url(app), **async_engine_options(app))
+        if self.engine.dialect.name == "sqlite":
+            install_sqlite_pragmas(self.engine.sync_engine, app.config)
+        if app.config["PROFILING_ENABLED"]:
+            watch_engine(self.engine.sync_engine)
+        # Loaded rows stay usable after commit; a lazy refresh can't be awaited.
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+    async def http(self, scope, receive, send):
+        body = await read_body(receive)
+        if body is None:
+            return
+        environ = build_environ(scope, body)
+        view, view_args = self.match(environ)
+        if view is None:
+            await self.run_wsgi(environ, send)
+            return
+
+        status, headers, chunks = await self.dispatch(view, view_args, environ)
+        await send(start_message(status, headers))
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    def match(self, environ):
+        adapter = self.app.create_url_adapter(self.app.request_class(environ))
+        try:
+            endpoint, view_args = adapter.match()
+        except HTTPException:
+            return None, None
+        return VIEWS.get((endpoint, environ["REQUEST_METHOD"])), view_args
+
+    async def dispatch(self, view, view_args, environ):
+        # A fresh app context, so db.session gets a scope of its own.
+        with self.app.app_context(), self.app.request_context(environ):
+            async with self.sessions() as session:
+                db.session.registry.set(session.sync_session)
+                try:
+                    response = await self.full_dispatch(view, view_args, session)
+                finally:
+                    db.session.registry.clear()
+            chunks, status, headers = response.get_wsgi_response(environ)
+            return int(status.split(" ", 1)[0]), headers, list(chunks)
+
+    async def full_dispatch(self, view, view_args, session):
+        # Flask.full_dispatch_request, awaiting the view.
+        app = self.app
+        try:
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = await view(session, **view_args)
+            response = app.make_response(rv)
+        except Exception as exc:
+            response = app.make_response(app.handle_user_exception(exc))
+        return app.process_response(response)
+
+    async def run_wsgi(self, environ, send):
+        loop = asyncio.get_running_loop()
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        await loop.run_in_executor(self.executor, self.wsgi, environ, send_from_thread)
+
+    def wsgi(self, environ, send):
+        response = []
+
+        def start_response(status, headers, exc_info=None):
+            response[:] = [int(status.split(" ", 1)[0]), headers]
+
+        chunks = self.app(environ, start_response)
+        try:
+            started = False
+            for chunk in chunks:
+                if not started:
+                    send(start_message(*response))
+                    started = True
+                if chunk:
+                    send({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not started:
+                send(start_message(*response))
+            send({"type": "http.response.body", "body": b""})
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.executor = ThreadPoolExecutor(
+                    self.app.config["ASGI_THREADS"], thread_name_prefix="asgi"
+                )
+                asyncio.get_running_loop().set_default_executor(self.executor)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def shutdown(self):
+        self.app.extensions["passwords"].shutdown()
+        await self.engine.dispose()
+        with self.app.app_context():
+            db.engine.dispose()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+def create_asgi_app(db_url=None, config=None):
+    app = create_app(db_url, config)
+    app.config.setdefault("ASGI_THREADS", int(os.getenv("ASGI_THREADS", 32)))
+    return AsgiApp(app)
@@ -0,0 +1,172 @@
+"""
+async_views.py
+
+Coroutine versions of the busiest REST endpoints, served by asgi.py: listing,
+reading and creating habits, registering and logging in. Each answers like
+the view in resources/ it stands in for (same arguments, schemas, ETags,
+status codes, error bodies and side effects); ``VIEWS`` is keyed by that
+view's endpoint and method.
+
+The statements a view makes itself are awaited on an ``AsyncSession``.
+Helpers shared with the sync views and written against ``db.session`` (the
+ETag tags, rollups, the job queue, the token blocklist behind
+``verify_jwt_in_request``) go through ``sync``, i.e.
+``AsyncSession.run_sync``: asgi.py points ``db.session`` at the async
+session's sync facade for the request, so their queries run on the async
+connection as well, and a helper called without ``sync`` fails instead of
+blocking the event loop. Password hashes are awaited on the hashing pool.
+"""
+
+import asyncio
+
+from flask import jsonify, request
+from flask_jwt_extended import (
+    create_access_token,
+    create_refresh_token,
+    get_jwt_identity,
+    verify_jwt_in_request,
+)
+from flask_smorest import Blueprint, abort
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from accounts import audit, queue_rehash
+from dashboard_cache import dashboard_cache
+from etags import collection_tag, etag_headers, row_version
+from loading import eager_options
+from models import HabitModel, UserModel
+from pagination import keyset_filter, keyset_split, page_size
+from passwords import passwords
+from ratelimit import login_limiter
+from rollups import rollups
+from schemas import HabitListArgsSchema, HabitPageSchema, HabitSchema, UserSchema
+
+VIEWS = {}
+
+
+def view(endpoint, method):
+    def register(func):
+        VIEWS[endpoint, method] = func
+        return func
+
+    return register
+
+
+def sync(session, func, *args):
+    return session.run_sync(lambda _: func(*args))
+
+
+def parse(schema, location):
+    # The parser behind ``blp.arguments``, so errors are the same 422 body.
+    return Blueprint.ARGUMENTS_PARSER.parse(schema, location=location)
+
+
+async def load_habit(session, habit_id, refresh=False):
+    return await session.get(
+        HabitModel,
+        habit_id,
+        options=eager_options(HabitModel, HabitSchema()),
+        populate_existing=refresh,
+    )
+
+
+async def verify_password(session, user, pwd):
+    valid, new_hash = await passwords.verify_async(pwd, user.pwd)
+    if valid and new_hash:
+        await sync(session, queue_rehash, user, new_hash)
+    return valid
+
+
+@view("Habits.Habit", "GET")
+async def get_habit(session, habit_id):
+    await sync(session, verify_jwt_in_request)
+    version = await sync(session, row_version, HabitModel, habit_id)
+    if version is None:
+        abort(404)
+    headers = etag_headers("habit", habit_id, version)
+    habit = await load_habit(session, habit_id)
+    if habit is None:
+        abort(404)
+    return jsonify(HabitSchema().dump(habit)), 200, headers
+
+
+@view("Habits.HabitList", "GET")
+async def list_habits(session):
+    await sync(session, verify_jwt_in_request)
+    args = parse(HabitListArgsSchema(), "query")
+    user_id = get_jwt_identity()
+    tag = await sync(session, collection_tag, HabitModel, HabitModel.user_id == user_id)
+    headers = etag_headers("habits", user_id, args.get("cursor"), args.get("limit"), tag)
+    limit = page_size(args.get("limit"))
+    stmt = keyset_filter(
+        select(HabitModel)
+        .options(*eager_options(HabitModel, HabitSchema()))
+        .where(HabitModel.user_id == user_id),
+        HabitModel.id,
+        args.get("cursor"),
+        limit,
+    )
+    habits, next_cursor = keyset_split((await session.scalars(stmt)).all(), HabitModel.id, limit)
+    return jsonify(HabitPageSchema().dump({"habits": habits, "next": next_cursor})), 200, headers
+
+
+@view("Habits.HabitList", "POST")
+async def create_habit(session):
+    await sync(session, verify_jwt_in_request)
+    habit = HabitModel(**parse(HabitSchema(), "json"))
+
+    try:
+        session.add(habit)
+        await session.flush()
+        await sync(session, rollups.habits_added, HabitModel.id == habit.id)
+        await session.commit()
+    except SQLAlchemyError:
+        abort(500, message="Error when inserting habit")
+    dashboard_cache.invalidate(habit.user_id)
+
+    habit = await load_habit(session, habit.id, refresh=True)
+    return jsonify(HabitSchema().dump(habit)), 201
+
+
+@view("Users.UserRegister", "POST")
+async def register(session):
+    user_data = parse(UserSchema(), "json")
+    user = UserModel(
+        username=user_data["username"],
+        pwd=await passwords.hash_async(user_data["pwd"]),
+    )
+    try:
+        session.add(user)
+        await session.commit()
+    except IntegrityError:
+        abort(400, message="User with that name alredy exists.")
+    except SQLAlchemyError:
+        abort(500, message="Cant add user.")
+    return jsonify(UserSchema().dump(user)), 201
+
+
+@view("Users.UserLogin", "POST")
+async def login(session):
+    user_data = parse(UserSchema(), "json")
+    # The limiter's SQLite file is local but may wait on its write lock.
+    retry_after = await asyncio.to_thread(
+        login_limiter.retry_after, user_data["username"], request.remote_addr
+    )
+    if retry_after:
+        abort(
+            429,
+            message="Too many login attempts.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    user = await session.scalar(
+        select(UserModel).where(UserModel.username == user_data["username"])
+    )
+    if user and await verify_password(session, user, user_data["pwd"]):
+        await sync(session, audit, "login", user.id)
+        await session.commit()
+        access_token = create_access_token(identity=user.id, fresh=True)
+        refresh_token = create_refresh_token(identity=user.id)
+        return {"access_token": access_token, "refresh_token": refresh_token}
+
+    abort(401, message="Invalid user credentials")
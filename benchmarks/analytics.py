@@ -0,0 +1,172 @@
+"""
+Time the analytics aggregates computed ad hoc against reading the rollups.
+
+Seeds ``--users`` accounts with ``--habits`` habits each (names drawn from a
+small vocabulary) and ``--checkins`` days of history per habit, rebuilds the
+rollups, then times each aggregate both ways. Also reports what keeping the
+rollups current adds to a single check-in.
+
+    python -m benchmarks.analytics --users 1000 --habits 10 --checkins 30
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import case, distinct, func, insert, select
+
+from app import create_app
+from db import db
+from models import (
+    DayRollupModel,
+    HabitCheckinModel,
+    HabitDayRollupModel,
+    HabitModel,
+    HabitNameRollupModel,
+    HabitsPerUserRollupModel,
+    UserModel,
+)
+from rollups import rollups
+
+NAMES = ["read", "run", "stretch", "meditate", "journal", "walk", "water", "sleep early"]
+START = date(2024, 1, 1)
+
+
+def seed(users, habits, checkins):
+    user_ids = db.session.scalars(
+        insert(UserModel).returning(UserModel.id),
+        [{"username": f"user{number}", "pwd": "x"} for number in range(users)],
+    ).all()
+    habit_ids = db.session.scalars(
+        insert(HabitModel).returning(HabitModel.id),
+        [
+            {"name": NAMES[(user_id + number) % len(NAMES)], "checked": "No", "user_id": user_id}
+            for user_id in user_ids
+            # Uneven habit counts, so the distribution has more than one bucket.
+            for number in range(1 + user_id % habits)
+        ],
+    ).all()
+    rows = [
+        {"habit_id": habit_id, "day": START + timedelta(days=day), "running_total": day + 1}
+        for habit_id in habit_ids
+        for day in range(checkins)
+    ]
+    for offset in range(0, len(rows), 50000):
+        db.session.execute(insert(HabitCheckinModel), rows[offset:offset + 50000])
+    db.session.commit()
+    return habit_ids
+
+
+def adhoc(day):
+    per_user = (
+        select(HabitModel.user_id, func.count().label("habits"))
+        .group_by(HabitModel.user_id)
+        .subquery()
+    )
+    return {
+        "days": select(
+            HabitCheckinModel.day, func.count(distinct(HabitModel.user_id)), func.count()
+        )
+        .join(HabitModel)
+        .where(HabitCheckinModel.day.between(day - timedelta(days=29), day))
+        .group_by(HabitCheckinModel.day),
+        "completions": select(HabitModel.name, func.count())
+        .join(HabitCheckinModel)
+        .where(HabitCheckinModel.day == day)
+        .group_by(HabitModel.name)
+        .order_by(func.count().desc())
+        .limit(20),
+        "habit-names": select(
+            HabitModel.name, func.count(), func.sum(case((HabitModel.checked == "Yes", 1), else_=0))
+        )
+        .group_by(HabitModel.name)
+        .order_by(func.count().desc())
+        .limit(20),
+        "habits-per-user": select(per_user.c.habits, func.count()).group_by(per_user.c.habits),
+    }
+
+
+def from_rollups(day):
+    return {
+        "days": select(DayRollupModel).where(DayRollupModel.day.between(day - timedelta(days=29), day)),
+        "completions": select(HabitDayRollupModel)
+        .where(HabitDayRollupModel.day == day)
+        .order_by(HabitDayRollupModel.completions.desc())
+        .limit(20),
+        "habit-names": select(HabitNameRollupModel).order_by(HabitNameRollupModel.habits.desc()).limit(20),
+        "habits-per-user": select(HabitsPerUserRollupModel),
+    }
+
+
+def timed(statement, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        db.session.execute(statement).all()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def checkin_ms(habit_ids, enabled, repeat):
+    db.session.expunge_all()
+    total = 0.0
+    for habit_id in habit_ids[:repeat]:
+        habit = db.session.get(HabitModel, habit_id)
+        day = START - timedelta(days=1 if enabled else 2)
+        start = time.perf_counter()
+        if habit.check_in(day) and enabled:
+            rollups.checkin(habit, day)
+        db.session.commit()
+        total += time.perf_counter() - start
+    return total * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--habits", type=int, default=10, help="most habits of one user")
+    parser.add_argument("--checkins", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app(
+            f"sqlite:///{os.path.join(workdir, 'analytics.db')}",
+            {"BLOCKLIST_BACKEND": "memory", "HTML_ENABLED": False},
+        )
+        with app.app_context():
+            db.create_all()
+            habit_ids = seed(args.users, args.habits, args.checkins)
+            start = time.perf_counter()
+            rollups.rebuild()
+            db.session.commit()
+            results = {"rebuild_ms": (time.perf_counter() - start) * 1000, "queries": {}}
+
+            day = START + timedelta(days=args.checkins - 1)
+            for (name, slow), fast in zip(adhoc(day).items(), from_rollups(day).values()):
+                results["queries"][name] = {
+                    "adhoc_ms": timed(slow, args.repeat),
+                    "rollup_ms": timed(fast, args.repeat),
+                }
+            results["checkin_ms"] = {
+                "without_rollups": checkin_ms(habit_ids, False, args.repeat),
+                "with_rollups": checkin_ms(habit_ids, True, args.repeat),
+            }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"rebuild: {results['rebuild_ms']:.1f} ms")
+    for name, times in results["queries"].items():
+        print(f"{name:>16}: ad hoc {times['adhoc_ms']:8.2f} ms, rollup {times['rollup_ms']:6.2f} ms")
+    checkin = results["checkin_ms"]
+    print(
+        f"         checkin: {checkin['without_rollups']:.2f} ms without rollups, "
+        f"{checkin['with_rollups']:.2f} ms with"
+    )
+
+
+if __name__ == "__main__":
+    main()
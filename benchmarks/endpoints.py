@@ -0,0 +1,250 @@
+"""
+Latency and throughput benchmark for the REST and HTML endpoints.
+
+Builds the app with ``create_app`` against a seeded SQLite file and drives it
+through the Flask test client, so no server or network is involved. For every
+scenario it reports p50/p99 latency and requests per second. Results can be
+saved as a JSON baseline and later runs compared against it; ``--compare``
+exits with status 1 when a scenario got slower than ``--threshold`` allows.
+
+    python -m benchmarks.endpoints --save baseline.json
+    python -m benchmarks.endpoints --compare baseline.json --threshold 0.25
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import insert
+
+from app import create_app
+from db import db
+from models import HabitModel, UserModel
+from passwords import passwords
+from stats import percentile
+
+PASSWORD = "benchmark"
+
+
+def summarize(samples, elapsed):
+    return {
+        "requests": len(samples),
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99),
+        "rps": len(samples) / elapsed,
+    }
+
+
+def measure(app, request, repeat, concurrency, prepare=None, login=None):
+    """Time ``request(client, arg)`` ``repeat`` times. ``prepare()`` builds
+    each ``arg`` and ``login(client)`` sets up each worker's client up front,
+    so neither is measured."""
+    with app.app_context():
+        args = [prepare() if prepare else None for _ in range(repeat)]
+    chunks = [args[worker::concurrency] for worker in range(concurrency)]
+
+    def run(chunk):
+        client = app.test_client()
+        if login:
+            login(client)
+        samples = []
+        for arg in chunk:
+            start = time.perf_counter()
+            response = request(client, arg)
+            samples.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(itertools.chain.from_iterable(pool.map(run, chunks)))
+    return summarize(samples, time.perf_counter() - start)
+
+
+def seed_user(username, habits=0):
+    user = UserModel(username=username, pwd=passwords.hash(PASSWORD))
+    db.session.add(user)
+    db.session.flush()
+    for offset in range(0, habits, 10000):
+        db.session.execute(
+            insert(HabitModel),
+            [
+                {"name": f"habit {number}", "checked": "No", "user_id": user.id}
+                for number in range(offset, min(habits, offset + 10000))
+            ],
+        )
+    db.session.commit()
+    return user.id
+
+
+def auth(user_id):
+    return {"Authorization": f"Bearer {create_access_token(identity=user_id, fresh=True)}"}
+
+
+def new_habit(user_id):
+    habit = HabitModel(name="benchmark", checked="No", user_id=user_id)
+    db.session.add(habit)
+    db.session.commit()
+    return habit.id
+
+
+def scenarios(user_id, list_users, dashboard_id):
+    """Yield ``(name, prepare, request, login)`` for every scenario."""
+    usernames = (f"bench{number}" for number in itertools.count())
+
+    def with_new_habit():
+        return auth(user_id), new_habit(user_id)
+
+    yield "register", None, lambda c, _: c.post(
+        "/register", json={"username": next(usernames), "pwd": PASSWORD}
+    ), None
+    yield "login", None, lambda c, _: c.post(
+        "/login", json={"username": "benchuser", "pwd": PASSWORD}
+    ), None
+    yield "refresh", lambda: {
+        "Authorization": f"Bearer {create_refresh_token(identity=user_id)}"
+    }, lambda c, headers: c.post("/refresh", headers=headers), None
+
+    yield "habit_create", lambda: auth(user_id), lambda c, headers: c.post(
+        "/habit", json={"name": "benchmark", "checked": "No", "user_id": user_id}, headers=headers
+    ), None
+    yield "habit_get", with_new_habit, lambda c, arg: c.get(
+        f"/habit/{arg[1]}", headers=arg[0]
+    ), None
+    yield "habit_update", with_new_habit, lambda c, arg: c.put(
+        f"/habit/{arg[1]}", json={"name": "renamed", "checked": "Yes"}, headers=arg[0]
+    ), None
+    yield "habit_delete", with_new_habit, lambda c, arg: c.delete(
+        f"/habit/{arg[1]}", headers=arg[0]
+    ), None
+    for size, list_user in list_users.items():
+        yield f"habit_list_{size}", lambda list_user=list_user: auth(list_user), lambda c, headers: c.get(
+            "/habit", query_string={"limit": 100}, headers=headers
+        ), None
+
+    login_form = {"username": "benchdash", "pwd": PASSWORD}
+
+    def login(client):
+        client.post("/login_user", data=login_form)
+
+    def form(action):
+        return lambda c, habit_id: c.post(
+            "/dashboard",
+            data={action: "1", "habit_id": habit_id, "checked": "Yes", "habit_name": "new"},
+        )
+
+    yield "dashboard_login", None, lambda c, _: c.post("/login_user", data=login_form), None
+    yield "dashboard_view", None, lambda c, _: c.get("/dashboard"), login
+    yield "dashboard_add", None, form("add"), login
+    yield "dashboard_update", lambda: new_habit(dashboard_id), form("update"), login
+    yield "dashboard_delete", lambda: new_habit(dashboard_id), form("delete"), login
+
+
+def run(args, workdir):
+    path = os.path.join(workdir, "bench.db")
+    app = create_app(
+        f"sqlite:///{path}",
+        {
+            "BLOCKLIST_BACKEND": "memory",
+            "LOGIN_RATELIMIT_ENABLED": False,
+            "PASSWORD_HASH_ROUNDS": args.rounds,
+            "PASSWORD_HASH_WORKERS": 0,
+            "WTF_CSRF_ENABLED": False,
+        },
+    )
+    with app.app_context():
+        db.create_all()
+        user_id = seed_user("benchuser")
+        dashboard_id = seed_user("benchdash", args.dashboard_habits)
+        list_users = {size: seed_user(f"list{size}", size) for size in args.sizes}
+        db.session.remove()
+
+    results = {}
+    for name, prepare, request, login in scenarios(user_id, list_users, dashboard_id):
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(app, request, args.repeat, args.concurrency, prepare, login)
+    return results
+
+
+def compare(baseline, results, threshold, min_delta_ms=0.5):
+    """Return ``(name, metric, old, new)`` for every metric that regressed."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            old, new = previous[metric], current[metric]
+            if new > old * (1 + threshold) and new - old > min_delta_ms:
+                regressions.append((name, metric, old, new))
+        if current["rps"] < previous["rps"] / (1 + threshold):
+            regressions.append((name, "rps", previous["rps"], current["rps"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--dashboard-habits", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=1000, help="pbkdf2 rounds for register/login")
+    parser.add_argument("--only", nargs="+", help="run only these scenarios")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args, workdir)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "concurrency": args.concurrency,
+            "rounds": args.rounds,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, result in results.items():
+            print(
+                f"{name:>20}: p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                f"{result['rps']:9.1f} req/s"
+            )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for key in ("concurrency", "rounds"):
+            if baseline["meta"].get(key) != report["meta"][key]:
+                print(f"warning: baseline was run with a different --{key}", file=sys.stderr)
+        regressions = compare(baseline["results"], results, args.threshold)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old:.2f} -> {new:.2f}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
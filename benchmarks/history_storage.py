@@ -0,0 +1,138 @@
+"""
+Compare the two habit history storage modes ("rows" and "bitmap").
+
+Seeds one SQLite file per mode with the same synthetic history, then reports
+the on-disk size and the latency of the queries the API runs on it.
+
+    python -m benchmarks.history_storage --habits 200 --days 730
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert, text
+
+import bitset
+from app import create_app
+from db import db
+from models import HabitModel, HabitCheckinModel, HabitCheckinBitmapModel, UserModel
+
+
+def seed(mode, habits, days, density, today):
+    user = UserModel(username="benchmark", pwd="x")
+    db.session.add(user)
+    db.session.flush()
+
+    rnd = random.Random(42)
+    first_day = today - timedelta(days=days - 1)
+    for number in range(habits):
+        completed = [
+            first_day + timedelta(days=offset)
+            for offset in range(days)
+            if rnd.random() < density
+        ]
+        habit = HabitModel(
+            name=f"habit {number}", checked="No", user_id=user.id, history_storage=mode
+        )
+        db.session.add(habit)
+        db.session.flush()
+
+        if mode == "rows":
+            if completed:
+                db.session.execute(
+                    insert(HabitCheckinModel),
+                    [
+                        {"habit_id": habit.id, "day": day, "running_total": total}
+                        for total, day in enumerate(completed, 1)
+                    ],
+                )
+        else:
+            years = {}
+            for day in completed:
+                years[day.year] = years.get(day.year, 0) | 1 << bitset.day_index(day)
+            if years:
+                db.session.execute(
+                    insert(HabitCheckinBitmapModel),
+                    [
+                        {"habit_id": habit.id, "year": year, "bits": bitset.from_int(value)}
+                        for year, value in years.items()
+                    ],
+                )
+        habit.recount()
+    db.session.commit()
+    return user.id
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(samples), "max_ms": max(samples)}
+
+
+def run_mode(mode, args, workdir):
+    path = os.path.join(workdir, f"{mode}.db")
+    app = create_app(f"sqlite:///{path}", {"BLOCKLIST_BACKEND": "memory"})
+    today = date.today()
+    with app.app_context():
+        db.create_all()
+        user_id = seed(mode, args.habits, args.days, args.density, today)
+        db.session.execute(text("VACUUM"))
+
+        table = "habit_checkins" if mode == "rows" else "habit_checkin_bitmaps"
+        rows = db.session.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        habits = HabitModel.query.filter_by(user_id=user_id).all()
+
+        result = {
+            "mode": mode,
+            "history_rows": rows,
+            "file_bytes": os.path.getsize(path),
+            "stats_30d": timed(lambda: HabitModel.stats_for_user(user_id, 30, today), args.repeat),
+            "stats_365d": timed(lambda: HabitModel.stats_for_user(user_id, 365, today), args.repeat),
+            "year_summaries": timed(
+                lambda: [habit.year_summary(today.year) for habit in habits], args.repeat
+            ),
+            "full_history": timed(lambda: [habit.history.days() for habit in habits], args.repeat),
+        }
+        db.session.remove()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=200)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--density", type=float, default=0.7)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run_mode(mode, args, workdir) for mode in ("rows", "bitmap")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.habits} habits x {args.days} days, density {args.density}")
+    for result in results:
+        print(
+            f"{result['mode']:>6}: {result['history_rows']:>8} rows "
+            f"{result['file_bytes'] / 1024:>9.0f} KiB | "
+            + " | ".join(
+                f"{name} {result[name]['median_ms']:.1f} ms"
+                for name in ("stats_30d", "stats_365d", "year_summaries", "full_history")
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
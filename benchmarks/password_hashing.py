@@ -0,0 +1,76 @@
+"""
+Microbenchmark for password verification cost.
+
+For each pbkdf2 rounds setting, reports how many logins (one verify each)
+a single core sustains, and the throughput through the hashing process pool.
+
+    python -m benchmarks.password_hashing --rounds 10000 29000 100000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from passwords import DEFAULT_ROUNDS, crypt_context, _verify
+
+
+def single_core(rounds, seconds):
+    hashed = crypt_context(rounds).hash("benchmark-password")
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        crypt_context(rounds).verify("benchmark-password", hashed)
+        done += 1
+    elapsed = time.perf_counter() - start
+    return done / elapsed, elapsed / done * 1000
+
+
+def pooled(rounds, workers, logins):
+    hashed = crypt_context(rounds).hash("benchmark-password")
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        # Warm the workers up so process start-up is not measured.
+        list(pool.map(_verify, [rounds] * workers, ["x"] * workers, [hashed] * workers))
+        start = time.perf_counter()
+        list(pool.map(
+            _verify, [rounds] * logins, ["benchmark-password"] * logins, [hashed] * logins
+        ))
+        return logins / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10000, DEFAULT_ROUNDS, 100000, 300000])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    results = []
+    for rounds in args.rounds:
+        per_core, latency = single_core(rounds, args.seconds)
+        logins = max(args.workers, int(per_core * args.seconds))
+        results.append({
+            "rounds": rounds,
+            "logins_per_sec_per_core": per_core,
+            "verify_ms": latency,
+            "pool_workers": args.workers,
+            "pool_logins_per_sec": pooled(rounds, args.workers, logins),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(
+            f"rounds {result['rounds']:>7}: {result['logins_per_sec_per_core']:8.1f} logins/s/core "
+            f"({result['verify_ms']:.2f} ms each), pool of {result['pool_workers']}: "
+            f"{result['pool_logins_per_sec']:8.1f} logins/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Time habit name search against a plain scan of the names.
+
+Seeds ``--habits`` habits spread over ``--users`` accounts, with names made of
+two or three words from a small vocabulary plus a numbered suffix. Each query
+is timed through ``habit_search.search`` and as a plain ``LIKE '%query%'``
+scan (no fuzzy matching), over every account and over one user's habits.
+Also reports what inserting and renaming a habit costs with the index kept
+current.
+
+    python -m benchmarks.search --habits 1000000 --users 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import func, insert, select, update
+
+from app import create_app
+from db import db
+from models import HabitModel, UserModel
+from search import habit_search
+
+WORDS = [
+    "morning", "evening", "read", "reading", "run", "walk", "stretch", "meditate",
+    "journal", "water", "sleep", "early", "practice", "guitar", "piano", "spanish",
+    "french", "code", "review", "floss", "vitamins", "gym", "yoga", "cook",
+]
+QUERIES = {
+    "exact": "read",
+    "prefix": "medit",
+    "substring": "itar",
+    "typo": "meditaet",
+    "two words": "morning walk",
+    "short": "gy",
+}
+
+
+def seed(users, habits):
+    rng = random.Random(0)
+    user_ids = db.session.scalars(
+        insert(UserModel).returning(UserModel.id),
+        [{"username": f"user{number}", "pwd": "x"} for number in range(users)],
+    ).all()
+    for offset in range(0, habits, 50000):
+        db.session.execute(
+            insert(HabitModel),
+            [
+                {
+                    "name": " ".join(rng.sample(WORDS, rng.randint(2, 3))) + f" {number % 97}",
+                    "checked": "No",
+                    "user_id": user_ids[number % users],
+                }
+                for number in range(offset, min(habits, offset + 50000))
+            ],
+        )
+    db.session.commit()
+    return user_ids
+
+
+def timed(run, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def scan(query, *criteria):
+    return db.session.execute(
+        select(HabitModel.id, HabitModel.name)
+        .where(*criteria, HabitModel.name.ilike(f"%{query}%"))
+        .order_by(func.length(HabitModel.name), HabitModel.id)
+        .limit(50)
+    ).all()
+
+
+def write_ms(user_id, repeat):
+    total = 0.0
+    for number in range(repeat):
+        start = time.perf_counter()
+        habit_id = db.session.scalar(
+            insert(HabitModel)
+            .values(name=f"benchmark {number}", checked="No", user_id=user_id)
+            .returning(HabitModel.id)
+        )
+        db.session.execute(
+            update(HabitModel).where(HabitModel.id == habit_id).values(name=f"renamed {number}")
+        )
+        db.session.commit()
+        total += time.perf_counter() - start
+    return total * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app(
+            f"sqlite:///{os.path.join(workdir, 'search.db')}",
+            {"BLOCKLIST_BACKEND": "memory", "HTML_ENABLED": False, "JOBS_WORKERS": 0},
+        )
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            user_ids = seed(args.users, args.habits)
+            results = {"seed_s": time.perf_counter() - start, "queries": {}}
+            owner = user_ids[0]
+            for name, query in QUERIES.items():
+                results["queries"][name] = {
+                    "all_search_ms": timed(lambda: habit_search.search(query), args.repeat),
+                    "all_scan_ms": timed(lambda: scan(query), args.repeat),
+                    "user_search_ms": timed(lambda: habit_search.search(query, owner), args.repeat),
+                    "user_scan_ms": timed(
+                        lambda: scan(query, HabitModel.user_id == owner), args.repeat
+                    ),
+                    "results": len(habit_search.search(query, limit=100)[0]),
+                }
+            results["write_ms"] = write_ms(user_ids[0], args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"seeded {args.habits} habits in {results['seed_s']:.1f} s")
+    for name, times in results["queries"].items():
+        print(
+            f"{name:>10}: all users search {times['all_search_ms']:7.2f} ms, "
+            f"scan {times['all_scan_ms']:7.2f} ms; one user search {times['user_search_ms']:6.2f} ms, "
+            f"scan {times['user_scan_ms']:6.2f} ms; {times['results']} results"
+        )
+    print(f"insert + rename: {results['write_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compare the compiled dump path (serializers.py) with plain marshmallow.
+
+Seeds a SQLite file with one user per habit, loads the rows the way the list
+endpoints do (with the eager-loading options derived from the schema) and
+times dumping them with each path, plus the JSON encoding of the result.
+
+    python -m benchmarks.serialization --rows 10000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from flask import json as flask_json
+from sqlalchemy import insert
+
+from app import create_app
+from db import db
+from loading import eager_options
+from models import HabitModel, UserModel
+from schemas import HabitSchema, UserSchema
+from serializers import CompiledSchema
+
+
+def seed(rows):
+    db.session.execute(
+        insert(UserModel), [{"username": f"user{i}", "pwd": "x"} for i in range(rows)]
+    )
+    db.session.execute(
+        insert(HabitModel),
+        [{"name": f"habit {i}", "checked": "No", "user_id": i + 1} for i in range(rows)],
+    )
+    db.session.commit()
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def compare(schema, objects, repeat):
+    result = {}
+    for mode, compiled in (("marshmallow", False), ("compiled", True)):
+        CompiledSchema.compiled = compiled
+        try:
+            dumped = schema.dump(objects)
+            result[f"{mode}_dump_ms"] = timed(lambda: schema.dump(objects), repeat)
+            result[f"{mode}_total_ms"] = timed(
+                lambda: flask_json.dumps(schema.dump(objects)), repeat
+            )
+        finally:
+            CompiledSchema.compiled = True
+        if mode == "marshmallow":
+            expected = dumped
+        elif dumped != expected:
+            raise AssertionError("compiled output differs from marshmallow")
+    result["speedup"] = result["marshmallow_dump_ms"] / result["compiled_dump_ms"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app(
+            f"sqlite:///{os.path.join(workdir, 'serialization.db')}",
+            {"BLOCKLIST_BACKEND": "memory", "HTML_ENABLED": False},
+        )
+        with app.app_context():
+            db.create_all()
+            seed(args.rows)
+            for name, model, schema in (
+                ("habits", HabitModel, HabitSchema(many=True)),
+                ("users", UserModel, UserSchema(many=True)),
+            ):
+                objects = model.query.options(*eager_options(model, schema)).all()
+                results[name] = {"rows": len(objects), **compare(schema, objects, args.repeat)}
+            db.session.remove()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results.items():
+        print(
+            f"{name:>7} x{result['rows']}: dump {result['marshmallow_dump_ms']:8.1f} -> "
+            f"{result['compiled_dump_ms']:7.1f} ms ({result['speedup']:.1f}x)  "
+            f"dump+json {result['marshmallow_total_ms']:8.1f} -> {result['compiled_total_ms']:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Compare the sync (gunicorn) and async (uvicorn, asgi.py) serving modes side by side.
+
+Seeds a SQLite file, starts each server on it as a subprocess and drives it
+with many concurrent keep-alive connections from an asyncio client, reporting
+throughput, p50/p99 latency and failed requests per concurrency level. The
+request is ``GET /habit``, which uvicorn serves with a coroutine on the async
+engine (async_views.py) and gunicorn with the sync view.
+
+    python -m benchmarks.serving --concurrency 100 250 500 1000 --seconds 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from benchmarks.endpoints import seed_user
+from db import db
+from stats import percentile
+
+SERVERS = {
+    "gunicorn": lambda port, args: [
+        "gunicorn", "--workers", str(args.workers), "--bind", f"127.0.0.1:{port}",
+        "--backlog", "4096", "app:create_app()",
+    ],
+    "uvicorn": lambda port, args: [
+        "uvicorn", "--factory", "asgi:create_asgi_app", "--workers", str(args.workers),
+        "--host", "127.0.0.1", "--port", str(port), "--backlog", "4096", "--log-level", "warning",
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+async def connection(port, request, deadline, samples, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+            length = int(head.split("content-length:")[1].split("\r\n")[0]) if "content-length:" in head else 0
+            await reader.readexactly(length)
+            samples.append((time.perf_counter() - start) * 1000)
+            if not head.startswith("http/1.1 200"):
+                errors.append(head.split("\r\n")[0])
+            if "connection: close" in head:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError) as exc:
+            errors.append(type(exc).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def load(port, request, concurrency, seconds):
+    samples, errors = [], []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(
+        connection(port, request, deadline, samples, errors) for _ in range(concurrency)
+    ))
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "rps": len(samples) / seconds,
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99),
+        "mean_ms": statistics.fmean(samples) if samples else None,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--servers", nargs="+", choices=SERVERS, default=list(SERVERS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[100, 250, 500, 1000])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--habits", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db_url = f"sqlite:///{os.path.join(workdir, 'serving.db')}"
+        app = create_app(db_url, {"BLOCKLIST_BACKEND": "memory"})
+        with app.app_context():
+            db.create_all()
+            user_id = seed_user("benchuser", args.habits)
+            token = create_access_token(identity=user_id)
+        request = (
+            f"GET /habit HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {token}\r\n\r\n"
+        ).encode()
+
+        env = {**os.environ, "DATABASE_URL": db_url}
+        for server in args.servers:
+            port = free_port()
+            process = subprocess.Popen(
+                SERVERS[server](port, args), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_for(port)
+                for concurrency in args.concurrency:
+                    result = asyncio.run(load(port, request, concurrency, args.seconds))
+                    results.append({"server": server, "workers": args.workers, **result})
+                    if not args.json:
+                        print(
+                            f"{server:>8} x{concurrency:<5} {result['rps']:8.1f} req/s  "
+                            f"p50 {result['p50_ms'] or 0:8.1f} ms  p99 {result['p99_ms'] or 0:8.1f} ms  "
+                            f"errors {result['errors']}",
+                            flush=True,
+                        )
+            finally:
+                process.terminate()
+                process.wait()
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Cold-start benchmark: how long a fresh worker takes to import the app and run
+``create_app``.
+
+Every run is a new interpreter started with ``-X importtime``, so nothing is
+cached between runs. Reports the median import and ``create_app`` times and
+the packages whose modules cost the most to import. With ``--budget-ms`` it
+exits with status 1 when the median total goes over the budget.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --api-only --budget-ms 400
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app(None, json.loads(sys.argv[1]))
+created = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "create_app_ms": (created - imported) * 1000}))
+"""
+
+
+def parse_importtime(stderr):
+    """Self time in microseconds per top-level package from ``-X importtime``."""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|", 2)
+        if not own.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own)
+    return packages
+
+
+def measure(config, workdir):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}"}
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, json.dumps(config)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["packages"] = parse_importtime(process.stderr)
+    return result
+
+
+def summarize(runs, top=15):
+    packages = {}
+    for run in runs:
+        for name, micros in run["packages"].items():
+            packages.setdefault(name, []).append(micros / 1000)
+    slowest = sorted(
+        ((name, statistics.median(times)) for name, times in packages.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    create_app_ms = statistics.median(run["create_app_ms"] for run in runs)
+    return {
+        "runs": len(runs),
+        "import_ms": import_ms,
+        "create_app_ms": create_app_ms,
+        "total_ms": import_ms + create_app_ms,
+        "top_packages": [{"package": name, "ms": ms} for name, ms in slowest[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15, help="number of packages to list")
+    parser.add_argument("--api-only", action="store_true", help="build the app with HTML_ENABLED off")
+    parser.add_argument("--migrate", action="store_true", help="build the app with MIGRATE_ENABLED on")
+    parser.add_argument("--budget-ms", type=float, help="fail when the median total exceeds this")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    config = {
+        "BLOCKLIST_BACKEND": "memory",
+        "LOGIN_RATELIMIT_BACKEND": "memory",
+        "HTML_ENABLED": not args.api_only,
+        "MIGRATE_ENABLED": args.migrate,
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        report = summarize([measure(config, workdir) for _ in range(args.runs)], args.top)
+    report["budget_ms"] = args.budget_ms
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(
+            f"import {report['import_ms']:.1f} ms  create_app {report['create_app_ms']:.1f} ms  "
+            f"total {report['total_ms']:.1f} ms  (median of {report['runs']})"
+        )
+        for package in report["top_packages"]:
+            print(f"{package['ms']:9.1f} ms  {package['package']}")
+
+    if args.budget_ms is not None and report["total_ms"] > args.budget_ms:
+        print(f"over budget: {report['total_ms']:.1f} ms > {args.budget_ms:.1f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
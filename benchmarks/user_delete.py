@@ -0,0 +1,104 @@
+"""
+Time deleting a user as their habit count grows.
+
+Seeds one account per size (every habit with ``--checkins`` rows of history)
+next to a fixed background of other users, then deletes it three ways: the
+single cascading ``DELETE`` the API runs, the chunked purge, and the old ORM
+path that loaded every habit and check-in and deleted them one by one.
+
+    python -m benchmarks.user_delete --sizes 100 1000 10000 --checkins 10
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+from app import create_app
+from db import db
+from models import HabitCheckinModel, HabitModel, UserModel
+from purge import delete_user_row, purge_user
+
+MODES = ("cascade", "chunked", "orm")
+
+
+def seed(username, habits, checkins):
+    user_id = db.session.scalar(
+        insert(UserModel).values(username=username, pwd="x").returning(UserModel.id)
+    )
+    habit_ids = db.session.scalars(
+        insert(HabitModel).returning(HabitModel.id),
+        [{"name": f"habit {i}", "checked": "No", "user_id": user_id} for i in range(habits)],
+    ).all()
+    start = date(2024, 1, 1)
+    rows = [
+        {"habit_id": habit_id, "day": start + timedelta(days=day), "running_total": day + 1}
+        for habit_id in habit_ids
+        for day in range(checkins)
+    ]
+    for offset in range(0, len(rows), 50000):
+        db.session.execute(insert(HabitCheckinModel), rows[offset:offset + 50000])
+    db.session.commit()
+    return user_id
+
+
+def orm_delete(user_id):
+    # What cascade="all, delete" without passive_deletes did.
+    user = db.session.get(UserModel, user_id)
+    for habit in user.habits:
+        for checkin in habit.checkins:
+            db.session.delete(checkin)
+        for bitmap in habit.checkin_bitmaps:
+            db.session.delete(bitmap)
+        db.session.delete(habit)
+    db.session.delete(user)
+    db.session.commit()
+
+
+DELETE = {
+    "cascade": delete_user_row,
+    "chunked": purge_user,
+    "orm": orm_delete,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--checkins", type=int, default=10)
+    parser.add_argument("--background", type=int, default=100, help="habits of each other user")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app(
+            f"sqlite:///{os.path.join(workdir, 'user_delete.db')}",
+            {"BLOCKLIST_BACKEND": "memory", "HTML_ENABLED": False},
+        )
+        with app.app_context():
+            db.create_all()
+            for number in range(10):
+                seed(f"background{number}", args.background, args.checkins)
+            for size in args.sizes:
+                for mode in args.modes:
+                    user_id = seed(f"{mode}{size}", size, args.checkins)
+                    db.session.expunge_all()
+                    start = time.perf_counter()
+                    DELETE[mode](user_id)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    results.append({"mode": mode, "habits": size, "rows": size * (1 + args.checkins), "ms": elapsed})
+                    if not args.json:
+                        print(f"{mode:>8} {size:>7} habits: {elapsed:9.1f} ms", flush=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
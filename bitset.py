@@ -0,0 +1,111 @@
+"""
+bitset.py
+
+Helpers for habit completion history packed as one bitset per calendar year:
+bit ``i`` of a year's 46 bytes is set when the habit was completed on day
+``i`` (0 = January 1st). Everything here works on the packed bytes through
+Python's arbitrary-precision integers, so counting, streak and weekly
+operations touch a whole year per instruction instead of looping over days.
+"""
+
+import calendar
+from datetime import date, timedelta
+
+YEAR_BYTES = 46  # 366 bits
+
+
+def empty():
+    return bytes(YEAR_BYTES)
+
+
+def day_index(day):
+    return day.timetuple().tm_yday - 1
+
+
+def days_in_year(year):
+    return 366 if calendar.isleap(year) else 365
+
+
+def to_int(bits):
+    return int.from_bytes(bits or b"", "little")
+
+
+def from_int(value):
+    return value.to_bytes(YEAR_BYTES, "little")
+
+
+def has_day(bits, index):
+    return bool(to_int(bits) >> index & 1)
+
+
+def with_day(bits, index, value=True):
+    n = to_int(bits)
+    n = n | (1 << index) if value else n & ~(1 << index)
+    return from_int(n)
+
+
+def count_range(value, start, end):
+    """Number of set bits of ``value`` in positions ``start..end`` inclusive."""
+    if end < start:
+        return 0
+    mask = ((1 << (end - start + 1)) - 1) << start
+    return (value & mask).bit_count()
+
+
+def longest_run(value):
+    # Each step shortens every run of ones by one bit.
+    length = 0
+    while value:
+        value &= value >> 1
+        length += 1
+    return length
+
+
+def run_ending_at(value, index):
+    mask = (1 << (index + 1)) - 1
+    zeros = ~value & mask
+    return index + 1 - zeros.bit_length()
+
+
+def join_years(year_bits, first_year, last_year):
+    """Concatenate per-year bitsets into one integer starting at ``first_year``."""
+    value = 0
+    offset = 0
+    for year in range(first_year, last_year + 1):
+        value |= to_int(year_bits.get(year)) << offset
+        offset += days_in_year(year)
+    return value
+
+
+def set_days(value, first_day):
+    while value:
+        low = value & -value
+        yield first_day + timedelta(days=low.bit_length() - 1)
+        value ^= low
+
+
+def _weeks(bits, year):
+    # Shift so that bit 0 is the Monday of the week containing January 1st.
+    lead = date(year, 1, 1).weekday()
+    value = (to_int(bits) & ((1 << days_in_year(year)) - 1)) << lead
+    weeks = (lead + days_in_year(year) + 6) // 7
+    return lead, value, weeks
+
+
+def weekly_counts(bits, year):
+    _, value, weeks = _weeks(bits, year)
+    return [((value >> (7 * week)) & 0x7F).bit_count() for week in range(weeks)]
+
+
+def heatmap(bits, year):
+    """7 x N grid (Monday first) of 1/0, with None for days outside ``year``."""
+    lead, value, weeks = _weeks(bits, year)
+    total = lead + days_in_year(year)
+    grid = [[None] * weeks for _ in range(7)]
+    for week in range(weeks):
+        chunk = (value >> (7 * week)) & 0x7F
+        for weekday in range(7):
+            position = 7 * week + weekday
+            if lead <= position < total:
+                grid[weekday][week] = chunk >> weekday & 1
+    return grid
@@ -1,9 +1,226 @@
 """
 blocklist.py
 
-This file just contains the blocklist of the JWT tokens. It will be imported by
+This file contains the blocklist of the JWT tokens. It will be imported by
 app and the logout resource so that tokens can be added to the blocklist when the
 user logs out.
+
+Revoked JTIs are stored in a backend shared by every gunicorn worker (the
+``token_blocklist`` table by default, or a process-local dict for tests and
+single-process runs). Two things keep the per-request check cheap:
+
+* a Bloom filter answers "never revoked" without touching the backend. For the
+  database backend it lives in an mmap'd file (``BLOCKLIST_BLOOM_PATH``,
+  relative to the instance folder), so every worker on the host sees a
+  revocation as soon as the logout returns. A revocation on another host
+  never reaches that file, so the fast path is off unless the path is set:
+  only set it when every worker runs on one host.
+* a bounded LRU tier remembers recently confirmed revocations until the
+  token's ``exp`` has passed.
+
+Entries are dropped from the backend once their token has expired, since an
+expired token is rejected anyway.
 """
 
-BLOCKLIST = set()
\ No newline at end of file
+import fcntl
+import hashlib
+import mmap
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from cache import TTLCache
+from db import db
+from models import TokenBlocklistModel
+from routing import on_primary
+
+
+class BloomFilter:
+    def __init__(self, size_bits=1 << 23, hashes=7, path=None):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self.path = path
+        self.created = False
+        self._lock = Lock()
+        nbytes = size_bits // 8
+
+        if path is None:
+            self._bits = bytearray(nbytes)
+            self._fd = None
+            return
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self.locked():
+            if os.fstat(self._fd).st_size < nbytes:
+                os.ftruncate(self._fd, nbytes)
+                self.created = True
+        self._bits = mmap.mmap(self._fd, nbytes)
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            if self._fd is None:
+                yield
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hashes)]
+
+    def add(self, key):
+        with self.locked():
+            self._set(self._bits, key)
+
+    def _set(self, bits, key):
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def rebuild(self, load_keys):
+        # Held across the load so a concurrent add cannot slip in between
+        # reading the live keys and overwriting the bits.
+        with self.locked():
+            fresh = bytearray(self.size_bits // 8)
+            for key in load_keys():
+                self._set(fresh, key)
+            self._bits[:] = fresh
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._entries = {}
+
+    def add(self, jti, expires_at):
+        self._entries[jti] = expires_at
+
+    def get(self, jti):
+        return self._entries.get(jti)
+
+    def live(self, now):
+        return [jti for jti, expires_at in self._entries.items() if expires_at > now]
+
+    def purge(self, now):
+        for jti in [jti for jti, expires_at in self._entries.items() if expires_at <= now]:
+            del self._entries[jti]
+
+
+class DatabaseBackend:
+    def add(self, jti, expires_at):
+        try:
+            db.session.add(TokenBlocklistModel(jti=jti, expires_at=expires_at))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
+    def get(self, jti):
+        return db.session.execute(
+            on_primary(select(TokenBlocklistModel.expires_at).where(TokenBlocklistModel.jti == jti))
+        ).scalar()
+
+    def live(self, now):
+        return db.session.execute(
+            on_primary(select(TokenBlocklistModel.jti).where(TokenBlocklistModel.expires_at > now))
+        ).scalars()
+
+    def purge(self, now):
+        db.session.execute(
+            delete(TokenBlocklistModel).where(TokenBlocklistModel.expires_at <= now)
+        )
+        db.session.commit()
+
+
+BACKENDS = {"memory": MemoryBackend, "database": DatabaseBackend}
+
+
+class _BlocklistState:
+    def __init__(self, app):
+        config = app.config
+        self.backend = BACKENDS[config["BLOCKLIST_BACKEND"]]()
+        self.recent = TTLCache(config["BLOCKLIST_CACHE_SIZE"])
+        self.purge_every = config["BLOCKLIST_PURGE_EVERY"]
+        self.adds = 0
+
+        bloom_path = config["BLOCKLIST_BLOOM_PATH"]
+        if config["BLOCKLIST_BACKEND"] == "memory":
+            self.bloom = BloomFilter(config["BLOCKLIST_BLOOM_BITS"])
+        elif bloom_path:
+            self.bloom = BloomFilter(config["BLOCKLIST_BLOOM_BITS"], path=bloom_path)
+        else:
+            self.bloom = None
+        # A new bloom file knows nothing about tokens revoked before it existed.
+        self.needs_rebuild = self.bloom is not None and self.bloom.created
+
+
+class TokenBlocklist:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("BLOCKLIST_BACKEND", "database")
+        app.config.setdefault("BLOCKLIST_CACHE_SIZE", 10000)
+        app.config.setdefault("BLOCKLIST_BLOOM_BITS", 1 << 23)
+        app.config.setdefault("BLOCKLIST_BLOOM_PATH", os.getenv("BLOCKLIST_BLOOM_PATH"))
+        app.config.setdefault("BLOCKLIST_PURGE_EVERY", 1000)
+        if app.config["BLOCKLIST_BLOOM_PATH"]:
+            path = os.path.join(app.instance_path, app.config["BLOCKLIST_BLOOM_PATH"])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            app.config["BLOCKLIST_BLOOM_PATH"] = path
+        app.extensions["blocklist"] = _BlocklistState(app)
+
+    @property
+    def _state(self):
+        state = current_app.extensions["blocklist"]
+        if state.needs_rebuild:
+            state.needs_rebuild = False
+            state.bloom.rebuild(lambda: state.backend.live(time.time()))
+        return state
+
+    def add(self, jti, expires_at):
+        state = self._state
+        state.backend.add(jti, expires_at)
+        if state.bloom is not None:
+            state.bloom.add(jti)
+        state.recent.set(jti, True, expires_at=expires_at)
+
+        state.adds += 1
+        if state.adds % state.purge_every == 0:
+            self.purge_expired()
+
+    def __contains__(self, jti):
+        state = self._state
+        if state.recent.get(jti):
+            return True
+        if state.bloom is not None and jti not in state.bloom:
+            return False
+
+        expires_at = state.backend.get(jti)
+        if expires_at is None or expires_at <= time.time():
+            return False
+        state.recent.set(jti, True, expires_at=expires_at)
+        return True
+
+    def purge_expired(self):
+        state = self._state
+        now = time.time()
+        state.backend.purge(now)
+        if state.bloom is not None:
+            state.bloom.rebuild(lambda: state.backend.live(now))
+
+
+BLOCKLIST = TokenBlocklist()
@@ -0,0 +1,208 @@
+"""
+bulk_import.py
+
+Bulk loading of users and habits from CSV or NDJSON (optionally gzipped),
+used by ``flask import``. The file is read as a stream and handled in chunks:
+each chunk is validated with the API's own schemas, rows that already exist
+or reference unknown users are reported instead of aborting the load, and the
+rest go in with one ``COPY ... FROM STDIN`` on PostgreSQL or one executemany
+``INSERT`` elsewhere.
+
+Passwords are hashed across the whole hashing pool, or taken as they are with
+``pre_hashed`` when the file already holds passlib hashes. Progress is kept
+in ``import_checkpoints`` and committed with each chunk, so an interrupted
+import picks up after the last committed chunk when it is run again.
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+
+from flask import current_app
+from marshmallow import EXCLUDE, ValidationError
+from sqlalchemy import select
+
+from db import db
+from models import HabitModel, ImportCheckpointModel, UserModel
+from passwords import passwords
+from schemas import HabitSchema, PlainUserSchema
+
+CHUNK_SIZE = 5000
+
+
+def read_records(path, fmt=None):
+    opener = gzip.open if path.endswith(".gz") else open
+    fmt = fmt or ("csv" if ".csv" in os.path.basename(path) else "ndjson")
+    with opener(path, "rt", newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Left for the schema to reject with the line number.
+                yield line
+
+
+def checkpoint_key(kind, path):
+    path = os.path.abspath(path)
+    digest = hashlib.sha1(f"{path}:{os.path.getsize(path)}".encode()).hexdigest()[:16]
+    return f"{kind}:{os.path.basename(path)[:200]}:{digest}"
+
+
+def validate(schema, chunk):
+    """Split ``[(line, record)]`` into loaded rows and ``[(line, messages)]``."""
+    numbers = [number for number, _ in chunk]
+    try:
+        loaded = schema.load([record for _, record in chunk], many=True, unknown=EXCLUDE)
+        return list(zip(numbers, loaded)), []
+    except ValidationError as err:
+        errors = err.messages
+        valid = [
+            (number, data)
+            for index, (number, data) in enumerate(zip(numbers, err.valid_data))
+            if index not in errors
+        ]
+        return valid, [(numbers[index], messages) for index, messages in errors.items()]
+
+
+def copy_rows(conn, table, columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([row[column] for column in columns] for row in rows)
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def bulk_insert(table, columns, rows):
+    conn = db.session.connection()
+    if conn.dialect.name == "postgresql":
+        copy_rows(conn, table, columns, rows)
+    else:
+        conn.execute(table.insert(), rows)
+
+
+class UserImport:
+    table = UserModel.__table__
+    columns = ("username", "pwd")
+    schema = PlainUserSchema()
+
+    def __init__(self, pre_hashed=False):
+        self.pre_hashed = pre_hashed
+
+    def resolve(self, chunk):
+        return chunk
+
+    def prepare(self, chunk):
+        """Return ``(rows, skipped, errors)`` for validated ``[(line, data)]``."""
+        usernames = [data["username"] for _, data in chunk]
+        seen = set(
+            db.session.execute(
+                select(UserModel.username).where(UserModel.username.in_(usernames))
+            ).scalars()
+        )
+        rows, skipped, errors = [], 0, []
+        for number, data in chunk:
+            if data["username"] in seen:
+                skipped += 1
+            elif self.pre_hashed and not passwords.is_hash(data["pwd"]):
+                errors.append((number, {"pwd": ["Not a supported password hash."]}))
+            else:
+                seen.add(data["username"])
+                rows.append({"username": data["username"], "pwd": data["pwd"]})
+
+        if rows and not self.pre_hashed:
+            for row, hashed in zip(rows, passwords.hash_many([row["pwd"] for row in rows])):
+                row["pwd"] = hashed
+        return rows, skipped, errors
+
+
+class HabitImport:
+    table = HabitModel.__table__
+    columns = ("name", "checked", "user_id", "history_storage")
+    schema = HabitSchema()
+
+    def __init__(self):
+        self.storage = current_app.config.get("HABIT_HISTORY_STORAGE", "rows")
+
+    def resolve(self, chunk):
+        # Rows may name their owner by ``username`` instead of ``user_id``.
+        names = {
+            record["username"]
+            for _, record in chunk
+            if isinstance(record, dict) and record.get("username") and not record.get("user_id")
+        }
+        if not names:
+            return chunk
+        ids = dict(
+            db.session.execute(
+                select(UserModel.username, UserModel.id).where(UserModel.username.in_(names))
+            ).all()
+        )
+        resolved = []
+        for number, record in chunk:
+            if isinstance(record, dict) and record.get("username") in ids and not record.get("user_id"):
+                record = {**record, "user_id": ids[record["username"]]}
+            resolved.append((number, record))
+        return resolved
+
+    def prepare(self, chunk):
+        user_ids = {data["user_id"] for _, data in chunk}
+        known = set(
+            db.session.execute(select(UserModel.id).where(UserModel.id.in_(user_ids))).scalars()
+        )
+        rows, errors = [], []
+        for number, data in chunk:
+            if data["user_id"] in known:
+                rows.append({**data, "history_storage": self.storage})
+            else:
+                errors.append((number, {"user_id": ["Unknown user."]}))
+        return rows, 0, errors
+
+
+def run_import(kind, path, fmt=None, chunk_size=CHUNK_SIZE, pre_hashed=False, restart=False, on_error=None):
+    importer = UserImport(pre_hashed) if kind == "users" else HabitImport()
+    key = checkpoint_key(kind, path)
+    checkpoint = db.session.get(ImportCheckpointModel, key)
+    if checkpoint is None:
+        checkpoint = ImportCheckpointModel(key=key, rows_done=0)
+        db.session.add(checkpoint)
+    elif restart:
+        checkpoint.rows_done = 0
+
+    stats = {"resumed_from": checkpoint.rows_done, "read": 0, "inserted": 0, "skipped": 0, "invalid": 0}
+    records = itertools.islice(enumerate(read_records(path, fmt), 1), checkpoint.rows_done, None)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            break
+        valid, errors = validate(importer.schema, importer.resolve(chunk))
+        rows, skipped, rejected = importer.prepare(valid) if valid else ([], 0, [])
+        errors += rejected
+        if rows:
+            bulk_insert(importer.table, importer.columns, rows)
+
+        checkpoint.rows_done = chunk[-1][0]
+        db.session.commit()
+
+        stats["read"] += len(chunk)
+        stats["inserted"] += len(rows)
+        stats["skipped"] += skipped
+        stats["invalid"] += len(errors)
+        if on_error:
+            for number, messages in sorted(errors, key=lambda error: error[0]):
+                on_error(number, messages)
+    db.session.commit()
+    return stats
@@ -0,0 +1,95 @@
+"""
+cache.py
+
+A small thread-safe LRU cache whose entries can also expire. It is the
+in-process tier used by the token blocklist and the other per-worker caches:
+bounded by ``maxsize`` (least recently used entries are evicted first) and,
+optionally, by a default ``ttl`` or a per-entry absolute ``expires_at``. With
+``maxweight`` the total ``weigh(value)`` of the entries is bounded too, which
+lets caches of variable-sized values (rendered pages) cap their memory.
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=None, clock=time.time, maxweight=None, weigh=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.maxweight = maxweight
+        self.weigh = weigh
+        self.hits = 0
+        self.misses = 0
+        self.weight = 0
+        self._weights = {}
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self.clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value, expires_at=None):
+        if expires_at is None and self.ttl is not None:
+            expires_at = self.clock() + self.ttl
+        weight = self.weigh(value) if self.weigh else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.maxweight is not None and weight > self.maxweight:
+                return
+            self._data[key] = (value, expires_at)
+            if weight:
+                self._weights[key] = weight
+                self.weight += weight
+            while len(self._data) > self.maxsize or (
+                self.maxweight is not None and self.weight > self.maxweight
+            ):
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        self.weight -= self._weights.pop(key, 0)
+        return entry
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._remove(key)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self.weight = 0
+
+    def stats(self):
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        if self.maxweight is not None:
+            stats.update(weight=self.weight, maxweight=self.maxweight)
+        return stats
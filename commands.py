@@ -0,0 +1,149 @@
+import json
+import sys
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from bulk_import import CHUNK_SIZE, run_import
+from export import export_chunks
+from db import db
+from jobs import job_queue
+from models import HabitModel
+from models.history import STORAGES
+from purge import purge_user
+from rollups import rollups
+from routing import replica_keys, sync_sqlite_replicas
+
+
+@click.command("export")
+@click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]), default="ndjson")
+@click.option("--table", type=click.Choice(["all", "habits", "checkins"]), default="all")
+@click.option("--user-id", type=int, help="Only this user's data; every user if omitted.")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), help="Defaults to stdout.")
+@click.option("--gzip", is_flag=True, help="Gzip the output.")
+@with_appcontext
+def export_command(fmt, table, user_id, output, gzip):
+    """Stream habits and check-ins as NDJSON or CSV."""
+    if fmt == "csv" and table == "all":
+        raise click.BadParameter("CSV exports one table at a time.", param_hint="--table")
+    out = open(output, "wb") if output else sys.stdout.buffer
+    try:
+        for chunk in export_chunks(fmt, table, user_id, gzip):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+
+
+@click.command("import")
+@click.argument("kind", type=click.Choice(["users", "habits"]))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]), help="Guessed from the file name.")
+@click.option("--chunk-size", type=int, default=CHUNK_SIZE, show_default=True)
+@click.option("--pre-hashed", is_flag=True, help="The pwd column already holds passlib hashes.")
+@click.option("--restart", is_flag=True, help="Ignore the checkpoint and start from the first row.")
+@click.option("--errors", type=click.File("w"), help="Write rejected rows here as NDJSON.")
+@with_appcontext
+def import_command(kind, path, fmt, chunk_size, pre_hashed, restart, errors):
+    """Bulk load users or habits from CSV or NDJSON, resuming after a crash."""
+    def on_error(line, messages):
+        if errors:
+            errors.write(json.dumps({"line": line, "errors": messages}) + "\n")
+
+    stats = run_import(kind, path, fmt, chunk_size, pre_hashed, restart, on_error)
+    if stats["resumed_from"]:
+        click.echo(f"Resumed after row {stats['resumed_from']}.")
+    click.echo(
+        f"{stats['read']} rows read: {stats['inserted']} inserted, "
+        f"{stats['skipped']} already present, {stats['invalid']} rejected."
+    )
+    if kind == "habits" and stats["inserted"]:
+        # The import bypasses the rollup hooks.
+        job = job_queue.enqueue("rebuild_rollups")
+        db.session.commit()
+        click.echo(f"Queued a rollup rebuild (job {job.id}) for the servers or `flask jobs-worker`.")
+
+
+@click.command("purge-user")
+@click.argument("user_id", type=int)
+@click.option("--chunk-size", type=int, help="Habits per transaction; USER_PURGE_CHUNK_SIZE by default.")
+@with_appcontext
+def purge_user_command(user_id, chunk_size):
+    """Delete a user and their habits in small transactions."""
+    purged = purge_user(user_id, chunk_size)
+    click.echo(f"Deleted user {user_id} and {purged} habits.")
+
+
+@click.command("rebuild-rollups")
+@click.option("--chunk-size", type=int, default=1000, show_default=True, help="Users read per step.")
+@with_appcontext
+def rebuild_rollups_command(chunk_size):
+    """Recompute the analytics rollups from habits and their history."""
+    users = rollups.rebuild(chunk_size)
+    db.session.commit()
+    click.echo(f"Rebuilt rollups for {users} users.")
+
+
+@click.command("convert-history")
+@click.option("--storage", type=click.Choice(sorted(STORAGES)), required=True)
+@click.option("--user-id", type=int, help="Only this user's habits; every user's if omitted.")
+@click.option("--chunk-size", type=int, default=1000, show_default=True, help="Habits per transaction.")
+@with_appcontext
+def convert_history_command(storage, user_id, chunk_size):
+    """Move check-in history to row-per-day or bitmap storage.
+
+    Habits created later still use HABIT_HISTORY_STORAGE.
+    """
+    query = select(HabitModel).where(HabitModel.history_storage != storage)
+    if user_id is not None:
+        query = query.where(HabitModel.user_id == user_id)
+    converted = 0
+    while True:
+        habits = db.session.scalars(query.order_by(HabitModel.id).limit(chunk_size)).all()
+        if not habits:
+            break
+        for habit in habits:
+            habit.convert_history(storage)
+        db.session.commit()
+        converted += len(habits)
+    click.echo(f"Converted {converted} habits to {storage} storage.")
+
+
+@click.command("jobs-worker")
+@click.option("--workers", type=int, help="Worker threads; JOBS_WORKERS by default.")
+@with_appcontext
+def jobs_worker_command(workers):
+    """Run background jobs in the foreground until interrupted."""
+    job_queue.work(workers)
+
+
+@click.command("jobs-stats")
+@with_appcontext
+def jobs_stats_command():
+    """Print queue depth, failures and latency percentiles as JSON."""
+    click.echo(json.dumps(job_queue.stats(), indent=2))
+
+
+@click.command("sync-replicas")
+@with_appcontext
+def sync_replicas_command():
+    """Copy the SQLite primary into the SQLite read replicas, for local testing."""
+    app = current_app._get_current_object()
+    paths = sync_sqlite_replicas(db.engines[None], [db.engines[key] for key in replica_keys(app)])
+    if not paths:
+        raise click.ClickException("No SQLite replicas configured; set DATABASE_REPLICA_URLS.")
+    for path in paths:
+        click.echo(f"Synced {path}.")
+
+
+def register_commands(app):
+    app.cli.add_command(export_command)
+    app.cli.add_command(import_command)
+    app.cli.add_command(purge_user_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(convert_history_command)
+    app.cli.add_command(jobs_worker_command)
+    app.cli.add_command(jobs_stats_command)
+    app.cli.add_command(sync_replicas_command)
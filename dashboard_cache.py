@@ -0,0 +1,70 @@
+"""
+dashboard_cache.py
+
+Per-process cache of the rendered habit table on the dashboard. Each entry is
+stored under the user id together with the tag of that user's habits
+(``etags.collection_tag``: count, max id, summed versions and latest update),
+so a GET costs one aggregate query instead of loading and rendering every
+habit. A tag that no longer matches is a miss, which keeps workers that did
+not see a write from serving a stale table.
+
+Writes through the dashboard forms and the habit REST endpoints also drop the
+user's entry right away. The cache holds at most ``DASHBOARD_CACHE_SIZE``
+users and ``DASHBOARD_CACHE_MAX_BYTES`` of rendered HTML, evicting the least
+recently used entries first.
+"""
+
+from flask import current_app
+from markupsafe import Markup
+
+from cache import TTLCache
+from etags import collection_tag
+from models import HabitModel
+
+
+def _entry_size(entry):
+    return len(entry[1])
+
+
+class DashboardCache:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("DASHBOARD_CACHE_ENABLED", True)
+        app.config.setdefault("DASHBOARD_CACHE_SIZE", 1000)
+        app.config.setdefault("DASHBOARD_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+        app.extensions["dashboard_cache"] = TTLCache(
+            app.config["DASHBOARD_CACHE_SIZE"],
+            maxweight=app.config["DASHBOARD_CACHE_MAX_BYTES"],
+            weigh=_entry_size,
+        )
+
+    @property
+    def _cache(self):
+        return current_app.extensions["dashboard_cache"]
+
+    def habit_table(self, user_id, render):
+        """The user's rendered habit table; ``render()`` produces it on a miss."""
+        if not current_app.config["DASHBOARD_CACHE_ENABLED"]:
+            return Markup(render())
+        # Read the tag before rendering: a write in between leaves an entry
+        # whose tag is already outdated, never a stale table under a new tag.
+        tag = collection_tag(HabitModel, HabitModel.user_id == user_id)
+        entry = self._cache.get(user_id)
+        if entry is None or entry[0] != tag:
+            entry = (tag, Markup(render()))
+            self._cache.set(user_id, entry)
+        return entry[1]
+
+    def invalidate(self, *user_ids):
+        for user_id in user_ids:
+            if user_id is not None:
+                self._cache.pop(int(user_id))
+
+    def stats(self):
+        return self._cache.stats()
+
+
+dashboard_cache = DashboardCache()
@@ -1,5 +1,11 @@
 #!/bin/sh
 
 flask db upgrade
+flask openapi write instance/openapi.json
+export OPENAPI_SPEC_FILE=openapi.json
 
-exec gunicorn --bind 0.0.0.0:80 "app:create_app()"
\ No newline at end of file
+# Every gunicorn worker runs JOBS_WORKERS job threads next to its request
+# handlers; set it to 0 and run `flask jobs-worker` elsewhere to split them.
+export JOBS_WORKERS="${JOBS_WORKERS:-2}"
+
+exec gunicorn --bind 0.0.0.0:80 "app:create_app()"
@@ -0,0 +1,201 @@
+"""
+engine.py
+
+Engine profiles for the two databases we deploy on. ``configure_engine`` must
+run before ``db.init_app`` and fills ``SQLALCHEMY_ENGINE_OPTIONS`` (keys set
+explicitly there win):
+
+* SQLite gets a ``busy_timeout`` so concurrent gunicorn workers wait for the
+  write lock instead of failing with "database is locked", and every new
+  connection is switched to WAL with ``synchronous=NORMAL``, memory-mapped
+  reads and enforced foreign keys (which ``ON DELETE CASCADE`` relies on)
+  through a connect event.
+* PostgreSQL (psycopg2) gets a sized queue pool with pre-ping and recycling,
+  and a server-side ``statement_timeout``.
+
+``engine_profile.init_app`` runs after ``db.init_app``; it installs the SQLite
+connect event (on read replicas too, see routing.py) and, with
+``DATABASE_SELF_CHECK``, logs the settings the primary actually reports so a
+misconfiguration shows up at startup.
+
+``async_engine_url`` and ``async_engine_options`` give the async serving mode
+(asgi.py) the same profile on the primary through aiosqlite or asyncpg.
+``SQLALCHEMY_ENGINE_OPTIONS`` is not applied there: its connect arguments are
+for the sync drivers.
+"""
+
+import logging
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "DATABASE_POOL_SIZE": 5,
+    "DATABASE_MAX_OVERFLOW": 10,
+    "DATABASE_POOL_TIMEOUT": 30,
+    "DATABASE_POOL_RECYCLE": 1800,
+    "DATABASE_POOL_PRE_PING": True,
+    "DATABASE_STATEMENT_TIMEOUT_MS": 30000,
+    "DATABASE_SELF_CHECK": True,
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_BUSY_TIMEOUT_MS": 5000,
+    "SQLITE_MMAP_SIZE": 256 * 1024 * 1024,
+    "SQLITE_FOREIGN_KEYS": True,
+}
+
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def backend_name(app):
+    return make_url(app.config["SQLALCHEMY_DATABASE_URI"]).get_backend_name()
+
+
+def configure_engine(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    config = app.config
+    backend = backend_name(app)
+
+    if backend == "sqlite":
+        options = {
+            # pysqlite's own lock wait, in seconds; PRAGMA busy_timeout is set too.
+            "connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000},
+        }
+    elif backend == "postgresql":
+        options = {
+            **pool_options(config),
+            "connect_args": {
+                "options": f"-c statement_timeout={int(config['DATABASE_STATEMENT_TIMEOUT_MS'])}",
+                "application_name": "habits",
+            },
+        }
+    else:
+        options = {}
+
+    configured = config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+    connect_args = {**options.pop("connect_args", {}), **configured.get("connect_args", {})}
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = {**options, **configured}
+    if connect_args:
+        config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"] = connect_args
+
+
+def pool_options(config):
+    return {
+        "pool_size": config["DATABASE_POOL_SIZE"],
+        "max_overflow": config["DATABASE_MAX_OVERFLOW"],
+        "pool_timeout": config["DATABASE_POOL_TIMEOUT"],
+        "pool_recycle": config["DATABASE_POOL_RECYCLE"],
+        "pool_pre_ping": config["DATABASE_POOL_PRE_PING"],
+    }
+
+
+def async_engine_url(app):
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for {backend} databases")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def async_engine_options(app):
+    config = app.config
+    backend = backend_name(app)
+    if backend == "sqlite":
+        return {"connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000}}
+    if backend == "postgresql":
+        return {
+            **pool_options(config),
+            "connect_args": {
+                "server_settings": {
+                    "statement_timeout": str(int(config["DATABASE_STATEMENT_TIMEOUT_MS"])),
+                    "application_name": "habits",
+                },
+            },
+        }
+    return {}
+
+
+def sqlite_pragmas(config):
+    pragmas = [
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA foreign_keys={'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'}",
+    ]
+    if config["SQLITE_JOURNAL_MODE"]:
+        pragmas.insert(0, f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+    return pragmas
+
+
+def install_sqlite_pragmas(engine, config):
+    pragmas = sqlite_pragmas(config)
+
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    event.listen(engine, "connect", set_sqlite_pragmas)
+
+
+def self_check(engine):
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            report = {
+                name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "foreign_keys")
+            }
+        elif engine.dialect.name == "postgresql":
+            report = {
+                "server_version": conn.execute(text("SHOW server_version")).scalar(),
+                "statement_timeout": conn.execute(text("SHOW statement_timeout")).scalar(),
+            }
+        else:
+            report = {}
+    report["dialect"] = engine.dialect.name
+    report["pool"] = engine.pool.status()
+    return report
+
+
+class EngineProfile:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        with app.app_context():
+            engine = db.engine
+            sqlite_engines = [e for e in db.engines.values() if e.dialect.name == "sqlite"]
+
+        for sqlite_engine in sqlite_engines:
+            install_sqlite_pragmas(sqlite_engine, app.config)
+
+        report = None
+        if app.config["DATABASE_SELF_CHECK"]:
+            try:
+                report = self_check(engine)
+            except SQLAlchemyError as exc:
+                logger.error("database self-check failed: %s", exc)
+            # Don't hand the check's connection to forked workers.
+            engine.dispose()
+        app.extensions["engine_profile"] = report
+        if report:
+            logger.info("database engine: %s", report)
+            mode = app.config["SQLITE_JOURNAL_MODE"]
+            if engine.dialect.name == "sqlite" and mode and report["journal_mode"] not in (mode.lower(), "memory"):
+                logger.warning(
+                    "SQLite journal_mode is %s, not %s; concurrent writers will contend",
+                    report["journal_mode"],
+                    mode,
+                )
+
+
+engine_profile = EngineProfile()
@@ -0,0 +1,42 @@
+"""
+etags.py
+
+Weak ETags derived from the ``version`` columns of habits and users. The tag
+for a row (or a whole listing) is computed from a single narrow query, so an
+``If-None-Match`` hit is answered with 304 before anything is loaded or
+serialized.
+"""
+
+from flask import request
+from flask_smorest.exceptions import NotModified
+from sqlalchemy import func, select
+
+from db import db
+
+
+def collection_tag(model, *criteria):
+    # Any insert moves max(id), any delete changes the count and any update
+    # raises the sum of versions. SQLite reuses the highest id after a
+    # delete, so the latest updated_at is part of the tag as well.
+    count, max_id, versions, updated = db.session.execute(
+        select(
+            func.count(), func.max(model.id), func.sum(model.version), func.max(model.updated_at)
+        ).where(*criteria)
+    ).one()
+    stamp = updated.strftime("%Y%m%d%H%M%S%f") if updated else 0
+    return f"{count}.{max_id or 0}.{versions or 0}.{stamp}"
+
+
+def row_version(model, row_id):
+    return db.session.execute(select(model.version).where(model.id == row_id)).scalar()
+
+
+def etag_headers(*parts):
+    """Raise 304 if the client already holds this tag, else return the header."""
+    etag = "-".join(str(part) for part in parts)
+    headers = {"ETag": f'W/"{etag}"'}
+    if request.if_none_match.contains_weak(etag):
+        not_modified = NotModified()
+        not_modified.data = {"headers": headers}
+        raise not_modified
+    return headers
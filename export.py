@@ -0,0 +1,159 @@
+"""
+export.py
+
+Streaming export of habits and their check-in history as NDJSON or CSV. Rows
+are read with ``yield_per`` (a server-side cursor on PostgreSQL), turned into
+lines one at a time, grouped into chunks of about ``CHUNK_BYTES`` and
+optionally gzip-compressed as they go, so memory use does not grow with the
+number of rows. Used by the ``/export`` endpoint and ``flask export``, and by
+the ``export`` job, which writes the file to ``EXPORT_DIR`` (by default
+``instance/exports``) for ``/export/jobs`` to hand out later.
+"""
+
+import csv
+import io
+import json
+import os
+import time
+import zlib
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import select
+
+import bitset
+from db import db
+from jobs import task
+from models import HabitModel, HabitCheckinModel, HabitCheckinBitmapModel
+
+BATCH_SIZE = 1000
+CHUNK_BYTES = 64 * 1024
+
+HABIT_COLUMNS = (
+    "id",
+    "user_id",
+    "name",
+    "checked",
+    "current_streak",
+    "longest_streak",
+    "total_checkins",
+    "last_checkin",
+    "history_storage",
+)
+CHECKIN_COLUMNS = ("habit_id", "day")
+TABLES = {"habits": HABIT_COLUMNS, "checkins": CHECKIN_COLUMNS}
+
+
+def _stream(query):
+    return db.session.execute(query.execution_options(yield_per=BATCH_SIZE))
+
+
+def habit_rows(user_id=None):
+    query = select(*(getattr(HabitModel, column) for column in HABIT_COLUMNS)).order_by(HabitModel.id)
+    if user_id is not None:
+        query = query.where(HabitModel.user_id == user_id)
+    for row in _stream(query):
+        yield row._asdict()
+
+
+def checkin_rows(user_id=None):
+    rows = (
+        select(HabitCheckinModel.habit_id, HabitCheckinModel.day)
+        .join(HabitModel)
+        .order_by(HabitCheckinModel.habit_id, HabitCheckinModel.day)
+    )
+    bitmaps = (
+        select(HabitCheckinBitmapModel.habit_id, HabitCheckinBitmapModel.year, HabitCheckinBitmapModel.bits)
+        .join(HabitModel)
+        .order_by(HabitCheckinBitmapModel.habit_id, HabitCheckinBitmapModel.year)
+    )
+    if user_id is not None:
+        rows = rows.where(HabitModel.user_id == user_id)
+        bitmaps = bitmaps.where(HabitModel.user_id == user_id)
+
+    for habit_id, day in _stream(rows):
+        yield {"habit_id": habit_id, "day": day}
+    for habit_id, year, bits in _stream(bitmaps):
+        value = bitset.to_int(bits) & ((1 << bitset.days_in_year(year)) - 1)
+        for day in bitset.set_days(value, date(year, 1, 1)):
+            yield {"habit_id": habit_id, "day": day}
+
+
+ROWS = {"habits": habit_rows, "checkins": checkin_rows}
+
+
+def ndjson_lines(tables, user_id=None):
+    for table in tables:
+        for row in ROWS[table](user_id):
+            yield json.dumps({"type": table[:-1], **row}, default=date.isoformat) + "\n"
+
+
+def csv_lines(table, user_id=None):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=TABLES[table])
+    writer.writeheader()
+    for row in ROWS[table](user_id):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def chunked(lines, size=CHUNK_BYTES):
+    parts = []
+    length = 0
+    for line in lines:
+        data = line.encode()
+        parts.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield b"".join(parts)
+
+
+def gzipped(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(fmt, table, user_id=None, gzip=False):
+    """Byte chunks of the export; ``table`` is "habits", "checkins" or "all"
+    (NDJSON only, every record carries its ``type``)."""
+    if fmt == "csv":
+        lines = csv_lines(table, user_id)
+    else:
+        lines = ndjson_lines(TABLES if table == "all" else [table], user_id)
+    chunks = chunked(lines)
+    return gzipped(chunks) if gzip else chunks
+
+
+def export_dir():
+    return current_app.config.get("EXPORT_DIR") or os.path.join(current_app.instance_path, "exports")
+
+
+@task("export")
+def export_file(fmt, table, user_id, gzip, file):
+    directory = export_dir()
+    os.makedirs(directory, exist_ok=True)
+    # Files of jobs that have been pruned by now.
+    expired = time.time() - current_app.config["JOBS_RETENTION"]
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < expired:
+            os.remove(entry.path)
+
+    path = os.path.join(directory, file)
+    size = 0
+    with open(path + ".part", "wb") as out:
+        for chunk in export_chunks(fmt, table, user_id, gzip):
+            out.write(chunk)
+            size += len(chunk)
+    os.replace(path + ".part", path)
+    return {"file": file, "bytes": size}
@@ -0,0 +1,76 @@
+"""
+identity.py
+
+Per-process cache for the Flask-Login user loader. Instead of loading the full
+``UserModel`` row on every request that touches ``current_user``, the loader
+keeps a lightweight ``CachedUser`` (id and username only) in a bounded LRU for
+``IDENTITY_CACHE_TTL`` seconds. Deleting a user drops its entry in the worker
+that handled the delete; other workers notice once the TTL runs out.
+
+``CachedUser`` is also what views.py logs in. It spells out the four members
+Flask-Login asks of a user rather than inheriting ``flask_login.UserMixin``,
+so API-only deployments (``HTML_ENABLED=False``) never import Flask-Login.
+"""
+
+from flask import current_app
+from sqlalchemy import select
+
+from cache import TTLCache
+from db import db
+from models import UserModel
+from routing import on_primary
+
+
+class CachedUser:
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def get_id(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return f"<CachedUser {self.id}>"
+
+
+class IdentityCache:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("IDENTITY_CACHE_SIZE", 10000)
+        app.config.setdefault("IDENTITY_CACHE_TTL", 60)
+        app.extensions["identity_cache"] = TTLCache(
+            app.config["IDENTITY_CACHE_SIZE"], app.config["IDENTITY_CACHE_TTL"]
+        )
+
+    @property
+    def _cache(self):
+        return current_app.extensions["identity_cache"]
+
+    def load(self, user_id):
+        user_id = int(user_id)
+        user = self._cache.get(user_id)
+        if user is None:
+            row = db.session.execute(
+                on_primary(select(UserModel.id, UserModel.username).where(UserModel.id == user_id))
+            ).first()
+            if row is None:
+                return None
+            user = CachedUser(row.id, row.username)
+            self._cache.set(user_id, user)
+        return user
+
+    def invalidate(self, user_id):
+        self._cache.pop(int(user_id))
+
+    def stats(self):
+        return self._cache.stats()
+
+
+identity_cache = IdentityCache()
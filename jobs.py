@@ -0,0 +1,327 @@
+"""
+jobs.py
+
+A small job queue for work that does not have to finish before the response:
+purging large accounts, writing export files, rebuilding the analytics
+rollups, storing rehashed passwords and the audit log (accounts.py). Jobs are rows of ``jobs``, so they survive restarts and every
+process shares one queue.
+
+``job_queue.enqueue(name, payload)`` adds a row in the caller's transaction:
+the job exists once the caller commits, and not at all if it rolls back.
+Passing ``key`` makes it idempotent: while a job with that key is queued or
+running, enqueueing again returns it instead of adding another. Finished
+jobs give their key up and are pruned after ``JOBS_RETENTION`` seconds.
+
+Each serving process runs ``JOBS_WORKERS`` worker threads, started with its
+first request. CLI commands never start any: what they enqueue waits for a
+server, or for ``flask jobs-worker``, which runs a pool in the foreground. A worker claims the
+oldest due job with a single ``UPDATE ... RETURNING`` (``FOR UPDATE SKIP
+LOCKED`` on PostgreSQL), so several processes never run the same job. Failed
+jobs are retried up to ``max_attempts`` times with exponential backoff from
+``JOBS_RETRY_DELAY`` seconds. A job whose worker died while running it is
+queued again once it has been running for ``JOBS_LEASE`` seconds, so tasks
+must be safe to run twice; one that has used up its attempts that way (it
+keeps killing or hanging its worker) is marked failed instead.
+
+Tasks are plain functions registered with ``@task(name)``; they run in an
+app context with the payload as keyword arguments and may return a
+JSON-serializable result.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+
+from db import db, dialect_insert
+from models import JobModel
+from stats import percentile
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name, max_attempts=None):
+    def register(func):
+        TASKS[name] = (func, max_attempts)
+        return func
+
+    return register
+
+
+class _WorkerPool:
+    def __init__(self, app):
+        self.app = app
+        self.size = app.config["JOBS_WORKERS"]
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Again after a fork: threads do not survive it.
+        if self._pid == os.getpid() or not self.size:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.stopping.clear()
+            self.threads = [
+                threading.Thread(target=self.run, name=f"job-worker-{number}", daemon=True)
+                for number in range(self.size)
+            ]
+            for thread in self.threads:
+                thread.start()
+
+    def run(self):
+        name = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        poll = self.app.config["JOBS_POLL_INTERVAL"]
+        # One thread per process also requeues abandoned jobs and prunes.
+        sweeps = threading.current_thread() is self.threads[0]
+        next_sweep = 0
+        with self.app.app_context():
+            while not self.stopping.is_set():
+                try:
+                    if sweeps and time.monotonic() >= next_sweep:
+                        sweep()
+                        next_sweep = time.monotonic() + self.app.config["JOBS_LEASE"] / 2
+                    ran = run_next(name)
+                except Exception:
+                    logger.exception("job worker %s failed to claim a job", name)
+                    db.session.rollback()
+                    ran = False
+                finally:
+                    db.session.remove()
+                if not ran:
+                    self.wake.wait(poll)
+                    self.wake.clear()
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.wake.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+        self._pid = None
+
+
+def _now():
+    return datetime.utcnow()
+
+
+def claim(worker):
+    """Mark the oldest due job as running by ``worker`` and return it, or None."""
+    now = _now()
+    candidate = (
+        select(JobModel.id)
+        .where(JobModel.status == "queued", JobModel.run_at <= now)
+        .order_by(JobModel.run_at, JobModel.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    job = db.session.execute(
+        update(JobModel)
+        .where(JobModel.id == candidate, JobModel.status == "queued")
+        .values(status="running", attempts=JobModel.attempts + 1, started_at=now, worker=worker)
+        .returning(JobModel.id, JobModel.name, JobModel.payload, JobModel.attempts, JobModel.max_attempts),
+        execution_options={"synchronize_session": False},
+    ).first()
+    db.session.commit()
+    return job
+
+
+def _finish(job_id, **values):
+    db.session.execute(
+        update(JobModel).where(JobModel.id == job_id).values(**values),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.commit()
+
+
+def run_next(worker="inline"):
+    """Claim and run one job; returns False when none was due."""
+    job = claim(worker)
+    if job is None:
+        return False
+    func, _ = TASKS.get(job.name, (None, None))
+    try:
+        if func is None:
+            raise LookupError(f"No task named {job.name!r}")
+        result = func(**job.payload)
+    except Exception as exc:
+        db.session.rollback()
+        error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+        if func is not None and job.attempts < job.max_attempts:
+            delay = current_app.config["JOBS_RETRY_DELAY"] * 2 ** (job.attempts - 1)
+            logger.warning("job %s (%s) failed, retrying in %ss: %s", job.id, job.name, delay, error)
+            _finish(job.id, status="queued", run_at=_now() + timedelta(seconds=delay), error=error)
+        else:
+            logger.error("job %s (%s) failed: %s", job.id, job.name, error)
+            _finish(job.id, status="failed", finished_at=_now(), error=error)
+        return True
+    _finish(job.id, status="done", finished_at=_now(), result=result, error=None)
+    return True
+
+
+def sweep():
+    """Requeue or fail jobs whose worker died and drop old finished ones.
+
+    Returns how many jobs were requeued, failed and pruned.
+    """
+    now = _now()
+    abandoned = (
+        JobModel.status == "running",
+        JobModel.started_at < now - timedelta(seconds=current_app.config["JOBS_LEASE"]),
+    )
+    # claim() counted the attempt that never finished.
+    failed = db.session.execute(
+        update(JobModel)
+        .where(*abandoned, JobModel.attempts >= JobModel.max_attempts)
+        .values(
+            status="failed",
+            finished_at=now,
+            error=f"Worker stopped responding after {current_app.config['JOBS_LEASE']}s",
+        ),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    requeued = db.session.execute(
+        update(JobModel).where(*abandoned).values(status="queued", run_at=now),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    pruned = db.session.execute(
+        delete(JobModel).where(
+            JobModel.status.in_(("done", "failed")),
+            JobModel.finished_at < now - timedelta(seconds=current_app.config["JOBS_RETENTION"]),
+        ),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    db.session.commit()
+    return requeued, failed, pruned
+
+
+class JobQueue:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("JOBS_WORKERS", 2)
+        app.config.setdefault("JOBS_POLL_INTERVAL", 1.0)
+        app.config.setdefault("JOBS_MAX_ATTEMPTS", 3)
+        app.config.setdefault("JOBS_RETRY_DELAY", 5)
+        app.config.setdefault("JOBS_LEASE", 600)
+        app.config.setdefault("JOBS_RETENTION", 24 * 3600)
+        app.config.setdefault("JOBS_STATS_SAMPLE", 500)
+        app.extensions["jobs"] = pool = _WorkerPool(app)
+        app.before_request(pool.start)
+
+    @property
+    def _pool(self):
+        return current_app.extensions["jobs"]
+
+    def enqueue(self, name, payload=None, key=None, user_id=None, delay=0, max_attempts=None):
+        """Add a job to the caller's transaction; returns its ``JobModel``."""
+        if name not in TASKS:
+            raise LookupError(f"No task named {name!r}")
+        now = _now()
+        values = {
+            "name": name,
+            "payload": payload or {},
+            "key": key,
+            "user_id": user_id,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts or TASKS[name][1] or current_app.config["JOBS_MAX_ATTEMPTS"],
+            "run_at": now + timedelta(seconds=delay),
+            "created_at": now,
+        }
+        if key is None:
+            job = JobModel(**values)
+            db.session.add(job)
+            db.session.flush()
+        else:
+            db.session.execute(
+                update(JobModel)
+                .where(JobModel.key == key, JobModel.status.in_(("done", "failed")))
+                .values(key=None),
+                execution_options={"synchronize_session": False},
+            )
+            db.session.execute(
+                dialect_insert(JobModel.__table__).values(**values).on_conflict_do_nothing(
+                    index_elements=["key"]
+                )
+            )
+            job = db.session.scalars(select(JobModel).where(JobModel.key == key)).one()
+        # Only wakes workers already running here; enqueueing never starts
+        # them, or a CLI command would exit under a claimed job.
+        self._pool.wake.set()
+        return job
+
+    def run_pending(self, limit=None):
+        """Run due jobs in this thread until none is left; returns how many ran."""
+        ran = 0
+        while (limit is None or ran < limit) and run_next():
+            ran += 1
+        return ran
+
+    def stop(self, timeout=None):
+        self._pool.stop(timeout)
+
+    def work(self, workers=None):
+        """Run a worker pool in the foreground until interrupted."""
+        pool = self._pool
+        if workers is not None:
+            pool.size = workers
+        pool.size = pool.size or 1
+        pool.start()
+        try:
+            while any(thread.is_alive() for thread in pool.threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.stop(timeout=current_app.config["JOBS_POLL_INTERVAL"] * 2)
+
+    def stats(self):
+        now = _now()
+        counts = dict(
+            db.session.execute(
+                select(JobModel.status, func.count()).group_by(JobModel.status)
+            ).all()
+        )
+        oldest = db.session.scalar(
+            select(func.min(JobModel.run_at)).where(
+                JobModel.status == "queued", JobModel.run_at <= now
+            )
+        )
+        recent = db.session.execute(
+            select(JobModel.created_at, JobModel.started_at, JobModel.finished_at)
+            .where(JobModel.status == "done")
+            .order_by(JobModel.finished_at.desc())
+            .limit(current_app.config["JOBS_STATS_SAMPLE"])
+        ).all()
+        waits = [(started - created).total_seconds() * 1000 for created, started, _ in recent]
+        runs = [(finished - started).total_seconds() * 1000 for _, started, finished in recent]
+        return {
+            "depth": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_due_seconds": (now - oldest).total_seconds() if oldest else 0,
+            "wait_ms": {"p50": percentile(waits, 50), "p95": percentile(waits, 95)},
+            "run_ms": {"p50": percentile(runs, 50), "p95": percentile(runs, 95)},
+            "workers": sum(thread.is_alive() for thread in self._pool.threads),
+        }
+
+
+job_queue = JobQueue()
@@ -0,0 +1,39 @@
+"""
+loading.py
+
+Derives SQLAlchemy eager-loading options from the marshmallow schema a resource
+is about to dump. Every relationship the schema will serialize through a nested
+field is loaded up front (joinedload for many-to-one, selectinload for
+collections), so dumping a list of rows costs a constant number of queries
+instead of one lazy load per row. Relationships the schema never touches are
+left lazy.
+"""
+
+from marshmallow import fields
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+
+
+def _nested_schema(field):
+    if isinstance(field, fields.List):
+        field = field.inner
+    if isinstance(field, fields.Nested):
+        return field.schema
+    return None
+
+
+def eager_options(model, schema):
+    relationships = inspect(model).relationships
+    options = []
+    for name, field in schema.dump_fields.items():
+        nested = _nested_schema(field)
+        relationship = relationships.get(field.attribute or name)
+        if nested is None or relationship is None or relationship.lazy == "dynamic":
+            continue
+
+        loader = selectinload if relationship.uselist else joinedload
+        attr = getattr(model, relationship.key)
+        options.append(
+            loader(attr).options(*eager_options(relationship.mapper.class_, nested))
+        )
+    return options
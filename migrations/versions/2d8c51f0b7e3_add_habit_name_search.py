@@ -0,0 +1,59 @@
+"""add habit name search
+
+Revision ID: 2d8c51f0b7e3
+Revises: f7b6fa292a24
+Create Date: 2026-10-18 10:05:12.418306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d8c51f0b7e3'
+down_revision = 'f7b6fa292a24'
+branch_labels = None
+depends_on = None
+
+# Kept in step with models/habit_search.py, which makes the same objects
+# for db.create_all.
+SQLITE_INDEX = "CREATE INDEX ix_habits_name_lower ON habits (lower(name))"
+SQLITE_TABLE = (
+    "CREATE VIRTUAL TABLE habits_search USING fts5("
+    "name, content='habits', content_rowid='id', tokenize='trigram')"
+)
+SQLITE_TRIGGERS = (
+    "CREATE TRIGGER habits_search_insert AFTER INSERT ON habits BEGIN "
+    "INSERT INTO habits_search (rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER habits_search_delete AFTER DELETE ON habits BEGIN "
+    "INSERT INTO habits_search (habits_search, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER habits_search_update AFTER UPDATE OF name ON habits BEGIN "
+    "INSERT INTO habits_search (habits_search, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO habits_search (rowid, name) VALUES (new.id, new.name); END",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_habits_name_trgm ON habits USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_habits_name_lower ON habits (lower(name) text_pattern_ops)")
+    elif dialect == 'sqlite':
+        op.execute(SQLITE_INDEX)
+        op.execute(SQLITE_TABLE)
+        # Index the habits that already exist.
+        op.execute("INSERT INTO habits_search (habits_search) VALUES ('rebuild')")
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_habits_name_trgm")
+    elif dialect == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            op.execute(f"DROP TRIGGER IF EXISTS habits_search_{trigger}")
+        op.execute("DROP TABLE IF EXISTS habits_search")
+    op.execute("DROP INDEX IF EXISTS ix_habits_name_lower")
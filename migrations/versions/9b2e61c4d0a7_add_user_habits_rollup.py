@@ -0,0 +1,113 @@
+"""add user habits rollup
+
+Revision ID: 9b2e61c4d0a7
+Revises: 2d8c51f0b7e3
+Create Date: 2026-10-18 14:22:31.907214
+
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2e61c4d0a7'
+down_revision = '2d8c51f0b7e3'
+branch_labels = None
+depends_on = None
+
+# 18e71b0d374e created the rollups empty, and every later change only moves
+# them by a delta. Recompute all of them here, as ``flask rebuild-rollups``
+# would; check-in rows are counted in SQL, bitmaps (see bitset.py) here.
+BACKFILL = (
+    "INSERT INTO rollup_habit_names (name, habits, checked) "
+    "SELECT name, count(*), sum(CASE WHEN checked = 'Yes' THEN 1 ELSE 0 END) "
+    "FROM habits GROUP BY name",
+    "INSERT INTO rollup_user_habits (user_id, habits) "
+    "SELECT user_id, count(*) FROM habits GROUP BY user_id",
+    "INSERT INTO rollup_habits_per_user (habits, users) "
+    "SELECT habits, count(*) FROM rollup_user_habits GROUP BY habits",
+    "INSERT INTO rollup_habit_days (day, name, completions) "
+    "SELECT habit_checkins.day, habits.name, count(*) FROM habit_checkins "
+    "JOIN habits ON habits.id = habit_checkins.habit_id GROUP BY habit_checkins.day, habits.name",
+    "INSERT INTO rollup_user_days (day, user_id, completions) "
+    "SELECT habit_checkins.day, habits.user_id, count(*) FROM habit_checkins "
+    "JOIN habits ON habits.id = habit_checkins.habit_id GROUP BY habit_checkins.day, habits.user_id",
+)
+ROLLUP_TABLES = (
+    'rollup_days', 'rollup_habit_days', 'rollup_habit_names',
+    'rollup_habits_per_user', 'rollup_user_days', 'rollup_user_habits',
+)
+
+HABIT_DAYS = sa.table(
+    'rollup_habit_days', sa.column('day', sa.Date), sa.column('name', sa.String),
+    sa.column('completions', sa.Integer),
+)
+USER_DAYS = sa.table(
+    'rollup_user_days', sa.column('day', sa.Date), sa.column('user_id', sa.Integer),
+    sa.column('completions', sa.Integer),
+)
+
+
+def _add(bind, table, counter):
+    # Adds to the rows the check-in rows already made.
+    keys = [column for column in table.c if column.name != "completions"]
+    for key, count in counter.items():
+        match = [column == value for column, value in zip(keys, key)]
+        updated = bind.execute(
+            table.update().where(*match).values(completions=table.c.completions + count)
+        )
+        if not updated.rowcount:
+            bind.execute(
+                table.insert().values(
+                    {**{column.name: value for column, value in zip(keys, key)}, "completions": count}
+                )
+            )
+
+
+def backfill():
+    bind = op.get_bind()
+    for table in ROLLUP_TABLES:
+        op.execute(f"DELETE FROM {table}")
+    for statement in BACKFILL:
+        op.execute(statement)
+
+    habit_days, user_days = Counter(), Counter()
+    rows = bind.execute(sa.text(
+        "SELECT habits.name, habits.user_id, habit_checkin_bitmaps.year, habit_checkin_bitmaps.bits "
+        "FROM habit_checkin_bitmaps JOIN habits ON habits.id = habit_checkin_bitmaps.habit_id"
+    ))
+    for name, user_id, year, bits in rows:
+        value = int.from_bytes(bits or b"", "little")
+        while value:
+            low = value & -value
+            day = date(year, 1, 1) + timedelta(days=low.bit_length() - 1)
+            habit_days[day, name] += 1
+            user_days[day, user_id] += 1
+            value ^= low
+    _add(bind, HABIT_DAYS, habit_days)
+    _add(bind, USER_DAYS, user_days)
+
+    op.execute(
+        "INSERT INTO rollup_days (day, active_users, completions) "
+        "SELECT day, count(*), sum(completions) FROM rollup_user_days GROUP BY day"
+    )
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('rollup_user_habits',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('habits', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # ### end Alembic commands ###
+    backfill()
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('rollup_user_habits')
+    # ### end Alembic commands ###
@@ -0,0 +1,41 @@
+"""cascade user and habit deletes
+
+Revision ID: c3d9e4f1a2b6
+Revises: 58a50d4ca8f7
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9e4f1a2b6'
+down_revision = '58a50d4ca8f7'
+branch_labels = None
+depends_on = None
+
+# The original constraints were created unnamed; this convention gives them
+# PostgreSQL's default names, which is also how SQLite's batch mode finds them.
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+FOREIGN_KEYS = (
+    ('habits', 'user_id', 'users'),
+    ('habit_checkins', 'habit_id', 'habits'),
+    ('habit_checkin_bitmaps', 'habit_id', 'habits'),
+)
+
+
+def replace_foreign_keys(ondelete):
+    for table, column, referred in FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    replace_foreign_keys(None)
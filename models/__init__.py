@@ -1,2 +1,17 @@
 from models.habit import HabitModel 
-from models.user import UserModel 
\ No newline at end of file
+from models.user import UserModel 
+from models.blocklist import TokenBlocklistModel
+from models.checkin import HabitCheckinModel
+from models.checkin_bitmap import HabitCheckinBitmapModel
+from models.import_checkpoint import ImportCheckpointModel
+from models.rollup import (
+    DayRollupModel,
+    HabitDayRollupModel,
+    HabitNameRollupModel,
+    HabitsPerUserRollupModel,
+    UserDayRollupModel,
+    UserHabitsRollupModel,
+)
+from models.job import JobModel
+from models.audit import AuditLogModel
+import models.habit_search  # the name search index, created with habits
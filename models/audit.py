@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from db import db
+
+class AuditLogModel(db.Model):
+    __tablename__ = "audit_log"
+
+    # Chosen when the event happens, so the audit_log job can be run twice
+    # (see jobs.py) without recording it twice.
+    id = db.Column(db.String(32), primary_key=True)
+    # "login", "logout" or "delete".
+    event = db.Column(db.String(16), nullable=False)
+    # No foreign key: the record of a deletion outlives the user.
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    remote_addr = db.Column(db.String(45), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,16 @@
+from db import db
+
+class HabitCheckinModel(db.Model):
+    __tablename__ = "habit_checkins"
+    __table_args__ = (db.UniqueConstraint("habit_id", "day"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, unique=False, nullable=False)
+    # Number of check-ins of this habit up to and including ``day``; lets the
+    # completion rate over any window be answered with a single index seek.
+    running_total = db.Column(db.Integer, unique=False, nullable=False)
+
+    habit_id = db.Column(
+        db.Integer, db.ForeignKey("habits.id", ondelete="CASCADE"), unique=False, nullable=False
+    )
+    habit = db.relationship("HabitModel", back_populates="checkins")
@@ -0,0 +1,11 @@
+from db import db
+
+class HabitCheckinBitmapModel(db.Model):
+    __tablename__ = "habit_checkin_bitmaps"
+
+    habit_id = db.Column(db.Integer, db.ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    # One bit per day of ``year``, see bitset.py.
+    bits = db.Column(db.LargeBinary(46), unique=False, nullable=False)
+
+    habit = db.relationship("HabitModel", back_populates="checkin_bitmaps")
@@ -1,13 +1,228 @@
+import uuid
+from datetime import date, datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import case, delete, insert, select, update
+
+import bitset
 from db import db
+from models.checkin import HabitCheckinModel
+from models.history import STORAGES, BitmapHistory, bitmap_years
+
+
+def default_history_storage():
+    if has_app_context():
+        return current_app.config.get("HABIT_HISTORY_STORAGE", "rows")
+    return "rows"
 
 class HabitModel(db.Model):
     __tablename__ = "habits"
+    __table_args__ = (db.Index("ix_habits_user_id_id", "user_id", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), unique=False, nullable=False)
     checked = db.Column(db.String(3), unique=False, nullable=False)
 
+    # Running counters maintained on every check-in, so streaks never need a
+    # scan of the history. ``current_streak`` is the streak ending at
+    # ``last_checkin``; it only counts as current while that day is today or
+    # yesterday.
+    current_streak = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    longest_streak = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    total_checkins = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_checkin = db.Column(db.Date, nullable=True)
+    # "rows" (habit_checkins) or "bitmap" (habit_checkin_bitmaps), see models/history.py
+    history_storage = db.Column(
+        db.String(6), nullable=False, default=default_history_storage, server_default="rows"
+    )
+
+    # Bumped by the ORM on every UPDATE; drives the ETags in resources/habit.py.
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        server_default=db.func.now(),
+    )
+    __mapper_args__ = {"version_id_col": version}
+    # Lets a multi-row INSERT ... RETURNING (the batch endpoint) hand its ids
+    # back in input order as one statement, SQLite included; SQLAlchemy sorts
+    # the returned rows by this value. Only unique per statement.
+    insert_key = db.Column(db.Uuid, nullable=True, default=uuid.uuid4, insert_sentinel=True)
+
     user_id = db.Column(
-        db.Integer, db.ForeignKey("users.id"), unique=False, nullable=False
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), unique=False, nullable=False
     )
-    user = db.relationship("UserModel", back_populates="habits")
\ No newline at end of file
+    user = db.relationship("UserModel", back_populates="habits")
+    # History rows go with the habit through ON DELETE CASCADE in the database.
+    checkins = db.relationship("HabitCheckinModel", back_populates="habit", lazy="dynamic", cascade="all, delete", passive_deletes=True)
+    checkin_bitmaps = db.relationship("HabitCheckinBitmapModel", back_populates="habit", lazy="dynamic", cascade="all, delete", passive_deletes=True)
+
+    @property
+    def history(self):
+        return STORAGES[self.history_storage](self)
+
+    def check_in(self, day):
+        history = self.history
+        if history.has(day):
+            return False
+
+        if self.last_checkin is None or day > self.last_checkin:
+            if self.last_checkin == day - timedelta(days=1):
+                self.current_streak += 1
+            else:
+                self.current_streak = 1
+            self.total_checkins += 1
+            self.longest_streak = max(self.longest_streak, self.current_streak)
+            self.last_checkin = day
+            history.add(day, self.total_checkins)
+        else:
+            # Back-filling an earlier day shifts every later running total.
+            history.add(day, 0)
+            db.session.flush()
+            self.recount()
+        return True
+
+    def undo_check_in(self, day):
+        if not self.history.remove(day):
+            return False
+        db.session.flush()
+        self.recount()
+        return True
+
+    def recount(self):
+        history = self.history
+        for column, value in history.streaks().items():
+            setattr(self, column, value)
+        history.renumber()
+
+    def convert_history(self, storage):
+        if storage == self.history_storage:
+            return
+        days = self.history.days()
+        self.checkins.delete()
+        self.checkin_bitmaps.delete()
+        self.history_storage = storage
+        history = self.history
+        for running_total, day in enumerate(days, 1):
+            history.add(day, running_total)
+        db.session.flush()
+
+    def streak_as_of(self, today):
+        if self.last_checkin is None or self.last_checkin < today - timedelta(days=1):
+            return 0
+        return self.current_streak
+
+    @staticmethod
+    def checkins_before(day):
+        # Correlated subquery: running total of the last check-in before ``day``.
+        return (
+            select(HabitCheckinModel.running_total)
+            .where(HabitCheckinModel.habit_id == HabitModel.id, HabitCheckinModel.day < day)
+            .order_by(HabitCheckinModel.day.desc())
+            .limit(1)
+            .correlate(HabitModel)
+            .scalar_subquery()
+        )
+
+    def stats(self, days=30, today=None, completed=None, years=None):
+        today = today or date.today()
+        start = today - timedelta(days=days - 1)
+        if self.history_storage == "bitmap":
+            # Straight from the bitsets, all years read once (or passed in).
+            history = BitmapHistory(self)
+            years = history.packed_years() if years is None else years
+            counters = history.streaks(today, years)
+            if completed is None:
+                completed = history.completed_between(start, today, years)
+        else:
+            counters = {
+                "current_streak": self.streak_as_of(today),
+                "longest_streak": self.longest_streak,
+                "total_checkins": self.total_checkins,
+                "last_checkin": self.last_checkin,
+            }
+            if completed is None:
+                completed = self.history.completed_between(start, today)
+        return {
+            "id": self.id,
+            "name": self.name,
+            **counters,
+            "days": days,
+            "completion_rate": completed / days,
+        }
+
+    # Single-statement writes for callers that only hold an id; each one is
+    # scoped to the owner and hands back the columns a habit row shows.
+    @classmethod
+    def create(cls, user_id, name, checked="No"):
+        return db.session.execute(
+            insert(cls)
+            .values(user_id=user_id, name=name, checked=checked)
+            .returning(cls.id, cls.name, cls.checked)
+        ).one()
+
+    @classmethod
+    def set_checked(cls, habit_id, user_id, checked=None):
+        """Set ``checked`` (flip it when None); returns None if nothing changed.
+
+        Setting the value a habit already has is not a write, so the caller
+        knows a returned row really was switched.
+        """
+        stmt = update(cls).where(cls.id == habit_id, cls.user_id == user_id)
+        if checked is None:
+            checked = case((cls.checked == "Yes", "No"), else_="Yes")
+        else:
+            stmt = stmt.where(cls.checked != checked)
+        return db.session.execute(
+            stmt.values(checked=checked, version=cls.version + 1).returning(
+                cls.id, cls.name, cls.checked
+            ),
+            execution_options={"synchronize_session": False},
+        ).first()
+
+    @classmethod
+    def owned_row(cls, habit_id, user_id):
+        return db.session.execute(
+            select(cls.id, cls.name, cls.checked).where(cls.id == habit_id, cls.user_id == user_id)
+        ).first()
+
+    @classmethod
+    def delete_owned(cls, habit_ids, user_id):
+        """Delete the given habits of ``user_id``; returns the deleted ids."""
+        # Their history goes with them through ON DELETE CASCADE.
+        return db.session.scalars(
+            delete(cls).where(cls.id.in_(habit_ids), cls.user_id == user_id).returning(cls.id),
+            execution_options={"synchronize_session": False},
+        ).all()
+
+    @classmethod
+    def stats_for_user(cls, user_id, days=30, today=None):
+        # Rows-mode habits get their window count from the correlated
+        # subquery; bitmap-mode habits from one extra query for their years.
+        today = today or date.today()
+        start = today - timedelta(days=days - 1)
+        rows = db.session.execute(
+            select(cls, cls.checkins_before(start))
+            .where(cls.user_id == user_id)
+            .order_by(cls.id)
+        ).all()
+
+        years = bitmap_years([habit.id for habit, _ in rows if habit.history_storage == "bitmap"])
+        results = []
+        for habit, before in rows:
+            if habit.history_storage == "bitmap":
+                results.append(habit.stats(days, today, years=years[habit.id]))
+            else:
+                results.append(habit.stats(days, today, habit.total_checkins - (before or 0)))
+        return results
+
+    def year_summary(self, year):
+        bits = self.history.year_bits(year)
+        return {
+            "year": year,
+            "total": bitset.count_range(bitset.to_int(bits), 0, bitset.days_in_year(year) - 1),
+            "weeks": bitset.weekly_counts(bits, year),
+            "heatmap": bitset.heatmap(bits, year),
+        }
@@ -0,0 +1,47 @@
+"""
+The indexes behind habit name search (search.py). ``db.create_all`` makes them
+with the habits table; migration 2d8c51f0b7e3 adds them to existing databases.
+
+Both get ``ix_habits_name_lower`` for equal and prefix names. PostgreSQL also
+gets a trigram GIN index on ``habits.name`` (the pg_trgm extension), which
+the database keeps current by itself. SQLite gets ``habits_search``, an FTS5
+table with the trigram tokenizer (SQLite 3.34+). It keeps no copy of the
+names (``content='habits'``), and triggers on habits keep it in step with
+every insert, rename and delete, ON DELETE CASCADE and ``flask import``
+included. A batch migration that rebuilds habits on SQLite
+drops the triggers with the old table and has to create them again.
+"""
+
+from sqlalchemy import DDL, event
+
+from models.habit import HabitModel
+
+SQLITE_INDEX = "CREATE INDEX ix_habits_name_lower ON habits (lower(name))"
+SQLITE_TABLE = (
+    "CREATE VIRTUAL TABLE habits_search USING fts5("
+    "name, content='habits', content_rowid='id', tokenize='trigram')"
+)
+SQLITE_TRIGGERS = (
+    "CREATE TRIGGER habits_search_insert AFTER INSERT ON habits BEGIN "
+    "INSERT INTO habits_search (rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER habits_search_delete AFTER DELETE ON habits BEGIN "
+    "INSERT INTO habits_search (habits_search, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER habits_search_update AFTER UPDATE OF name ON habits BEGIN "
+    "INSERT INTO habits_search (habits_search, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO habits_search (rowid, name) VALUES (new.id, new.name); END",
+)
+POSTGRES_INDEX = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX ix_habits_name_trgm ON habits USING gin (name gin_trgm_ops)",
+    "CREATE INDEX ix_habits_name_lower ON habits (lower(name) text_pattern_ops)",
+)
+
+for statement in (SQLITE_INDEX, SQLITE_TABLE, *SQLITE_TRIGGERS):
+    event.listen(HabitModel.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    HabitModel.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS habits_search").execute_if(dialect="sqlite"),
+)
+for statement in POSTGRES_INDEX:
+    event.listen(HabitModel.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
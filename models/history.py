@@ -0,0 +1,187 @@
+"""
+Storage strategies for a habit's check-in history.
+
+``RowHistory`` keeps one ``habit_checkins`` row per completed day.
+``BitmapHistory`` packs each year into a 46-byte bitset in
+``habit_checkin_bitmaps``. ``HabitModel`` picks one from its
+``history_storage`` column and only talks to the interface below.
+
+``streaks`` recomputes a habit's counters from its history: a walk over the
+days for rows, the bitset helpers on the joined years for bitmaps.
+"""
+
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+import bitset
+from db import db
+from models.checkin import HabitCheckinModel
+from models.checkin_bitmap import HabitCheckinBitmapModel
+
+
+class RowHistory:
+    def __init__(self, habit):
+        self.habit = habit
+
+    def has(self, day):
+        return self.habit.checkins.filter_by(day=day).first() is not None
+
+    def add(self, day, running_total):
+        db.session.add(
+            HabitCheckinModel(habit=self.habit, day=day, running_total=running_total)
+        )
+
+    def remove(self, day):
+        checkin = self.habit.checkins.filter_by(day=day).first()
+        if checkin is None:
+            return False
+        db.session.delete(checkin)
+        return True
+
+    def days(self):
+        return db.session.execute(
+            select(HabitCheckinModel.day)
+            .where(HabitCheckinModel.habit_id == self.habit.id)
+            .order_by(HabitCheckinModel.day)
+        ).scalars().all()
+
+    def streaks(self, today=None):
+        counters = {"current_streak": 0, "longest_streak": 0, "total_checkins": 0, "last_checkin": None}
+        for day in self.days():
+            if counters["last_checkin"] == day - timedelta(days=1):
+                counters["current_streak"] += 1
+            else:
+                counters["current_streak"] = 1
+            counters["total_checkins"] += 1
+            counters["longest_streak"] = max(counters["longest_streak"], counters["current_streak"])
+            counters["last_checkin"] = day
+        last = counters["last_checkin"]
+        if today is not None and (last is None or last < today - timedelta(days=1)):
+            counters["current_streak"] = 0
+        return counters
+
+    def renumber(self):
+        for running_total, checkin in enumerate(self.habit.checkins.order_by("day"), 1):
+            checkin.running_total = running_total
+
+    def completed_between(self, start, end):
+        before = db.session.execute(
+            select(type(self.habit).checkins_before(start)).where(
+                type(self.habit).id == self.habit.id
+            )
+        ).scalar()
+        return self.habit.total_checkins - (before or 0)
+
+    def year_bits(self, year):
+        days = db.session.execute(
+            select(HabitCheckinModel.day).where(
+                HabitCheckinModel.habit_id == self.habit.id,
+                HabitCheckinModel.day.between(date(year, 1, 1), date(year, 12, 31)),
+            )
+        ).scalars()
+        value = 0
+        for day in days:
+            value |= 1 << bitset.day_index(day)
+        return bitset.from_int(value)
+
+
+class BitmapHistory:
+    def __init__(self, habit):
+        self.habit = habit
+
+    def _row(self, year, create=False):
+        row = db.session.get(HabitCheckinBitmapModel, (self.habit.id, year))
+        if row is None and create:
+            row = HabitCheckinBitmapModel(habit=self.habit, year=year, bits=bitset.empty())
+            db.session.add(row)
+        return row
+
+    def has(self, day):
+        row = self._row(day.year)
+        return row is not None and bitset.has_day(row.bits, bitset.day_index(day))
+
+    def add(self, day, running_total):
+        row = self._row(day.year, create=True)
+        row.bits = bitset.with_day(row.bits, bitset.day_index(day))
+
+    def remove(self, day):
+        row = self._row(day.year)
+        if row is None or not bitset.has_day(row.bits, bitset.day_index(day)):
+            return False
+        row.bits = bitset.with_day(row.bits, bitset.day_index(day), False)
+        return True
+
+    def packed_years(self, first_year=None, last_year=None):
+        query = select(HabitCheckinBitmapModel.year, HabitCheckinBitmapModel.bits).where(
+            HabitCheckinBitmapModel.habit_id == self.habit.id
+        )
+        if first_year is not None:
+            query = query.where(HabitCheckinBitmapModel.year.between(first_year, last_year))
+        return dict(db.session.execute(query).all())
+
+    def days(self):
+        years = self.packed_years()
+        if not years:
+            return []
+        first, last = min(years), max(years)
+        value = bitset.join_years(years, first, last)
+        return list(bitset.set_days(value, date(first, 1, 1)))
+
+    def streaks(self, today=None, years=None):
+        """The counters of ``HabitModel``, from the packed years.
+
+        ``current_streak`` ends at ``last_checkin``; given ``today``, it is
+        the streak still running then (ending today or yesterday), else 0.
+        """
+        if years is None:
+            years = self.packed_years()
+        years = {year: bits for year, bits in years.items() if bitset.to_int(bits)}
+        if not years:
+            return {"current_streak": 0, "longest_streak": 0, "total_checkins": 0, "last_checkin": None}
+        first = date(min(years), 1, 1)
+        value = bitset.join_years(years, first.year, max(years))
+        last = value.bit_length() - 1
+        end = last
+        if today is not None:
+            end = (today - first).days
+            if end < 0 or not value >> end & 1:
+                end -= 1
+        return {
+            "current_streak": bitset.run_ending_at(value, end) if end >= 0 else 0,
+            "longest_streak": bitset.longest_run(value),
+            "total_checkins": value.bit_count(),
+            "last_checkin": first + timedelta(days=last),
+        }
+
+    def renumber(self):
+        pass
+
+    def completed_between(self, start, end, years=None):
+        if years is None:
+            years = self.packed_years(start.year, end.year)
+        value = bitset.join_years(years, start.year, end.year)
+        offset = (start - date(start.year, 1, 1)).days
+        return bitset.count_range(value, offset, offset + (end - start).days)
+
+    def year_bits(self, year):
+        row = self._row(year)
+        return row.bits if row is not None else bitset.empty()
+
+
+STORAGES = {"rows": RowHistory, "bitmap": BitmapHistory}
+
+
+def bitmap_years(habit_ids):
+    """Every packed year of the given bitmap-mode habits, by habit id."""
+    years = {habit_id: {} for habit_id in habit_ids}
+    if habit_ids:
+        for habit_id, year, bits in db.session.execute(
+            select(
+                HabitCheckinBitmapModel.habit_id,
+                HabitCheckinBitmapModel.year,
+                HabitCheckinBitmapModel.bits,
+            ).where(HabitCheckinBitmapModel.habit_id.in_(habit_ids))
+        ):
+            years[habit_id][year] = bits
+    return years
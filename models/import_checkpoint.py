@@ -0,0 +1,13 @@
+from datetime import datetime
+
+from db import db
+
+class ImportCheckpointModel(db.Model):
+    __tablename__ = "import_checkpoints"
+
+    # One row per input file, see bulk_import.py. Updated in the same
+    # transaction as the chunk it records, so a resumed import never loads a
+    # chunk twice.
+    key = db.Column(db.String(255), primary_key=True)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
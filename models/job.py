@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from db import db
+
+class JobModel(db.Model):
+    __tablename__ = "jobs"
+    # Workers claim the oldest due job of status "queued" off this index.
+    __table_args__ = (db.Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    # Enqueueing again with the same key returns the existing job, see jobs.py.
+    key = db.Column(db.String(255), unique=True, nullable=True)
+    # Who may look the job up through /jobs; no foreign key, a purge job
+    # outlives its user.
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+
+    # "queued", "running", "done" or "failed".
+    status = db.Column(db.String(8), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    worker = db.Column(db.String(64), nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
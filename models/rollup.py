@@ -0,0 +1,59 @@
+from db import db
+
+# Summary tables maintained by rollups.py. They hold derived counts only, so
+# none of them references users or habits: a cascading delete must not remove
+# rows that rollups.py still has to decrement.
+
+class HabitDayRollupModel(db.Model):
+    __tablename__ = "rollup_habit_days"
+    # The busiest habits of a day are read straight off this index.
+    __table_args__ = (db.Index("ix_rollup_habit_days_day_completions", "day", "completions"),)
+
+    day = db.Column(db.Date, primary_key=True)
+    name = db.Column(db.String(80), primary_key=True)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UserDayRollupModel(db.Model):
+    __tablename__ = "rollup_user_days"
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DayRollupModel(db.Model):
+    __tablename__ = "rollup_days"
+
+    day = db.Column(db.Date, primary_key=True)
+    # Users with at least one check-in on ``day`` (rows of rollup_user_days
+    # above zero), and all check-ins of that day.
+    active_users = db.Column(db.Integer, nullable=False, default=0)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+
+
+class HabitNameRollupModel(db.Model):
+    __tablename__ = "rollup_habit_names"
+
+    name = db.Column(db.String(80), primary_key=True)
+    habits = db.Column(db.Integer, nullable=False, default=0, index=True)
+    checked = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UserHabitsRollupModel(db.Model):
+    __tablename__ = "rollup_user_habits"
+
+    # Habits each user owns. Moved with ON CONFLICT DO UPDATE ... RETURNING,
+    # which tells a writer the count before and after its own change even
+    # when another transaction changes the same user's habits.
+    user_id = db.Column(db.Integer, primary_key=True)
+    habits = db.Column(db.Integer, nullable=False, default=0)
+
+
+class HabitsPerUserRollupModel(db.Model):
+    __tablename__ = "rollup_habits_per_user"
+
+    # Number of users owning exactly ``habits`` habits (users without any are
+    # not counted).
+    habits = db.Column(db.Integer, primary_key=True)
+    users = db.Column(db.Integer, nullable=False, default=0)
@@ -1,11 +1,25 @@
+from datetime import datetime
+
 from db import db
-from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
 
-class UserModel(db.Model, UserMixin):
+class UserModel(db.Model):
     __tablename__ = "users"
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     pwd = db.Column(db.String(256), unique=False, nullable=False)
 
-    habits = db.relationship("HabitModel", back_populates="user", lazy="dynamic", cascade="all, delete")
\ No newline at end of file
+    # Bumped by the ORM on every UPDATE; drives the ETags in resources/user.py.
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        server_default=db.func.now(),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+    # Deleting a user is one DELETE; habits and their history go with it
+    # through ON DELETE CASCADE instead of being loaded and deleted one by one.
+    habits = db.relationship("HabitModel", back_populates="user", lazy="dynamic", cascade="all, delete", passive_deletes=True)
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+openapi.py
+
+flask-smorest's ``Api`` builds the whole OpenAPI document while the app is
+created: every blueprint's views and schemas are walked by apispec in
+``register_blueprint``. That is most of the cost of ``create_app`` and none of
+it is needed to serve a request. This ``Api`` registers the blueprints right
+away but only builds the document the first time ``spec`` is read (the
+``/openapi.json`` and docs pages, or ``flask openapi``), and serves the JSON it
+rendered from then on.
+
+With ``OPENAPI_SPEC_FILE`` set, ``/openapi.json`` serves that file instead, so
+a deployment can ship the document written at build time with
+
+    flask openapi write openapi.json
+"""
+
+import json
+from threading import Lock
+
+import flask_smorest
+from flask import current_app
+from flask_smorest.spec import openapi_cli
+
+
+class Api(flask_smorest.Api):
+    def __init__(self, app=None, **kwargs):
+        self._spec = None
+        self._spec_init = None
+        self._pending_docs = []
+        self._spec_json = None
+        self._spec_lock = Lock()
+        super().__init__(app, **kwargs)
+
+    @property
+    def spec(self):
+        if self._spec is None and self._spec_init is not None:
+            with self._spec_lock:
+                if self._spec is None:
+                    self._build_spec()
+        return self._spec
+
+    @spec.setter
+    def spec(self, value):
+        self._spec = value
+
+    def _init_spec(self, **kwargs):
+        self._spec_init = kwargs
+        self._app.cli.add_command(openapi_cli)
+
+    def _build_spec(self):
+        super()._init_spec(**self._spec_init)
+        for blp, name, parameters in self._pending_docs:
+            blp.register_views_in_doc(self, self._app, self._spec, name=name, parameters=parameters)
+            self._spec.tag({"name": name, "description": blp.description})
+        self._pending_docs = []
+
+    def register_blueprint(self, blp, *, parameters=None, **options):
+        name = options.get("name", blp.name)
+        self._app.extensions["flask-smorest"]["blp_name_to_api"][name] = self
+        self._app.register_blueprint(blp, **options)
+        if self._spec is None:
+            self._pending_docs.append((blp, name, parameters))
+        else:
+            blp.register_views_in_doc(self, self._app, self._spec, name=name, parameters=parameters)
+            self._spec.tag({"name": name, "description": blp.description})
+
+    def _openapi_json(self):
+        if self._spec_json is None:
+            path = current_app.config.get("OPENAPI_SPEC_FILE")
+            if path:
+                with current_app.open_instance_resource(path) as f:
+                    self._spec_json = f.read().decode()
+            else:
+                self._spec_json = json.dumps(self.spec.to_dict(), indent=2)
+        return current_app.response_class(self._spec_json, mimetype="application/json")
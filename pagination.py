@@ -0,0 +1,53 @@
+"""
+pagination.py
+
+Keyset (cursor) pagination helpers. Pages are selected with ``WHERE id > :last``
+on an ordered index instead of OFFSET, so fetching page N costs the same as
+fetching page 1. The cursor handed to clients is opaque: it only encodes the
+last id of the previous page.
+"""
+
+import base64
+import binascii
+
+from flask_smorest import abort
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        abort(400, message="Invalid cursor.")
+
+
+def page_size(limit):
+    return min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+
+def keyset_filter(query, column, cursor, limit):
+    """Narrow ``query`` (a Query or a Select) to one page, plus one row to
+    tell whether there is a next page."""
+    if cursor:
+        query = query.filter(column > decode_cursor(cursor))
+    return query.order_by(column).limit(limit + 1)
+
+
+def keyset_split(rows, column, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], column.key))
+    return rows, next_cursor
+
+
+def keyset_page(query, column, cursor=None, limit=None):
+    limit = page_size(limit)
+    return keyset_split(keyset_filter(query, column, cursor, limit).all(), column, limit)
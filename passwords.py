@@ -0,0 +1,121 @@
+"""
+passwords.py
+
+Password hashing service. The pbkdf2 cost is configurable through
+``PASSWORD_HASH_ROUNDS``; hashes made with different rounds still verify and
+are transparently re-hashed with the current cost on the next successful
+login. Hashing and verification run in a bounded process pool
+(``PASSWORD_HASH_WORKERS`` processes, 0 runs them inline) so a burst of logins
+can use at most that many cores, leaving the rest for other requests, and the
+request thread waits without holding the GIL. ``hash_async`` and
+``verify_async`` are for coroutines (asgi.py): the event loop awaits the same
+pool and keeps serving other requests meanwhile.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from flask import current_app
+
+DEFAULT_ROUNDS = 29000
+
+
+@lru_cache(maxsize=8)
+def crypt_context(rounds):
+    # passlib is only needed once a password is hashed or checked.
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__rounds=rounds)
+
+
+def _hash(rounds, secret):
+    return crypt_context(rounds).hash(secret)
+
+
+def _verify(rounds, secret, hashed):
+    return crypt_context(rounds).verify_and_update(secret, hashed)
+
+
+class _HasherState:
+    def __init__(self, app):
+        self.rounds = app.config["PASSWORD_HASH_ROUNDS"]
+        self.workers = app.config["PASSWORD_HASH_WORKERS"]
+        self.timeout = app.config["PASSWORD_HASH_TIMEOUT"]
+        self._executor = None
+        self._pid = None
+
+    @property
+    def executor(self):
+        # Created lazily, and again after a fork, so every gunicorn worker
+        # gets its own pool instead of inheriting the master's.
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def run(self, func, *args):
+        if not self.workers:
+            return func(self.rounds, *args)
+        return self.executor.submit(func, self.rounds, *args).result(self.timeout)
+
+    async def run_async(self, func, *args):
+        if not self.workers:
+            return func(self.rounds, *args)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, partial(func, self.rounds), *args)
+        return await asyncio.wait_for(future, self.timeout)
+
+    def map(self, func, items):
+        if not self.workers:
+            return [func(self.rounds, item) for item in items]
+        return list(self.executor.map(partial(func, self.rounds), items, chunksize=32))
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("PASSWORD_HASH_ROUNDS", DEFAULT_ROUNDS)
+        app.config.setdefault("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))
+        app.config.setdefault("PASSWORD_HASH_TIMEOUT", 10)
+        app.extensions["passwords"] = _HasherState(app)
+
+    @property
+    def _state(self):
+        return current_app.extensions["passwords"]
+
+    def hash(self, secret):
+        return self._state.run(_hash, secret)
+
+    async def hash_async(self, secret):
+        return await self._state.run_async(_hash, secret)
+
+    def hash_many(self, secrets):
+        """Hash a batch across the whole pool, for bulk imports."""
+        return self._state.map(_hash, secrets)
+
+    def is_hash(self, value):
+        return crypt_context(self._state.rounds).identify(value) is not None
+
+    def verify(self, secret, hashed):
+        """Return ``(valid, new_hash)``; ``new_hash`` is set when the stored
+        hash was made with outdated parameters and should be replaced."""
+        return self._state.run(_verify, secret, hashed)
+
+    async def verify_async(self, secret, hashed):
+        return await self._state.run_async(_verify, secret, hashed)
+
+
+passwords = PasswordHasher()
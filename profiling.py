@@ -0,0 +1,289 @@
+"""
+profiling.py
+
+Opt-in request profiling (``PROFILING_ENABLED``). For every request it records
+the wall time, the number of SQL statements and the time spent in them
+(SQLAlchemy cursor events) and the time spent dumping the app's schemas
+(``CompiledSchema.dump_hook``).
+Each request is logged as one JSON line on the ``profiling`` logger, and the
+per-endpoint totals are served in Prometheus text format at
+``PROFILING_METRICS_PATH``. Metrics are per process; scrape every worker or
+run a single one.
+
+With ``PROFILING_SAMPLE_SLOW`` a background thread samples the stacks of
+requests that have been running for longer than ``PROFILING_SLOW_MS`` every
+``PROFILING_SAMPLE_INTERVAL_MS``, and the most frequent stacks are logged with
+the request once it finishes.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from db import db
+from serializers import CompiledSchema
+
+logger = logging.getLogger("profiling")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """Per-endpoint counters and a latency histogram, in Prometheus format."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._totals = defaultdict(float)
+
+    def observe(self, endpoint, method, status, seconds, sql_count, sql_seconds, dump_seconds, slow):
+        labels = (endpoint, method, str(status))
+        with self._lock:
+            counts, total, requests = self._histograms.get(labels, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[index] += 1
+            self._histograms[labels] = counts, total + seconds, requests + 1
+            self._totals["sql_statements", endpoint] += sql_count
+            self._totals["sql_seconds", endpoint] += sql_seconds
+            self._totals["dump_seconds", endpoint] += dump_seconds
+            if slow:
+                self._totals["slow", endpoint] += 1
+
+    def render(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+            totals = dict(self._totals)
+
+        lines = [
+            "# HELP http_request_duration_seconds Request wall time.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (endpoint, method, status), (counts, total, requests) in sorted(histograms.items()):
+            labels = f'endpoint="{endpoint}",method="{method}",status="{status}"'
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {requests}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {total}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {requests}")
+
+        for name, key, kind, help_text in (
+            ("db_statements_total", "sql_statements", "counter", "SQL statements executed."),
+            ("db_statement_seconds_total", "sql_seconds", "counter", "Time spent executing SQL."),
+            ("serialization_seconds_total", "dump_seconds", "counter", "Time spent dumping schemas."),
+            ("slow_requests_total", "slow", "counter", "Requests over PROFILING_SLOW_MS."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, endpoint), value in sorted(totals.items()):
+                if metric == key:
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+class StackSampler:
+    """Samples the stacks of registered threads once they run past ``slow_after``."""
+
+    def __init__(self, slow_after, interval):
+        self.slow_after = slow_after
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self, thread_id):
+        self._ensure_thread()
+        with self._lock:
+            self._active[thread_id] = (time.perf_counter(), Counter())
+
+    def stop(self, thread_id):
+        with self._lock:
+            _, samples = self._active.pop(thread_id, (None, Counter()))
+        return samples
+
+    def _ensure_thread(self):
+        # Started lazily, and again after a fork, like the hashing pool.
+        if self._thread is None or self._pid != os.getpid():
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.sample()
+
+    def sample(self):
+        now = time.perf_counter()
+        with self._lock:
+            due = {
+                thread_id: samples
+                for thread_id, (started, samples) in self._active.items()
+                if now - started >= self.slow_after
+            }
+        if not due:
+            return
+        frames = sys._current_frames()
+        for thread_id, samples in due.items():
+            frame = frames.get(thread_id)
+            if frame is not None:
+                stack = traceback.extract_stack(frame)
+                samples[";".join(
+                    f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+                    for entry in stack
+                )] += 1
+
+
+def _timed_dump(schema, dump, obj, many):
+    profile = g.get("_profile") if has_request_context() else None
+    if profile is None or profile["dumping"]:
+        return dump(obj, many=many)
+    # Nested schemas call dump() too; only the outermost call is timed.
+    profile["dumping"] = True
+    start = time.perf_counter()
+    try:
+        return dump(obj, many=many)
+    finally:
+        profile["dump_seconds"] += time.perf_counter() - start
+        profile["dumping"] = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "_profile" in g:
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("profile_start")
+    if not starts:
+        return
+    start = starts.pop()
+    if has_request_context() and "_profile" in g:
+        g._profile["sql_count"] += 1
+        g._profile["sql_seconds"] += time.perf_counter() - start
+
+
+def _handle_error(context):
+    # A failed statement skips after_cursor_execute; without this its start
+    # would stay on the pooled connection and be paired with the next one.
+    if context.connection is not None and context.execution_context is not None:
+        _after_cursor_execute(context.connection, None, None, None, None, False)
+
+
+def watch_engine(engine):
+    """Count ``engine``'s statements in the request profile (the async
+    engine of asgi.py passes its ``sync_engine``)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+class RequestProfiler:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("PROFILING_ENABLED", False)
+        app.config.setdefault("PROFILING_METRICS_PATH", "/metrics")
+        app.config.setdefault("PROFILING_SLOW_MS", 500)
+        app.config.setdefault("PROFILING_SAMPLE_SLOW", True)
+        app.config.setdefault("PROFILING_SAMPLE_INTERVAL_MS", 10)
+        app.config.setdefault("PROFILING_TOP_STACKS", 5)
+        if not app.config["PROFILING_ENABLED"]:
+            return
+
+        app.extensions["profiling"] = RequestMetrics()
+        if app.config["PROFILING_SAMPLE_SLOW"]:
+            app.extensions["profiling_sampler"] = StackSampler(
+                app.config["PROFILING_SLOW_MS"] / 1000,
+                app.config["PROFILING_SAMPLE_INTERVAL_MS"] / 1000,
+            )
+        CompiledSchema.dump_hook = _timed_dump
+        with app.app_context():
+            for engine in db.engines.values():
+                watch_engine(engine)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.add_url_rule(app.config["PROFILING_METRICS_PATH"], "metrics", self.metrics)
+
+    def _start(self):
+        if request.endpoint == "metrics":
+            return
+        g._profile = {
+            "start": time.perf_counter(),
+            "sql_count": 0,
+            "sql_seconds": 0.0,
+            "dump_seconds": 0.0,
+            "dumping": False,
+        }
+        sampler = current_app.extensions.get("profiling_sampler")
+        if sampler:
+            sampler.start(threading.get_ident())
+
+    def _finish(self, response):
+        profile = g.pop("_profile", None)
+        if profile is None:
+            return response
+        seconds = time.perf_counter() - profile["start"]
+        slow = seconds * 1000 >= current_app.config["PROFILING_SLOW_MS"]
+        endpoint = request.endpoint or "unmatched"
+
+        current_app.extensions["profiling"].observe(
+            endpoint,
+            request.method,
+            response.status_code,
+            seconds,
+            profile["sql_count"],
+            profile["sql_seconds"],
+            profile["dump_seconds"],
+            slow,
+        )
+        record = {
+            "endpoint": endpoint,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(seconds * 1000, 3),
+            "sql_count": profile["sql_count"],
+            "sql_ms": round(profile["sql_seconds"] * 1000, 3),
+            "dump_ms": round(profile["dump_seconds"] * 1000, 3),
+        }
+        sampler = current_app.extensions.get("profiling_sampler")
+        if sampler:
+            samples = sampler.stop(threading.get_ident())
+            if slow and samples:
+                top = current_app.config["PROFILING_TOP_STACKS"]
+                record["stacks"] = [
+                    {"samples": count, "stack": stack} for stack, count in samples.most_common(top)
+                ]
+        (logger.warning if slow else logger.info)(json.dumps(record))
+        return response
+
+    def _teardown(self, exc):
+        # after_request is skipped when a view raises; don't leak the entry.
+        sampler = current_app.extensions.get("profiling_sampler")
+        if sampler:
+            sampler.stop(threading.get_ident())
+
+    def metrics(self):
+        return Response(
+            current_app.extensions["profiling"].render(),
+            mimetype="text/plain; version=0.0.4",
+        )
+
+
+profiler = RequestProfiler()
@@ -0,0 +1,93 @@
+"""
+purge.py
+
+User deletion. Habits and their history reference their owner with
+``ON DELETE CASCADE``, so deleting a user is one ``DELETE FROM users`` and the
+database removes the rest in the same statement, however many habits there
+are.
+
+For very large accounts that single statement is still one long transaction
+holding its locks until the end. Accounts with more than
+``USER_PURGE_THRESHOLD`` habits are therefore purged in chunks of
+``USER_PURGE_CHUNK_SIZE`` habits, committing after each chunk and deleting the
+user row last, by a ``purge_user`` job (``User.delete`` answers 202, see
+jobs.py) or with ``flask purge-user``. Until the last chunk is done the
+account still exists; a purge that is interrupted simply continues when the
+job is retried.
+"""
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from db import db
+from jobs import job_queue, task
+from models import HabitModel, UserModel
+from rollups import rollups
+
+
+def habit_count(user_id):
+    return db.session.scalar(select(func.count()).where(HabitModel.user_id == user_id))
+
+
+def delete_user_row(user_id):
+    rollups.habits_removed(HabitModel.user_id == user_id)
+    deleted = db.session.execute(
+        delete(UserModel).where(UserModel.id == user_id),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def purge_user(user_id, chunk_size=None):
+    """Delete the user's habits chunk by chunk, then the user; returns the habit count."""
+    chunk_size = chunk_size or current_app.config["USER_PURGE_CHUNK_SIZE"]
+    purged = 0
+    while True:
+        chunk = db.session.scalars(
+            select(HabitModel.id).where(HabitModel.user_id == user_id).limit(chunk_size)
+        ).all()
+        rollups.habits_removed(HabitModel.id.in_(chunk))
+        deleted = db.session.execute(
+            delete(HabitModel).where(HabitModel.id.in_(chunk)),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        db.session.commit()
+        purged += deleted
+        if deleted < chunk_size:
+            break
+    delete_user_row(user_id)
+    return purged
+
+
+@task("purge_user")
+def purge_user_job(user_id):
+    return {"habits": purge_user(user_id)}
+
+
+class UserPurge:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("USER_PURGE_THRESHOLD", 10000)
+        app.config.setdefault("USER_PURGE_CHUNK_SIZE", 1000)
+
+    def delete_user(self, user_id):
+        """Delete the user now, or queue a chunked purge and return its job.
+
+        The job belongs to the user being purged, whose token can still poll
+        it through /jobs/<id> after the account is gone.
+        """
+        if habit_count(user_id) <= current_app.config["USER_PURGE_THRESHOLD"]:
+            delete_user_row(user_id)
+            return None
+        job = job_queue.enqueue(
+            "purge_user", {"user_id": user_id}, key=f"purge-user:{user_id}", user_id=user_id
+        )
+        db.session.commit()
+        return job
+
+
+user_purge = UserPurge()
@@ -0,0 +1,184 @@
+"""
+ratelimit.py
+
+Login throttling. Every login attempt is counted per username and per client
+IP with a sliding-window counter (the current and previous fixed windows,
+weighted by how far into the current window we are), and attempts over the
+limit are rejected before the user lookup or the password hash runs.
+
+Limits are written as "<attempts>/<seconds>" in ``LOGIN_RATELIMIT_USER`` and
+``LOGIN_RATELIMIT_IP``. State is kept either in process memory or in a small
+SQLite file (``LOGIN_RATELIMIT_BACKEND = "sqlite"``, the default) that all
+gunicorn workers on the host share. Both are capped at
+``LOGIN_RATELIMIT_MAX_KEYS`` keys, evicting the least recently used.
+"""
+
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import current_app
+
+
+def parse_limit(limit):
+    attempts, seconds = limit.split("/")
+    return int(attempts), float(seconds)
+
+
+def _slide(window, prev, curr, now, period):
+    # Roll the stored windows forward to the window containing ``now``.
+    current = math.floor(now / period)
+    if window == current:
+        return current, prev, curr
+    if window == current - 1:
+        return current, curr, 0
+    return current, 0, 0
+
+
+def _estimate(window, prev, curr, now, period):
+    elapsed = now / period - window
+    return prev * (1 - elapsed) + curr
+
+
+class MemoryBackend:
+    def __init__(self, max_keys, max_period=None):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, attempts, period, now):
+        with self._lock:
+            window, prev, curr = _slide(*self._counters.get(key, (0, 0, 0)), now, period)
+            allowed = _estimate(window, prev, curr, now, period) < attempts
+            if allowed:
+                curr += 1
+            self._counters[key] = (window, prev, curr)
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+            return allowed
+
+
+class SQLiteBackend:
+    # Enforcing the hard key cap needs a scan, so it only runs on roughly one
+    # new key in this many; stale keys are pruned on every new key.
+    CAP_CHECK_EVERY = 1000
+
+    def __init__(self, path, max_keys, max_period):
+        self.path = path
+        self.max_keys = max_keys
+        self.max_period = max_period
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                "key TEXT PRIMARY KEY, window INTEGER, prev INTEGER, curr INTEGER, touched REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_counters_touched ON counters (touched)")
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across threads or a fork.
+        if getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def hit(self, key, attempts, period, now):
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT window, prev, curr FROM counters WHERE key = ?", (key,)
+            ).fetchone()
+            window, prev, curr = _slide(*(row or (0, 0, 0)), now, period)
+            allowed = _estimate(window, prev, curr, now, period) < attempts
+            if allowed:
+                curr += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO counters (key, window, prev, curr, touched) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, window, prev, curr, now),
+            )
+            if row is None:
+                self._evict(conn, now - 2 * self.max_period)
+            return allowed
+
+    def _evict(self, conn, stale_before):
+        conn.execute("DELETE FROM counters WHERE touched < ?", (stale_before,))
+        if random.randrange(self.CAP_CHECK_EVERY) == 0:
+            conn.execute(
+                "DELETE FROM counters WHERE key IN (SELECT key FROM counters "
+                "ORDER BY touched DESC LIMIT -1 OFFSET ?)",
+                (self.max_keys,),
+            )
+
+
+BACKENDS = {"memory": MemoryBackend, "sqlite": SQLiteBackend}
+
+
+class _LimiterState:
+    def __init__(self, app):
+        config = app.config
+        self.limits = {
+            "user": parse_limit(config["LOGIN_RATELIMIT_USER"]),
+            "ip": parse_limit(config["LOGIN_RATELIMIT_IP"]),
+        }
+        backend = BACKENDS[config["LOGIN_RATELIMIT_BACKEND"]]
+        max_period = max(period for _, period in self.limits.values())
+        if backend is SQLiteBackend:
+            self.backend = backend(
+                config["LOGIN_RATELIMIT_PATH"], config["LOGIN_RATELIMIT_MAX_KEYS"], max_period
+            )
+        else:
+            self.backend = backend(config["LOGIN_RATELIMIT_MAX_KEYS"], max_period)
+
+
+class LoginLimiter:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("LOGIN_RATELIMIT_ENABLED", True)
+        app.config.setdefault("LOGIN_RATELIMIT_USER", "10/300")
+        app.config.setdefault("LOGIN_RATELIMIT_IP", "100/300")
+        app.config.setdefault("LOGIN_RATELIMIT_BACKEND", "sqlite")
+        app.config.setdefault(
+            "LOGIN_RATELIMIT_PATH", os.path.join(app.instance_path, "ratelimit.sqlite")
+        )
+        app.config.setdefault("LOGIN_RATELIMIT_MAX_KEYS", 100000)
+        if app.config["LOGIN_RATELIMIT_BACKEND"] == "sqlite":
+            os.makedirs(os.path.dirname(app.config["LOGIN_RATELIMIT_PATH"]), exist_ok=True)
+        app.extensions["login_limiter"] = _LimiterState(app)
+
+    def retry_after(self, username, ip):
+        """Count a login attempt; return None if allowed, else seconds to wait."""
+        if not current_app.config["LOGIN_RATELIMIT_ENABLED"]:
+            return None
+        state = current_app.extensions["login_limiter"]
+        now = time.time()
+        for kind, key in (("ip", ip), ("user", username.lower())):
+            attempts, period = state.limits[kind]
+            if not state.backend.hit(f"{kind}:{key}", attempts, period, now):
+                return math.ceil(period - now % period)
+        return None
+
+
+login_limiter = LoginLimiter()
@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+
+from flask.views import MethodView
+from flask_jwt_extended import jwt_required
+from flask_smorest import Blueprint, abort
+from sqlalchemy import select
+
+from db import db
+from models import (
+    DayRollupModel,
+    HabitDayRollupModel,
+    HabitNameRollupModel,
+    HabitsPerUserRollupModel,
+)
+from schemas import (
+    AnalyticsRangeArgsSchema,
+    AnalyticsDayArgsSchema,
+    AnalyticsLimitArgsSchema,
+    DailyActivitySchema,
+    HabitCompletionSchema,
+    HabitNameStatsSchema,
+    HabitsPerUserSchema,
+)
+
+# Every endpoint reads the summary tables kept by rollups.py; none of them
+# touches habits or their history.
+blp = Blueprint("Analytics", "analytics", description="Aggregates across all users")
+
+
+@blp.route("/analytics/days")
+class DailyActivity(MethodView):
+    @jwt_required()
+    @blp.arguments(AnalyticsRangeArgsSchema, location="query")
+    @blp.response(200, DailyActivitySchema(many=True))
+    def get(self, args):
+        end = args.get("end", date.today())
+        start = args.get("start", end - timedelta(days=29))
+        if not 0 <= (end - start).days < 366:
+            abort(400, message="The range must run forward and span at most 366 days.")
+        stored = {
+            row.day: row
+            for row in db.session.scalars(
+                select(DayRollupModel).where(DayRollupModel.day.between(start, end))
+            )
+        }
+        # Days nobody checked in have no row; they are reported as zeros.
+        days = []
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            row = stored.get(day)
+            days.append(
+                {
+                    "day": day,
+                    "active_users": row.active_users if row else 0,
+                    "completions": row.completions if row else 0,
+                }
+            )
+        return days
+
+
+@blp.route("/analytics/completions")
+class DailyCompletions(MethodView):
+    @jwt_required()
+    @blp.arguments(AnalyticsDayArgsSchema, location="query")
+    @blp.response(200, HabitCompletionSchema(many=True))
+    def get(self, args):
+        return db.session.scalars(
+            select(HabitDayRollupModel)
+            .where(
+                HabitDayRollupModel.day == args.get("day", date.today()),
+                HabitDayRollupModel.completions > 0,
+            )
+            .order_by(HabitDayRollupModel.completions.desc(), HabitDayRollupModel.name)
+            .limit(args["limit"])
+        ).all()
+
+
+@blp.route("/analytics/habit-names")
+class HabitNames(MethodView):
+    @jwt_required()
+    @blp.arguments(AnalyticsLimitArgsSchema, location="query")
+    @blp.response(200, HabitNameStatsSchema(many=True))
+    def get(self, args):
+        return db.session.scalars(
+            select(HabitNameRollupModel)
+            .where(HabitNameRollupModel.habits > 0)
+            .order_by(HabitNameRollupModel.habits.desc(), HabitNameRollupModel.name)
+            .limit(args["limit"])
+        ).all()
+
+
+@blp.route("/analytics/habits-per-user")
+class HabitsPerUser(MethodView):
+    @jwt_required()
+    @blp.response(200, HabitsPerUserSchema(many=True))
+    def get(self):
+        return db.session.scalars(
+            select(HabitsPerUserRollupModel)
+            .where(HabitsPerUserRollupModel.users > 0)
+            .order_by(HabitsPerUserRollupModel.habits)
+        ).all()
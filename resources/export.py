@@ -0,0 +1,76 @@
+import uuid
+
+from flask import Response, request, send_from_directory, stream_with_context, url_for
+from flask.views import MethodView
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_smorest import Blueprint, abort
+
+from db import db
+from export import export_chunks, export_dir
+from jobs import job_queue
+from resources.jobs import own_job
+from schemas import ExportArgsSchema, JobSchema
+
+blp = Blueprint("Export", "export", description="Streaming export of a user's data")
+
+MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@blp.route("/export")
+class Export(MethodView):
+    @jwt_required()
+    @blp.arguments(ExportArgsSchema, location="query")
+    def get(self, args):
+        gzip = request.accept_encodings["gzip"] > 0
+        chunks = export_chunks(args["format"], args["table"], get_jwt_identity(), gzip)
+        response = Response(stream_with_context(chunks), mimetype=MIMETYPES[args["format"]])
+        response.headers["Content-Disposition"] = (
+            f'attachment; filename="habits-{args["table"]}.{args["format"]}"'
+        )
+        response.headers["Vary"] = "Accept-Encoding"
+        if gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        return response
+
+
+@blp.route("/export/jobs")
+class ExportJobList(MethodView):
+    @jwt_required()
+    @blp.arguments(ExportArgsSchema)
+    @blp.response(202, JobSchema)
+    def post(self, args):
+        """Write the export to a file in the background; poll /jobs/<id>."""
+        user_id = get_jwt_identity()
+        # A client retrying with the same Idempotency-Key gets the same job.
+        key = request.headers.get("Idempotency-Key")
+        job = job_queue.enqueue(
+            "export",
+            {
+                "fmt": args["format"],
+                "table": args["table"],
+                "user_id": user_id,
+                "gzip": True,
+                "file": f"{uuid.uuid4().hex}.{args['format']}.gz",
+            },
+            key=f"export:{user_id}:{key}" if key else None,
+            user_id=user_id,
+        )
+        db.session.commit()
+        return job, 202, {"Location": url_for("Jobs.Job", job_id=job.id)}
+
+
+@blp.route("/export/jobs/<int:job_id>/file")
+class ExportJobFile(MethodView):
+    @jwt_required()
+    def get(self, job_id):
+        job = own_job(job_id, "export")
+        if job.status != "done":
+            abort(409, message=f"Export is {job.status}.")
+        payload = job.payload
+        return send_from_directory(
+            export_dir(),
+            job.result["file"],
+            mimetype=MIMETYPES[payload["fmt"]],
+            as_attachment=True,
+            download_name=f"habits-{payload['table']}.{payload['fmt']}.gz",
+        )
@@ -1,28 +1,104 @@
+from datetime import date
+
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import insert, select, update
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 
 from db import db
 
+from dashboard_cache import dashboard_cache
+from etags import collection_tag, etag_headers, row_version
+from loading import eager_options
 from models import HabitModel
-from schemas import HabitSchema, HabitUpdateSchema
+from pagination import keyset_page
+from rollups import rollups
+from search import habit_search
+from schemas import (
+    HabitSchema,
+    HabitUpdateSchema,
+    HabitListArgsSchema,
+    HabitSearchArgsSchema,
+    HabitPageSchema,
+    CheckinSchema,
+    HabitStatsArgsSchema,
+    HabitStatsSchema,
+    HabitYearArgsSchema,
+    HabitYearSchema,
+    HabitBatchSchema,
+    HabitBatchUpdateSchema,
+    HabitBatchDeleteSchema,
+    HabitBatchResultSchema,
+)
 
 blp = Blueprint("Habits", "habits", description="Operations on habits")
 
+
+def habit_query(schema=HabitSchema()):
+    return HabitModel.query.options(*eager_options(HabitModel, schema))
+
+
+def own_habit(habit_id, lock=False):
+    query = HabitModel.query.filter_by(id=habit_id, user_id=get_jwt_identity())
+    if lock:
+        query = query.with_for_update()
+    return query.first_or_404()
+
+
+def validate_batch(schema, items):
+    """Split ``items`` into per-index errors and the loaded valid items."""
+    errors = schema.validate(items, many=True)
+    valid = [index for index in range(len(items)) if index not in errors]
+    loaded = schema.load([items[index] for index in valid], many=True)
+    results = {
+        index: {"index": index, "status": 400, "errors": messages}
+        for index, messages in errors.items()
+    }
+    return results, list(zip(valid, loaded))
+
+
+def owned_habit_versions(habit_ids):
+    return dict(
+        db.session.execute(
+            select(HabitModel.id, HabitModel.version).where(
+                HabitModel.id.in_(habit_ids), HabitModel.user_id == get_jwt_identity()
+            )
+        ).all()
+    )
+
+
+def commit_batch(results):
+    try:
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        abort(500, message="Error when applying habit batch")
+    dashboard_cache.invalidate(get_jwt_identity())
+    return {"results": [results[index] for index in sorted(results)]}
+
+
 @blp.route("/habit/<int:habit_id>")
 class Habit(MethodView):
     @jwt_required()
     @blp.response(200, HabitSchema)
     def get(self, habit_id):
-        habit = HabitModel.query.get_or_404(habit_id)
-        return habit
+        version = row_version(HabitModel, habit_id)
+        if version is None:
+            abort(404)
+        headers = etag_headers("habit", habit_id, version)
+        habit = habit_query().get_or_404(habit_id)
+        return habit, 200, headers
 
     @jwt_required()
     def delete(self, habit_id):
         habit = HabitModel.query.get_or_404(habit_id)
+        user_id = habit.user_id
+        rollups.habits_removed(HabitModel.id == habit_id)
         db.session.delete(habit)
         db.session.commit()
+        dashboard_cache.invalidate(user_id)
         return {"message": "Habit deleted."}
 
     @jwt_required()
@@ -32,22 +108,38 @@ class Habit(MethodView):
         habit = HabitModel.query.get(habit_id)
 
         if habit:
-            habit.name = habit_data["name"]
-            habit.checked = habit_data["checked"]
+            with rollups.habits_changed(HabitModel.id == habit_id):
+                habit.name = habit_data["name"]
+                habit.checked = habit_data["checked"]
         else:
             habit = HabitModel(id=habit_id, **habit_data)
+            db.session.add(habit)
+            rollups.habits_added(HabitModel.id == habit_id)
 
-        db.session.add(habit)
         db.session.commit()
+        dashboard_cache.invalidate(habit.user_id)
 
         return habit
 
 @blp.route("/habit")
 class HabitList(MethodView):
     @jwt_required()
-    @blp.response(200, HabitSchema(many=True))
-    def get(self):
-        return HabitModel.query.all()
+    @blp.arguments(HabitListArgsSchema, location="query")
+    @blp.response(200, HabitPageSchema)
+    def get(self, args):
+        user_id = get_jwt_identity()
+        headers = etag_headers(
+            "habits",
+            user_id,
+            args.get("cursor"),
+            args.get("limit"),
+            collection_tag(HabitModel, HabitModel.user_id == user_id),
+        )
+        query = habit_query().filter(HabitModel.user_id == user_id)
+        habits, next_cursor = keyset_page(
+            query, HabitModel.id, args.get("cursor"), args.get("limit")
+        )
+        return {"habits": habits, "next": next_cursor}, 200, headers
 
     @jwt_required()
     @blp.arguments(HabitSchema)
@@ -57,8 +149,161 @@ class HabitList(MethodView):
         
         try:
             db.session.add(habit)
+            db.session.flush()
+            rollups.habits_added(HabitModel.id == habit.id)
             db.session.commit()
         except SQLAlchemyError:
             abort(500, message="Error when inserting habit")
+        dashboard_cache.invalidate(habit.user_id)
+
+        return habit
+
+@blp.route("/habit/search")
+class HabitSearch(MethodView):
+    @jwt_required()
+    @blp.arguments(HabitSearchArgsSchema, location="query")
+    @blp.response(200, HabitPageSchema)
+    def get(self, args):
+        """Search habit names by prefix, substring or a close spelling, best matches first."""
+        user_id = get_jwt_identity()
+        if args["all_users"]:
+            if not habit_search.is_staff(user_id):
+                abort(403, message="Searching every account is for staff only.")
+            user_id = None
+        habit_ids, next_cursor = habit_search.search(
+            args["q"], user_id, cursor=args.get("cursor"), limit=args.get("limit")
+        )
+        habits = {habit.id: habit for habit in habit_query().filter(HabitModel.id.in_(habit_ids))}
+        ranked = [habits[habit_id] for habit_id in habit_ids if habit_id in habits]
+        return {"habits": ranked, "next": next_cursor}
+
+@blp.route("/habit/<int:habit_id>/checkin")
+class HabitCheckin(MethodView):
+    @jwt_required()
+    @blp.arguments(CheckinSchema)
+    @blp.response(201, HabitStatsSchema)
+    def post(self, checkin_data, habit_id):
+        today = date.today()
+        day = checkin_data.get("day", today)
+        if day > today:
+            abort(400, message="Cannot check in on a future day.")
+
+        habit = own_habit(habit_id, lock=True)
+        try:
+            if habit.check_in(day):
+                rollups.checkin(habit, day)
+            db.session.commit()
+        except SQLAlchemyError:
+            abort(500, message="Error when saving check-in")
+
+        return habit.stats(today=today)
+
+    @jwt_required()
+    @blp.arguments(CheckinSchema, location="query")
+    @blp.response(200, HabitStatsSchema)
+    def delete(self, checkin_data, habit_id):
+        habit = own_habit(habit_id, lock=True)
+        day = checkin_data.get("day", date.today())
+        if not habit.undo_check_in(day):
+            abort(404, message="Check-in not found.")
+        rollups.checkin(habit, day, -1)
+        db.session.commit()
+
+        return habit.stats()
+
+@blp.route("/habit/<int:habit_id>/stats")
+class HabitStats(MethodView):
+    @jwt_required()
+    @blp.arguments(HabitStatsArgsSchema, location="query")
+    @blp.response(200, HabitStatsSchema)
+    def get(self, args, habit_id):
+        return own_habit(habit_id).stats(args["days"])
+
+@blp.route("/habit/stats")
+class HabitStatsList(MethodView):
+    @jwt_required()
+    @blp.arguments(HabitStatsArgsSchema, location="query")
+    @blp.response(200, HabitStatsSchema(many=True))
+    def get(self, args):
+        return HabitModel.stats_for_user(get_jwt_identity(), args["days"])
+
+@blp.route("/habit/<int:habit_id>/history")
+class HabitHistory(MethodView):
+    @jwt_required()
+    @blp.arguments(HabitYearArgsSchema, location="query")
+    @blp.response(200, HabitYearSchema)
+    def get(self, args, habit_id):
+        return own_habit(habit_id).year_summary(args.get("year", date.today().year))
+
+
+@blp.route("/habit/batch")
+class HabitBatch(MethodView):
+    @jwt_required()
+    @blp.arguments(HabitBatchSchema)
+    @blp.response(200, HabitBatchResultSchema)
+    def post(self, batch):
+        results, valid = validate_batch(HabitSchema(partial=("user_id",)), batch["habits"])
+        user_id = get_jwt_identity()
+        rows = [dict(habit_data, user_id=user_id) for _, habit_data in valid]
+
+        if rows:
+            # RETURNING order is undefined for a multi-row INSERT; asked to,
+            # SQLAlchemy hands the ids back in the order of ``rows``, sorted
+            # by HabitModel.insert_key.
+            stmt = insert(HabitModel).returning(HabitModel.id, sort_by_parameter_order=True)
+            try:
+                ids = db.session.scalars(stmt, rows).all()
+                rollups.habits_added(HabitModel.id.in_(ids))
+            except SQLAlchemyError:
+                db.session.rollback()
+                abort(500, message="Error when inserting habits")
+            for (index, _), habit_id in zip(valid, ids):
+                results[index] = {"index": index, "status": 201, "id": habit_id}
+
+        return commit_batch(results)
+
+    @jwt_required()
+    @blp.arguments(HabitBatchSchema)
+    @blp.response(200, HabitBatchResultSchema)
+    def put(self, batch):
+        schema = HabitBatchUpdateSchema(exclude=("user_id",))
+        results, valid = validate_batch(schema, batch["habits"])
+        versions = owned_habit_versions([habit_data["id"] for _, habit_data in valid])
+
+        # The version column is checked and bumped by the bulk UPDATE, so
+        # several items for the same habit are merged into one row.
+        rows = {}
+        for index, habit_data in valid:
+            habit_id = habit_data["id"]
+            if habit_id in versions:
+                rows.setdefault(habit_id, {"version": versions[habit_id]}).update(habit_data)
+                results[index] = {"index": index, "status": 200, "id": habit_id}
+            else:
+                results[index] = {"index": index, "status": 404, "id": habit_id}
+
+        if rows:
+            try:
+                with rollups.habits_changed(HabitModel.id.in_(list(rows))):
+                    db.session.execute(update(HabitModel), list(rows.values()))
+            except StaleDataError:
+                db.session.rollback()
+                abort(409, message="Habits were modified concurrently, retry the batch")
+
+        return commit_batch(results)
+
+    @jwt_required()
+    @blp.arguments(HabitBatchDeleteSchema)
+    @blp.response(200, HabitBatchResultSchema)
+    def delete(self, batch):
+        ids = batch["ids"]
+        owned = set(owned_habit_versions(ids))
+        results = {
+            index: {"index": index, "status": 200 if habit_id in owned else 404, "id": habit_id}
+            for index, habit_id in enumerate(ids)
+        }
+
+        if owned:
+            rollups.habits_removed(HabitModel.id.in_(owned))
+            HabitModel.delete_owned(owned, get_jwt_identity())
 
-        return habit
\ No newline at end of file
+        return commit_batch(results)
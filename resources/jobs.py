@@ -0,0 +1,35 @@
+from flask.views import MethodView
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_smorest import Blueprint, abort
+
+from jobs import job_queue
+from models import JobModel
+from schemas import JobSchema
+from search import habit_search
+
+blp = Blueprint("Jobs", "jobs", description="Background jobs")
+
+
+def own_job(job_id, name=None):
+    query = JobModel.query.filter_by(id=job_id, user_id=get_jwt_identity())
+    if name is not None:
+        query = query.filter_by(name=name)
+    return query.first_or_404()
+
+
+@blp.route("/jobs/<int:job_id>")
+class Job(MethodView):
+    @jwt_required()
+    @blp.response(200, JobSchema)
+    def get(self, job_id):
+        return own_job(job_id)
+
+
+@blp.route("/jobs/stats")
+class JobStats(MethodView):
+    @jwt_required()
+    def get(self):
+        # Every account's queue and failures; same staff list as search.
+        if not habit_search.is_staff(get_jwt_identity()):
+            abort(403, message="Job stats are for staff only.")
+        return job_queue.stats()
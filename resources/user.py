@@ -1,37 +1,73 @@
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from passlib.hash import pbkdf2_sha256
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt, create_refresh_token, get_jwt_identity
-from flask import Flask, session, render_template, redirect, url_for
-from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
+from flask import render_template, request
 
+from accounts import audit, queue_rehash
 from db import db
+from etags import collection_tag, etag_headers, row_version
+from loading import eager_options
 from blocklist import BLOCKLIST
+from passwords import passwords
+from ratelimit import login_limiter
+from identity import identity_cache
+from dashboard_cache import dashboard_cache
+from purge import user_purge
 
 from models import UserModel
-from schemas import UserSchema, HabitSchema
+from schemas import UserSchema
 
 blp = Blueprint("Users", "users", description="Operations on users", template_folder="templates", static_folder="static")
 
+
+def user_query(schema=UserSchema()):
+    return UserModel.query.options(*eager_options(UserModel, schema))
+
+
+def verify_password(user, pwd):
+    valid, new_hash = passwords.verify(pwd, user.pwd)
+    if valid and new_hash:
+        # Written by a job; the caller commits.
+        queue_rehash(user, new_hash)
+    return valid
+
+
 @blp.route("/user/<int:user_id>")
 class User(MethodView):
     @blp.response(200, UserSchema)
     def get(self, user_id):
-        user = UserModel.query.get_or_404(user_id)
-        return user
+        version = row_version(UserModel, user_id)
+        if version is None:
+            abort(404)
+        headers = etag_headers("user", user_id, version)
+        user = user_query().get_or_404(user_id)
+        return user, 200, headers
 
     def delete(self, user_id):
-        user = UserModel.query.get_or_404(user_id)
-        db.session.delete(user)
+        if row_version(UserModel, user_id) is None:
+            abort(404)
+        job = user_purge.delete_user(user_id)
+        audit("delete", user_id)
         db.session.commit()
+        identity_cache.invalidate(user_id)
+        dashboard_cache.invalidate(user_id)
+        if job is not None:
+            return {"message": "User deletion started.", "job_id": job.id}, 202
         return {"message": "User deleted."}
 
 @blp.route("/user")
 class UserList(MethodView):
     @blp.response(200, UserSchema(many=True))
     def get(self):
-        return UserModel.query.all()
+        headers = etag_headers("users", collection_tag(UserModel))
+        return user_query().all(), 200, headers
+
+@blp.route("/user/identity-cache")
+class IdentityCacheStats(MethodView):
+    @jwt_required()
+    def get(self):
+        return identity_cache.stats()
 
 @blp.route("/register")
 class UserRegister(MethodView):
@@ -40,7 +76,7 @@ class UserRegister(MethodView):
     def post(self, user_data):
         user = UserModel(
             username = user_data["username"],
-            pwd = pbkdf2_sha256.hash(user_data["pwd"])
+            pwd = passwords.hash(user_data["pwd"])
         )
         try:
             db.session.add(user)
@@ -58,8 +94,18 @@ class UserLogin(MethodView):
 
     @blp.arguments(UserSchema)
     def post(self, user_data):
+        retry_after = login_limiter.retry_after(user_data["username"], request.remote_addr)
+        if retry_after:
+            abort(
+                429,
+                message="Too many login attempts.",
+                headers={"Retry-After": str(retry_after)},
+            )
+
         user = UserModel.query.filter(UserModel.username == user_data["username"]).first()
-        if user and pbkdf2_sha256.verify(user_data["pwd"], user.pwd):
+        if user and verify_password(user, user_data["pwd"]):
+            audit("login", user.id)
+            db.session.commit()
             access_token = create_access_token(identity=user.id, fresh=True)
             refresh_token = create_refresh_token(identity=user.id)
             return {"access_token": access_token, "refresh_token": refresh_token}
@@ -70,8 +116,10 @@ class UserLogin(MethodView):
 class UserLogout(MethodView):
     @jwt_required()
     def post(self):
-        jti = get_jwt()["jti"]
-        BLOCKLIST.add(jti)
+        jwt = get_jwt()
+        audit("logout", get_jwt_identity())
+        db.session.commit()
+        BLOCKLIST.add(jwt["jti"], jwt["exp"])
         return {"message": "Successfully logged out"}, 200
 
 @blp.route("/refresh")
@@ -81,6 +129,6 @@ class TokenRefresh(MethodView):
         current_user = get_jwt_identity()
         new_token = create_access_token(identity=current_user, fresh=False)
         # Make it clear that when to add the refresh token to the blocklist will depend on the app design
-        jti = get_jwt()["jti"]
-        BLOCKLIST.add(jti)
+        jwt = get_jwt()
+        BLOCKLIST.add(jwt["jti"], jwt["exp"])
         return {"access_token": new_token}, 200
@@ -0,0 +1,273 @@
+"""
+rollups.py
+
+Analytics rollups, kept current by the write paths so that the analytics
+endpoints read a handful of summary rows instead of running ``GROUP BY`` over
+habits and their history on every request:
+
+* ``rollup_habit_days``: check-ins per day and habit name;
+* ``rollup_user_days`` / ``rollup_days``: per day, each user's check-ins, the
+  number of users with at least one (the active users) and the day's total;
+* ``rollup_habit_names``: habits and checked habits per name;
+* ``rollup_user_habits`` / ``rollup_habits_per_user``: each user's habits,
+  and how many users own exactly N habits.
+
+Every change is a set of habits leaving or entering the rollups.
+``habits_removed`` subtracts what the matching habits contribute (call it
+before deleting them), ``habits_added`` adds it (after inserting them) and
+``habits_changed`` does both around an update. Check-ins and toggles have
+cheaper hooks of their own. All of them run in the caller's transaction,
+and counters are moved with ``INSERT ... ON CONFLICT DO UPDATE``, so
+concurrent writers never lose an increment.
+
+Writes that bypass these hooks (``flask import``, or anything done while
+``ROLLUPS_ENABLED`` is off) are caught up with ``flask rebuild-rollups``,
+which recomputes every table from habits and their history, or with a
+queued ``rebuild_rollups`` job (``flask import`` queues one). Run it once
+after the migration that creates the tables, to backfill existing data.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import case, delete, func, select
+
+import bitset
+from db import db, dialect_insert
+from jobs import task
+from models import (
+    DayRollupModel,
+    HabitCheckinBitmapModel,
+    HabitCheckinModel,
+    HabitDayRollupModel,
+    HabitModel,
+    HabitNameRollupModel,
+    HabitsPerUserRollupModel,
+    UserDayRollupModel,
+    UserHabitsRollupModel,
+    UserModel,
+)
+
+ROLLUP_MODELS = (
+    HabitDayRollupModel,
+    UserDayRollupModel,
+    DayRollupModel,
+    HabitNameRollupModel,
+    UserHabitsRollupModel,
+    HabitsPerUserRollupModel,
+)
+
+
+class Contribution:
+    """What a set of habits, or a single check-in, counts for in the rollups."""
+
+    def __init__(self):
+        self.names = Counter()  # name -> habits
+        self.checked = Counter()  # name -> habits checked "Yes"
+        self.habit_days = Counter()  # (day, name) -> check-ins
+        self.user_days = Counter()  # (day, user_id) -> check-ins
+        self.owners = Counter()  # user_id -> habits in the set
+
+
+def contribution(*criteria, history=True, owners=True):
+    """Collect the contribution of the habits matching ``criteria``."""
+    result = Contribution()
+    for user_id, name, habits, checked in db.session.execute(
+        select(
+            HabitModel.user_id,
+            HabitModel.name,
+            func.count(),
+            func.sum(case((HabitModel.checked == "Yes", 1), else_=0)),
+        )
+        .where(*criteria)
+        .group_by(HabitModel.user_id, HabitModel.name)
+    ):
+        result.names[name] += habits
+        result.checked[name] += checked
+        if owners:
+            result.owners[user_id] += habits
+
+    if history and result.names:
+        for day, name, user_id, checkins in db.session.execute(
+            select(HabitCheckinModel.day, HabitModel.name, HabitModel.user_id, func.count())
+            .join(HabitModel, HabitCheckinModel.habit_id == HabitModel.id)
+            .where(*criteria)
+            .group_by(HabitCheckinModel.day, HabitModel.name, HabitModel.user_id)
+        ):
+            result.habit_days[day, name] += checkins
+            result.user_days[day, user_id] += checkins
+        for name, user_id, year, bits in db.session.execute(
+            select(
+                HabitModel.name,
+                HabitModel.user_id,
+                HabitCheckinBitmapModel.year,
+                HabitCheckinBitmapModel.bits,
+            )
+            .join(HabitModel, HabitCheckinBitmapModel.habit_id == HabitModel.id)
+            .where(*criteria)
+        ):
+            for day in bitset.set_days(bitset.to_int(bits), date(year, 1, 1)):
+                result.habit_days[day, name] += 1
+                result.user_days[day, user_id] += 1
+    return result
+
+
+def _upsert(model, keys):
+    """``INSERT`` that adds the inserted counters to an existing row instead."""
+    table = model.__table__
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={
+            column.name: column + stmt.excluded[column.name]
+            for column in table.columns
+            if column.name not in keys
+        },
+    )
+
+
+def _bump(model, keys, rows):
+    if rows:
+        db.session.execute(_upsert(model, keys), rows)
+
+
+def apply(change, sign):
+    """Add (``sign`` 1) or subtract (-1) a contribution."""
+    _bump(
+        HabitNameRollupModel,
+        ("name",),
+        [
+            {"name": name, "habits": sign * habits, "checked": sign * change.checked[name]}
+            for name, habits in change.names.items()
+        ],
+    )
+    _bump(
+        HabitDayRollupModel,
+        ("day", "name"),
+        [
+            {"day": day, "name": name, "completions": sign * checkins}
+            for (day, name), checkins in change.habit_days.items()
+        ],
+    )
+
+    days = {}
+    if change.user_days:
+        # A user becomes active on a day when their count leaves zero and
+        # inactive when it gets back to it; RETURNING tells which happened.
+        stmt = _upsert(UserDayRollupModel, ("day", "user_id")).returning(
+            UserDayRollupModel.day, UserDayRollupModel.user_id, UserDayRollupModel.completions
+        )
+        rows = [
+            {"day": day, "user_id": user_id, "completions": sign * checkins}
+            for (day, user_id), checkins in change.user_days.items()
+        ]
+        for day, user_id, completions in db.session.execute(stmt, rows):
+            checkins = change.user_days[day, user_id]
+            totals = days.setdefault(day, {"day": day, "active_users": 0, "completions": 0})
+            totals["completions"] += sign * checkins
+            if sign > 0 and completions == checkins:
+                totals["active_users"] += 1
+            elif sign < 0 and completions == 0:
+                totals["active_users"] -= 1
+    _bump(DayRollupModel, ("day",), list(days.values()))
+
+    buckets = Counter()
+    if change.owners:
+        # The upsert locks the user's row and returns the count after this
+        # change, so the bucket it left is exact even with other writers.
+        stmt = _upsert(UserHabitsRollupModel, ("user_id",)).returning(
+            UserHabitsRollupModel.user_id, UserHabitsRollupModel.habits
+        )
+        rows = [
+            {"user_id": user_id, "habits": sign * habits}
+            for user_id, habits in change.owners.items()
+        ]
+        for user_id, after in db.session.execute(stmt, rows):
+            buckets[after - sign * change.owners[user_id]] -= 1
+            buckets[after] += 1
+    _bump(
+        HabitsPerUserRollupModel,
+        ("habits",),
+        [{"habits": habits, "users": users} for habits, users in buckets.items() if habits and users],
+    )
+
+
+class Rollups:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("ROLLUPS_ENABLED", True)
+
+    @property
+    def enabled(self):
+        return current_app.config["ROLLUPS_ENABLED"]
+
+    def habits_added(self, *criteria):
+        """Count the matching habits in; call after inserting them."""
+        if self.enabled:
+            apply(contribution(*criteria), 1)
+
+    def habits_removed(self, *criteria):
+        """Count the matching habits out; call before deleting them."""
+        if self.enabled:
+            apply(contribution(*criteria), -1)
+
+    @contextmanager
+    def habits_changed(self, *criteria, history=True):
+        """Wrap an update of the matching habits' names or ``checked``.
+
+        Pass ``history=False`` when names cannot change, so their check-ins
+        are not read twice for nothing.
+        """
+        if not self.enabled:
+            yield
+            return
+        apply(contribution(*criteria, history=history, owners=False), -1)
+        yield
+        apply(contribution(*criteria, history=history, owners=False), 1)
+
+    def checked(self, name, value):
+        """A habit called ``name`` was switched to ``value``."""
+        if self.enabled:
+            change = Contribution()
+            change.names[name] = 0
+            change.checked[name] = 1 if value == "Yes" else -1
+            apply(change, 1)
+
+    def checkin(self, habit, day, sign=1):
+        """``habit`` gained (or with ``sign`` -1 lost) a check-in on ``day``."""
+        if self.enabled:
+            change = Contribution()
+            change.habit_days[day, habit.name] = 1
+            change.user_days[day, habit.user_id] = 1
+            apply(change, sign)
+
+    def rebuild(self, chunk_size=1000):
+        """Recompute every rollup from scratch, ``chunk_size`` users at a time."""
+        for model in ROLLUP_MODELS:
+            db.session.execute(delete(model))
+        users = last = 0
+        while True:
+            user_ids = db.session.scalars(
+                select(UserModel.id).where(UserModel.id > last).order_by(UserModel.id).limit(chunk_size)
+            ).all()
+            if not user_ids:
+                break
+            apply(contribution(HabitModel.user_id.in_(user_ids)), 1)
+            users += len(user_ids)
+            last = user_ids[-1]
+        return users
+
+
+rollups = Rollups()
+
+
+@task("rebuild_rollups")
+def rebuild_rollups_job(chunk_size=1000):
+    users = rollups.rebuild(chunk_size)
+    db.session.commit()
+    return {"users": users}
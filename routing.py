@@ -0,0 +1,197 @@
+"""
+routing.py
+
+Read replicas. ``DATABASE_REPLICA_URLS`` lists replicas of the primary
+(``SQLALCHEMY_DATABASE_URI``); ``configure_replicas`` must run before
+``db.init_app`` and registers them as the ``replica<N>`` binds. During GET
+and HEAD requests ``RoutingSession`` sends plain ``SELECT`` statements to a
+replica, picked at random once per request. Flushes, DML and
+``SELECT ... FOR UPDATE`` always go to the primary, as does everything
+outside a request (CLI commands, job workers). Statements passed through
+``on_primary`` stay there too: the token blocklist and the user lookups read
+with it, so a revocation or a new account counts at once.
+
+Replicas lag, so a client must be able to read its own writes. A successful
+POST, PUT, PATCH or DELETE sets a cookie that lives for
+``DATABASE_REPLICA_STICKY_SECONDS``, and marks the user (JWT identity or
+Flask-Login session) in a per-process cache for as long. Requests carrying
+either read from the primary until then. Clients that drop cookies only get
+this from the worker that handled their write. A request carrying a JWT
+decides only once ``jwt_required`` has verified it, because the identity is
+not known before that; the reads made until then go to the primary.
+
+To try it locally, point the replica at a second SQLite file and copy the
+primary into it with ``flask sync-replicas``; the app opens SQLite replicas
+with ``query_only`` so a write routed there fails loudly.
+"""
+
+import random
+import sqlite3
+
+from flask import current_app, g, has_request_context, request, session
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from flask_jwt_extended.config import config as jwt_config
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+
+from cache import TTLCache
+
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+_UNDECIDED = object()
+
+
+def configure_replicas(app):
+    app.config.setdefault("DATABASE_REPLICA_URLS", [])
+    app.config.setdefault("DATABASE_REPLICA_STICKY_SECONDS", 5)
+    app.config.setdefault("DATABASE_REPLICA_COOKIE", "read_primary")
+    urls = app.config["DATABASE_REPLICA_URLS"]
+    if isinstance(urls, str):
+        urls = [url.strip() for url in urls.split(",") if url.strip()]
+    app.config["DATABASE_REPLICA_URLS"] = urls
+    binds = app.config.setdefault("SQLALCHEMY_BINDS", {})
+    for number, url in enumerate(urls):
+        binds.setdefault(f"replica{number}", url)
+
+
+def replica_keys(app):
+    return [f"replica{number}" for number in range(len(app.config["DATABASE_REPLICA_URLS"]))]
+
+
+def on_primary(statement):
+    """Mark ``statement`` to read from the primary even during a GET."""
+    return statement.execution_options(read_primary=True)
+
+
+def _jwt_pending():
+    if "headers" not in jwt_config.token_location or not request.headers.get(jwt_config.header_name):
+        return False
+    try:
+        get_jwt()
+    except RuntimeError:
+        # Sent, but jwt_required has not verified it (yet).
+        return True
+    return False
+
+
+def _user_keys():
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # No token was checked in this request.
+        identity = None
+    keys = {str(identity)} if identity is not None else set()
+    if "_user_id" in session:
+        keys.add(str(session["_user_id"]))
+    return keys
+
+
+def _choose_replica(engines):
+    state = current_app.extensions.get("read_routing")
+    if not state or request.method not in ("GET", "HEAD"):
+        return None
+    if request.cookies.get(current_app.config["DATABASE_REPLICA_COOKIE"]):
+        return None
+    if _jwt_pending():
+        return _UNDECIDED
+    if any(key in state.recent_writers for key in _user_keys()):
+        return None
+    return engines[random.choice(state.keys)]
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+            and not clause.get_execution_options().get("read_primary")
+            and has_request_context()
+        ):
+            # Decided on the first read once the identity is known.
+            replica = g.get("_read_replica", _UNDECIDED)
+            if replica is _UNDECIDED:
+                replica = _choose_replica(self._db.engines)
+                if replica is not _UNDECIDED:
+                    g._read_replica = replica
+            if replica not in (None, _UNDECIDED):
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def sync_sqlite_replicas(primary, replicas):
+    """Copy the primary SQLite database into each SQLite replica; returns their paths."""
+    synced = []
+    source = sqlite3.connect(primary.url.database)
+    try:
+        for engine in replicas:
+            if engine.dialect.name != "sqlite":
+                continue
+            engine.dispose()
+            target = sqlite3.connect(engine.url.database)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+            synced.append(engine.url.database)
+    finally:
+        source.close()
+    return synced
+
+
+class _RoutingState:
+    def __init__(self, app):
+        self.keys = replica_keys(app)
+        self.sticky = app.config["DATABASE_REPLICA_STICKY_SECONDS"]
+        self.recent_writers = TTLCache(maxsize=100000, ttl=self.sticky)
+
+
+class ReadRouting:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Run after ``db.init_app`` and ``engine_profile.init_app``."""
+        if not app.config["DATABASE_REPLICA_URLS"]:
+            return
+        state = app.extensions["read_routing"] = _RoutingState(app)
+        extension = app.extensions["sqlalchemy"]
+        with app.app_context():
+            engines = extension.engines
+            for key in state.keys:
+                # Replicas hold the primary's tables, not models of their
+                # own; drop the empty metadata made for the bind so that
+                # create_all/drop_all leave them alone.
+                extension.metadatas.pop(key, None)
+                engine = engines[key]
+                if engine.dialect.name == "sqlite" and not event.contains(engine, "connect", _query_only):
+                    event.listen(engine, "connect", _query_only)
+        app.after_request(self._after_request)
+
+    def _after_request(self, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return response
+        state = current_app.extensions["read_routing"]
+        response.set_cookie(
+            current_app.config["DATABASE_REPLICA_COOKIE"],
+            "1",
+            max_age=state.sticky,
+            httponly=True,
+            samesite="Lax",
+        )
+        for key in _user_keys():
+            state.recent_writers.set(key, True)
+        return response
+
+    def reading_from_replica(self):
+        return g.get("_read_replica") not in (None, _UNDECIDED)
+
+
+read_routing = ReadRouting()
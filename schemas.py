@@ -1,11 +1,13 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, ValidationError, fields, validate, validates_schema
 
-class PlainHabitSchema(Schema):
+from serializers import CompiledSchema
+
+class PlainHabitSchema(CompiledSchema):
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True)
     checked = fields.Str(required=True)
 
-class PlainUserSchema(Schema):
+class PlainUserSchema(CompiledSchema):
     id = fields.Int(dump_only=True)
     username = fields.Str(required=True)
     pwd = fields.Str(required=True, load_only=True)
@@ -20,4 +22,114 @@ class HabitUpdateSchema(Schema):
     user_id = fields.Int()
 
 class UserSchema(PlainUserSchema):
-    items = fields.List(fields.Nested(PlainHabitSchema()), dump_only=True)
\ No newline at end of file
+    items = fields.List(fields.Nested(PlainHabitSchema()), dump_only=True)
+
+class HabitListArgsSchema(Schema):
+    limit = fields.Int(validate=validate.Range(min=1))
+    cursor = fields.Str()
+
+class HabitSearchArgsSchema(HabitListArgsSchema):
+    q = fields.Str(required=True, validate=validate.Length(min=1, max=80))
+    # Every account's habits; only for SEARCH_STAFF_USER_IDS.
+    all_users = fields.Bool(load_default=False)
+
+class HabitPageSchema(CompiledSchema):
+    habits = fields.List(fields.Nested(HabitSchema()))
+    next = fields.Str(allow_none=True)
+
+class CheckinSchema(Schema):
+    day = fields.Date()
+
+class HabitStatsArgsSchema(Schema):
+    days = fields.Int(load_default=30, validate=validate.Range(min=1, max=3660))
+
+class HabitStatsSchema(CompiledSchema):
+    id = fields.Int()
+    name = fields.Str()
+    current_streak = fields.Int()
+    longest_streak = fields.Int()
+    total_checkins = fields.Int()
+    last_checkin = fields.Date(allow_none=True)
+    days = fields.Int()
+    completion_rate = fields.Float()
+
+class HabitYearArgsSchema(Schema):
+    year = fields.Int(validate=validate.Range(min=1970, max=9999))
+
+class HabitYearSchema(CompiledSchema):
+    year = fields.Int()
+    total = fields.Int()
+    weeks = fields.List(fields.Int())
+    heatmap = fields.List(fields.List(fields.Int(allow_none=True)))
+
+class HabitBatchUpdateSchema(HabitUpdateSchema):
+    id = fields.Int(required=True)
+
+class HabitBatchSchema(Schema):
+    habits = fields.List(fields.Raw(), required=True, validate=validate.Length(min=1, max=500))
+
+class HabitBatchDeleteSchema(Schema):
+    ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1, max=500))
+
+class HabitBatchItemSchema(CompiledSchema):
+    index = fields.Int()
+    status = fields.Int()
+    id = fields.Int()
+    errors = fields.Dict()
+
+class HabitBatchResultSchema(CompiledSchema):
+    results = fields.List(fields.Nested(HabitBatchItemSchema()))
+
+class ExportArgsSchema(Schema):
+    format = fields.Str(load_default="ndjson", validate=validate.OneOf(["ndjson", "csv"]))
+    table = fields.Str(load_default="all", validate=validate.OneOf(["all", "habits", "checkins"]))
+
+    @validates_schema
+    def validate_table(self, data, **kwargs):
+        if data["format"] == "csv" and data["table"] == "all":
+            raise ValidationError("CSV exports one table at a time.", "table")
+
+class AnalyticsRangeArgsSchema(Schema):
+    start = fields.Date()
+    end = fields.Date()
+
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        if "start" in data and "end" in data and not 0 <= (data["end"] - data["start"]).days < 366:
+            raise ValidationError("The range must run forward and span at most 366 days.", "end")
+
+class AnalyticsDayArgsSchema(Schema):
+    day = fields.Date()
+    limit = fields.Int(load_default=20, validate=validate.Range(min=1, max=100))
+
+class AnalyticsLimitArgsSchema(Schema):
+    limit = fields.Int(load_default=20, validate=validate.Range(min=1, max=100))
+
+class DailyActivitySchema(CompiledSchema):
+    day = fields.Date()
+    active_users = fields.Int()
+    completions = fields.Int()
+
+class HabitCompletionSchema(CompiledSchema):
+    name = fields.Str()
+    completions = fields.Int()
+
+class HabitNameStatsSchema(CompiledSchema):
+    name = fields.Str()
+    habits = fields.Int()
+    checked = fields.Int()
+
+class HabitsPerUserSchema(CompiledSchema):
+    habits = fields.Int()
+    users = fields.Int()
+
+class JobSchema(CompiledSchema):
+    id = fields.Int()
+    name = fields.Str()
+    status = fields.Str()
+    attempts = fields.Int()
+    created_at = fields.DateTime()
+    started_at = fields.DateTime(allow_none=True)
+    finished_at = fields.DateTime(allow_none=True)
+    result = fields.Dict(allow_none=True)
+    error = fields.Str(allow_none=True)
@@ -0,0 +1,198 @@
+"""
+search.py
+
+Habit name search: prefix and substring matches, and names within a typo or
+so of the query. ``habit_search.search(query, user_id)`` returns one page of
+matching habit ids, best first:
+
+1. the whole name equals the query (case-insensitively),
+2. the name starts with it,
+3. a word of the name starts with it,
+4. the name contains it,
+5. the name holds at least ``SEARCH_SIMILARITY`` of the query's trigrams
+   (pg_trgm's: every word padded with two spaces in front and one behind),
+   so a swapped, missing or extra letter still matches.
+
+Within a rank, the more of the query's trigrams a name holds, the better.
+Shorter names come next and lower ids break ties.
+
+One user's habits are few, so they are read off ``ix_habits_user_id_id`` and
+all ranked here. Searching every account collects up to
+``SEARCH_MAX_RESULTS`` candidates one rank at a time, each lookup unordered
+so that the database can stop as soon as it has enough:
+
+* equal and prefix names: the ``lower(name)`` index;
+* names containing the query: the trigram index, which is pg_trgm's GIN
+  index on PostgreSQL and the ``habits_search`` FTS5 table on SQLite (see
+  models/habit_search.py);
+* close spellings: on SQLite, names containing either half of a query word,
+  since one typo leaves the other half intact; on PostgreSQL, pg_trgm's
+  ``%>`` (word similarity), with its threshold set to ``SEARCH_SIMILARITY``
+  for the transaction.
+
+Only the users in ``SEARCH_STAFF_USER_IDS`` may search every account.
+
+Ordering all matches by relevance in the database (bm25, or
+``word_similarity``) costs hundreds of milliseconds for common words at a
+million habits. When a rank has more matches than the cap, the candidates
+are whichever of them the index yields first, not necessarily the best. Queries without a word of three or more
+characters only match names they start (ranks 1 and 2). Ranked results have
+no stable key to page on, so the cursor holds an offset, and every page
+ranks the same candidates again.
+"""
+
+import re
+
+from flask import current_app
+from sqlalchemy import and_, column, func, select, table
+
+from db import db
+from models import HabitModel
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+
+SEARCH_TABLE = table("habits_search", column("rowid"), column("habits_search"))
+
+_WORDS = re.compile(r"\w+")
+
+
+def trigrams(text):
+    grams = set()
+    for word in _WORDS.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _searchable_words(query):
+    return [word for word in _WORDS.findall(query) if len(word) >= 3]
+
+
+def _like(text):
+    return re.sub(r"([\\%_])", r"\\\1", text)
+
+
+def rank(query, name, grams=None):
+    """Sort key of ``name`` as a result for ``query``, or None if it is no match."""
+    query, lowered = query.lower(), name.lower()
+    grams = trigrams(query) if grams is None else grams
+    shared = len(grams & trigrams(lowered)) / len(grams) if grams else 0.0
+    if lowered == query:
+        tier = 0
+    elif lowered.startswith(query):
+        tier = 1
+    elif any(word.startswith(query) for word in _WORDS.findall(lowered)):
+        tier = 2
+    elif query in lowered:
+        tier = 3
+    elif shared >= current_app.config["SEARCH_SIMILARITY"]:
+        tier = 4
+    else:
+        return None
+    if tier > 1 and not _searchable_words(query):
+        return None
+    return tier, -shared, len(name)
+
+
+def _prefix(query, postgresql):
+    lowered = func.lower(HabitModel.name)
+    if postgresql:
+        # ix_habits_name_lower uses text_pattern_ops for this.
+        return lowered.like(_like(query) + "%", escape="\\")
+    return and_(lowered >= query, lowered < query[:-1] + chr(ord(query[-1]) + 1))
+
+
+def _fts(match):
+    return (
+        select(HabitModel.id, HabitModel.name)
+        .join_from(SEARCH_TABLE, HabitModel, HabitModel.id == SEARCH_TABLE.c.rowid)
+        .where(SEARCH_TABLE.c.habits_search.op("MATCH")(match))
+    )
+
+
+def _halves(words):
+    halves = set()
+    for word in words:
+        if len(word) >= 6:
+            halves.update((word[:len(word) // 2], word[len(word) // 2:]))
+        else:
+            halves.update(word[i:i + 3] for i in range(len(word) - 2))
+    return " OR ".join(f'"{half}"' for half in sorted(halves))
+
+
+def _lookups(query):
+    """Candidate queries of every account's habits, best rank first."""
+    postgresql = db.engine.dialect.name == "postgresql"
+    candidates = select(HabitModel.id, HabitModel.name)
+    yield candidates.where(func.lower(HabitModel.name) == query)
+    yield candidates.where(_prefix(query, postgresql))
+    words = _searchable_words(query)
+    if not words:
+        return
+    if postgresql:
+        yield candidates.where(HabitModel.name.ilike("%" + _like(query) + "%", escape="\\"))
+        # Run just before the lookup is executed, in the same transaction.
+        db.session.execute(
+            select(
+                func.set_config(
+                    "pg_trgm.word_similarity_threshold",
+                    str(current_app.config["SEARCH_SIMILARITY"]),
+                    True,
+                )
+            )
+        )
+        yield candidates.where(HabitModel.name.op("%>")(query))
+    else:
+        yield _fts('"' + query.replace('"', '""') + '"')
+        yield _fts(_halves(words))
+
+
+class HabitSearch:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SEARCH_SIMILARITY", 0.5)
+        app.config.setdefault("SEARCH_MAX_RESULTS", 500)
+        staff = app.config.setdefault("SEARCH_STAFF_USER_IDS", [])
+        if isinstance(staff, str):
+            staff = [user_id for user_id in staff.split(",") if user_id.strip()]
+        app.config["SEARCH_STAFF_USER_IDS"] = {int(user_id) for user_id in staff}
+
+    def is_staff(self, user_id):
+        return int(user_id) in current_app.config["SEARCH_STAFF_USER_IDS"]
+
+    def candidates(self, query, user_id=None):
+        """``(id, name)`` of the habits that may match, every account's without ``user_id``."""
+        if user_id is not None:
+            return db.session.execute(
+                select(HabitModel.id, HabitModel.name).where(HabitModel.user_id == user_id)
+            ).all()
+        cap = current_app.config["SEARCH_MAX_RESULTS"]
+        found = {}
+        for lookup in _lookups(query):
+            found.update(db.session.execute(lookup.limit(cap)).all())
+            if len(found) >= cap:
+                break
+        return found.items()
+
+    def search(self, query, user_id=None, cursor=None, limit=None):
+        """Rank the habits matching ``query``; returns ``(ids, next_cursor)``."""
+        query = " ".join(query.lower().split())
+        if not query:
+            return [], None
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        offset = decode_cursor(cursor) if cursor else 0
+        grams = trigrams(query)
+        ranked = []
+        for habit_id, name in self.candidates(query, user_id):
+            key = rank(query, name, grams)
+            if key is not None:
+                ranked.append((key, habit_id))
+        ranked.sort()
+        page = [habit_id for _, habit_id in ranked[offset:offset + limit]]
+        next_cursor = encode_cursor(offset + limit) if len(ranked) > offset + limit else None
+        return page, next_cursor
+
+
+habit_search = HabitSearch()
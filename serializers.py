@@ -0,0 +1,152 @@
+"""
+serializers.py
+
+Compiled dump path for marshmallow schemas. ``Schema._serialize`` walks the
+schema's fields for every object, and every field goes through ``serialize``,
+``get_value`` and the accessor before its own ``_serialize``; on a list of
+thousands of habits that dispatch is most of the response time.
+
+``CompiledSchema`` generates one plain Python function per schema instance the
+first time it dumps, with the attribute reads and conversions of the common
+fields (Int, Float, Str, Date, Raw, Dict, Nested, List) written out inline and
+nested schemas compiled into the same call. Any other field, or a field with
+``attribute`` paths, ``dump_default`` or ``as_string``, is dumped through its
+own ``serialize`` as before, and nested schemas with dump hooks or given by
+name go through their ``dump``. ``dump`` itself is untouched, so hooks and
+``many`` behave as they do for any schema.
+
+``CompiledSchema.dump_hook``, when set, wraps every ``dump`` of the app's
+schemas; profiling.py sets it to time serialization without touching
+marshmallow's own ``Schema``.
+"""
+
+import datetime
+import itertools
+
+from marshmallow import Schema, fields, missing
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+from marshmallow.utils import get_value
+
+_counter = itertools.count()
+
+# Exact types only: subclasses may override _serialize.
+_SCALARS = {
+    fields.Integer: "int",
+    fields.Float: "float",
+}
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return str(value)
+
+
+def _has_dump_hooks(schema):
+    return bool(schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP))
+
+
+def _value_expr(field, var, namespace):
+    """Source for ``field._serialize(var)``, or None if it can't be inlined."""
+    kind = type(field)
+    if getattr(field, "as_string", False):
+        return None
+    if kind in _SCALARS:
+        return f"None if {var} is None else {_SCALARS[kind]}({var})"
+    if kind is fields.String:
+        return f"{var} if {var}.__class__ is str else None if {var} is None else _text({var})"
+    if kind is fields.Date and field.format in (None, "iso"):
+        return f"None if {var} is None else _date_iso({var})"
+    if kind is fields.Raw:
+        return var
+    if kind is fields.Dict and field.key_field is None and field.value_field is None:
+        return f"None if {var} is None else dict({var})"
+    if kind is fields.List:
+        item = f"_i{next(_counter)}"
+        inner = _value_expr(field.inner, item, namespace)
+        if inner is None:
+            return None
+        return f"None if {var} is None else [{inner} for {item} in {var}]"
+    if kind is fields.Nested:
+        # "self" and lazily named schemas keep the regular path.
+        if not isinstance(field.nested, (Schema, type)):
+            return None
+        schema = field.schema
+        if _has_dump_hooks(schema) or schema.dict_class is not dict:
+            return None
+        name = f"_nested{next(_counter)}"
+        namespace[name] = compile_dumper(schema)
+        item = f"_i{next(_counter)}"
+        if schema.many or field.many:
+            return f"None if {var} is None else [{name}({item}) for {item} in {var}]"
+        return f"None if {var} is None else {name}({var})"
+    return None
+
+
+def compile_dumper(schema):
+    """Return ``f(obj) -> dict`` equivalent to ``schema._serialize(obj)``."""
+    namespace = {
+        "_missing": missing,
+        "_text": _text,
+        "_date_iso": datetime.date.isoformat,
+        "_get_value": get_value,
+        "_schema_get": schema.get_attribute,
+    }
+    custom_accessor = type(schema).get_attribute is not Schema.get_attribute
+    lines = [
+        "def dump(obj):",
+        # marshmallow reads keys from anything with __getitem__, attributes otherwise.
+        "    get = _get_value if hasattr(obj, '__getitem__') else getattr",
+        "    ret = {}",
+    ]
+    for index, (name, field) in enumerate(schema.dump_fields.items()):
+        key = field.data_key if field.data_key is not None else name
+        attribute = field.attribute if field.attribute is not None else name
+        expr = _value_expr(field, "value", namespace)
+        if (
+            expr is None
+            or custom_accessor
+            or "." in attribute
+            or field.dump_default is not missing
+            or not field._CHECK_ATTRIBUTE
+        ):
+            namespace[f"_field{index}"] = field
+            lines += [
+                f"    value = _field{index}.serialize({name!r}, obj, accessor=_schema_get)",
+                "    if value is not _missing:",
+                f"        ret[{key!r}] = value",
+            ]
+            continue
+        lines += [
+            f"    value = get(obj, {attribute!r}, _missing)",
+            "    if value is not _missing:",
+            f"        ret[{key!r}] = {expr}",
+        ]
+    lines.append("    return ret")
+    source = "\n".join(lines)
+    exec(compile(source, f"<dump {type(schema).__name__}>", "exec"), namespace)
+    dump = namespace["dump"]
+    dump.source = source
+    return dump
+
+
+class CompiledSchema(Schema):
+    # Set to False to dump every CompiledSchema through plain marshmallow.
+    compiled = True
+    # Called as dump_hook(schema, dump, obj, many) instead of dump(obj, many=many).
+    dump_hook = None
+
+    def dump(self, obj, *, many=None):
+        if self.dump_hook is None:
+            return super().dump(obj, many=many)
+        return self.dump_hook(super().dump, obj, many)
+
+    def _serialize(self, obj, *, many=False):
+        if not self.compiled or self.dict_class is not dict:
+            return super()._serialize(obj, many=many)
+        dumper = self.__dict__.get("_dumper")
+        if dumper is None:
+            dumper = self._dumper = compile_dumper(self)
+        if many and obj is not None:
+            return [dumper(item) for item in obj]
+        return dumper(obj)
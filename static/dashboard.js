@@ -0,0 +1,64 @@
+// Sends the dashboard forms with fetch() to /dashboard/habits and swaps in
+// only the affected row. Without JavaScript the forms post to /dashboard.
+(function () {
+    var list = document.querySelector("[data-habits-url]");
+    var rows = document.getElementById("habit-rows");
+    var addForm = document.getElementById("add-habit");
+    if (!list || !rows || !window.fetch) {
+        return;
+    }
+    var url = list.dataset.habitsUrl;
+    var token = document.querySelector('meta[name="csrf-token"]').content;
+
+    function send(method, target, body) {
+        return fetch(target, {
+            method: method,
+            headers: { "Accept": "text/html", "X-CSRFToken": token },
+            body: body,
+            credentials: "same-origin",
+        }).then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.text();
+        });
+    }
+
+    function toRow(html) {
+        var body = document.createElement("tbody");
+        body.innerHTML = html.trim();
+        return body.firstElementChild;
+    }
+
+    function reload() {
+        window.location.reload();
+    }
+
+    rows.addEventListener("submit", function (event) {
+        var form = event.target;
+        var row = form.closest("tr");
+        var target = url + "/" + row.dataset.habitId;
+        event.preventDefault();
+        if (form.elements.delete) {
+            send("DELETE", target).then(function () {
+                row.remove();
+            }, reload);
+        } else {
+            var data = new FormData();
+            data.append("checked", form.elements.checked.value);
+            send("PATCH", target, data).then(function (html) {
+                row.replaceWith(toRow(html));
+            }, reload);
+        }
+    });
+
+    addForm.addEventListener("submit", function (event) {
+        var data = new FormData();
+        data.append("name", addForm.elements.habit_name.value);
+        event.preventDefault();
+        send("POST", url, data).then(function (html) {
+            rows.appendChild(toRow(html));
+            addForm.reset();
+        }, reload);
+    });
+})();
@@ -0,0 +1,17 @@
+"""
+stats.py
+
+Latency percentiles, shared by the job queue stats and the benchmarks.
+``percentile`` is the nearest-rank percentile: the smallest sample with at
+least ``pct`` percent of the samples at or below it. It returns None when
+there are no samples.
+"""
+
+import math
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
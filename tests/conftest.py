@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+
+import pytest
+from flask_jwt_extended import create_access_token
+from passlib.hash import pbkdf2_sha256
+from sqlalchemy import event
+
+from app import create_app
+from db import db
+from models import UserModel, HabitModel
+
+
+def app_config(tmp_path):
+    return {
+        "BLOCKLIST_BLOOM_PATH": str(tmp_path / "blocklist.bloom"),
+        "PASSWORD_HASH_WORKERS": 0,
+        "LOGIN_RATELIMIT_BACKEND": "memory",
+        "JOBS_WORKERS": 0,
+        "EXPORT_DIR": str(tmp_path / "exports"),
+    }
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app("sqlite:///:memory:", app_config(tmp_path))
+    app.testing = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_user(username="testuser", pwd="password"):
+    user = UserModel(username=username, pwd=pbkdf2_sha256.hash(pwd))
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_habits(user, count, checked="No"):
+    db.session.add_all(
+        HabitModel(name=f"habit {i}", checked=checked, user_id=user.id)
+        for i in range(count)
+    )
+    db.session.commit()
+
+
+def auth_headers(user):
+    token = create_access_token(identity=user.id, fresh=True)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def user(app):
+    return make_user()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@pytest.fixture
+def count_queries(app):
+    @contextmanager
+    def counting():
+        counter = QueryCounter()
+        event.listen(db.engine, "before_cursor_execute", counter)
+        try:
+            yield counter
+        finally:
+            event.remove(db.engine, "before_cursor_execute", counter)
+
+    return counting
@@ -0,0 +1,35 @@
+from accounts import queue_rehash
+from db import db
+from jobs import job_queue
+from models import AuditLogModel, UserModel
+from tests.conftest import auth_headers
+
+
+def test_logins_logouts_and_deletes_are_audited_by_jobs(client, user):
+    user_id = user.id
+    response = client.post("/login", json={"username": "testuser", "pwd": "password"})
+    assert response.status_code == 200
+    client.post("/logout", headers=auth_headers(user))
+    client.delete(f"/user/{user_id}")
+    assert AuditLogModel.query.count() == 0
+
+    assert job_queue.run_pending() == 3
+    events = AuditLogModel.query.order_by(AuditLogModel.created_at).all()
+    assert [(event.event, event.user_id) for event in events] == [
+        ("login", user_id), ("logout", user_id), ("delete", user_id)
+    ]
+    assert events[0].remote_addr == "127.0.0.1"
+
+
+def test_rehash_keeps_a_password_changed_meanwhile(app, user):
+    stale = UserModel.query.one()
+    job = queue_rehash(stale, "new-hash")
+    # Queued once per user however many logins see the old hash.
+    assert queue_rehash(stale, "newer-hash").id == job.id
+    stale.pwd = "changed"
+    db.session.commit()
+
+    job_queue.run_pending()
+    db.session.expire_all()
+    assert (job.status, job.result) == ("done", {"rehashed": False})
+    assert UserModel.query.one().pwd == "changed"
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app import create_app
+from asgi import AsgiApp
+from db import db
+from jobs import job_queue
+from models import AuditLogModel, HabitModel, UserModel
+from rollups import rollups
+from tests.conftest import app_config, auth_headers, make_habits
+from tests.test_rollups import snapshot
+
+
+@pytest.fixture
+def app(tmp_path):
+    # The async engine opens connections of its own, so not :memory:.
+    app = create_app(f"sqlite:///{tmp_path / 'asgi.db'}", app_config(tmp_path))
+    app.testing = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+async def call(asgi_app, method, path, headers=None, body=None):
+    path, _, query = path.partition("?")
+    headers = dict(headers or {})
+    if body is not None:
+        body = json.dumps(body).encode()
+        headers["Content-Type"] = "application/json"
+        headers["Content-Length"] = str(len(body))
+    messages = [{"type": "http.request", "body": body or b""}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "scheme": "http",
+        "http_version": "1.1",
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 50000),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+    await asgi_app(scope, receive, send)
+    status = sent[0]["status"]
+    response_headers = {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+    payload = b"".join(message.get("body", b"") for message in sent[1:])
+    return status, response_headers, json.loads(payload) if payload else None
+
+
+def serve(asgi_app, scenario):
+    async def main():
+        try:
+            return await scenario()
+        finally:
+            await asgi_app.engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def lifespan(asgi_app, *events):
+    queue = [{"type": f"lifespan.{event}"} for event in events]
+    sent = []
+
+    async def receive():
+        return queue.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    await asgi_app({"type": "lifespan"}, receive, send)
+    return sent
+
+
+def test_habits_are_served_on_the_async_engine(app, user, count_queries):
+    make_habits(user, 3)
+    asgi_app = AsgiApp(app)
+    headers = auth_headers(user)
+
+    async def scenario():
+        first = await call(asgi_app, "GET", "/habit?limit=2", headers)
+        second = await call(asgi_app, "GET", f"/habit?cursor={first[2]['next']}", headers)
+        cached = await call(asgi_app, "GET", "/habit?limit=2", {**headers, "If-None-Match": first[1]["etag"]})
+        one = await call(asgi_app, "GET", "/habit/1", headers)
+        missing = await call(asgi_app, "GET", "/habit/99", headers)
+        return first, second, cached, one, missing
+
+    with count_queries() as counter:
+        first, second, cached, one, missing = serve(asgi_app, scenario)
+    # Nothing went through Flask-SQLAlchemy's (sync) engine.
+    assert counter.count == 0
+
+    assert first[0] == 200
+    assert [habit["id"] for habit in first[2]["habits"]] == [1, 2]
+    assert first[2]["habits"][0]["user"] == {"id": user.id, "username": "testuser"}
+    assert [habit["id"] for habit in second[2]["habits"]] == [3]
+    assert second[2]["next"] is None
+    assert cached[0] == 304
+    assert one[0] == 200 and one[2]["name"] == "habit 0"
+    assert one[1]["etag"].startswith('W/"habit-1-')
+    assert missing[0] == 404
+
+
+def test_async_habit_create_matches_the_sync_view(app, user):
+    asgi_app = AsgiApp(app)
+    headers = auth_headers(user)
+
+    async def scenario():
+        return (
+            await call(asgi_app, "POST", "/habit", headers, {"name": "read", "checked": "No", "user_id": user.id}),
+            await call(asgi_app, "POST", "/habit", headers, {"name": "read"}),
+            await call(asgi_app, "POST", "/habit", body={"name": "read", "checked": "No", "user_id": user.id}),
+        )
+
+    created, invalid, anonymous = serve(asgi_app, scenario)
+    assert created[0] == 201
+    assert created[2] == {"id": 1, "name": "read", "checked": "No", "user": {"id": user.id, "username": "testuser"}}
+    assert invalid[0] == 422
+    assert set(invalid[2]["errors"]["json"]) == {"checked", "user_id"}
+    assert anonymous[0] == 401
+    assert anonymous[2]["error"] == "authorization_required"
+
+    db.session.commit()
+    assert HabitModel.query.count() == 1
+    # The rollups were moved in the same transaction.
+    served = snapshot()
+    rollups.rebuild()
+    assert snapshot() == served
+
+
+def test_async_register_and_login(app):
+    asgi_app = AsgiApp(app)
+    credentials = {"username": "async", "pwd": "secret"}
+
+    async def scenario():
+        return (
+            await call(asgi_app, "POST", "/register", body=credentials),
+            await call(asgi_app, "POST", "/register", body=credentials),
+            await call(asgi_app, "POST", "/login", body={**credentials, "pwd": "wrong"}),
+            await call(asgi_app, "POST", "/login", body=credentials),
+        )
+
+    registered, duplicate, rejected, logged_in = serve(asgi_app, scenario)
+    assert registered[0] == 201
+    assert registered[2]["username"] == "async"
+    assert duplicate[0] == 400
+    assert duplicate[2]["message"] == "User with that name alredy exists."
+    assert rejected[0] == 401
+    assert logged_in[0] == 200
+    assert set(logged_in[2]) == {"access_token", "refresh_token"}
+
+    db.session.commit()
+    user = UserModel.query.filter_by(username="async").one()
+    assert user.pwd != "secret"
+    assert job_queue.run_pending() == 1
+    assert [(event.event, event.user_id, event.remote_addr) for event in AuditLogModel.query] == [
+        ("login", user.id, "127.0.0.1")
+    ]
+
+
+def test_other_requests_run_on_worker_threads(app, user):
+    # Each request waits for the other: run one at a time, the barrier
+    # would time out and both requests fail with a 500.
+    make_habits(user, 1)
+    asgi_app = AsgiApp(app)
+    headers = auth_headers(user)
+    barrier = threading.Barrier(2, timeout=5)
+    threads = set()
+
+    @app.before_request
+    def wait_for_the_other():
+        threads.add(threading.get_ident())
+        barrier.wait()
+
+    async def scenario():
+        return await asyncio.gather(*(call(asgi_app, "GET", "/habit/stats", headers) for _ in range(2)))
+
+    results = serve(asgi_app, scenario)
+    assert [status for status, _, _ in results] == [200, 200]
+    assert [len(body) for _, _, body in results] == [1, 1]
+    assert threading.get_ident() not in threads
+
+
+def test_asgi_lifespan(app):
+    asgi_app = AsgiApp(app)
+    app.config["ASGI_THREADS"] = 2
+
+    sent = asyncio.run(lifespan(asgi_app, "startup", "shutdown"))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
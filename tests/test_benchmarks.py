@@ -0,0 +1,28 @@
+from benchmarks.endpoints import compare
+from stats import percentile
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) is None
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {
+        "login": {"p50_ms": 10.0, "p99_ms": 20.0, "rps": 100.0},
+        "refresh": {"p50_ms": 0.5, "p99_ms": 1.0, "rps": 2000.0},
+    }
+    results = {
+        "login": {"p50_ms": 13.0, "p99_ms": 21.0, "rps": 80.0},
+        # 40% slower, but below the absolute noise floor.
+        "refresh": {"p50_ms": 0.7, "p99_ms": 1.2, "rps": 1900.0},
+        "new_scenario": {"p50_ms": 1.0, "p99_ms": 1.0, "rps": 1.0},
+    }
+    regressions = compare(baseline, results, threshold=0.2)
+    assert [(name, metric) for name, metric, _, _ in regressions] == [
+        ("login", "p50_ms"),
+        ("login", "rps"),
+    ]
@@ -0,0 +1,39 @@
+from datetime import date
+
+import bitset
+
+
+def test_runs_and_counts():
+    value = 0
+    for index in (0, 1, 2, 5, 6, 9):
+        value |= 1 << index
+    assert bitset.longest_run(value) == 3
+    assert bitset.run_ending_at(value, 6) == 2
+    assert bitset.run_ending_at(value, 7) == 0
+    assert bitset.run_ending_at(value, 2) == 3
+    assert bitset.count_range(value, 2, 6) == 3
+
+
+def test_join_years_is_contiguous():
+    years = {
+        2023: bitset.with_day(bitset.empty(), bitset.day_index(date(2023, 12, 31))),
+        2024: bitset.with_day(bitset.empty(), bitset.day_index(date(2024, 1, 1))),
+    }
+    value = bitset.join_years(years, 2023, 2024)
+    assert list(bitset.set_days(value, date(2023, 1, 1))) == [
+        date(2023, 12, 31),
+        date(2024, 1, 1),
+    ]
+    assert bitset.longest_run(value) == 2
+
+
+def test_weekly_counts_and_heatmap_cover_the_year():
+    bits = bitset.from_int((1 << 366) - 1)
+    assert sum(bitset.weekly_counts(bits, 2023)) == 365
+    weeks = bitset.weekly_counts(bits, 2024)
+    assert sum(weeks) == 366
+    grid = bitset.heatmap(bits, 2024)
+    assert len(grid) == 7
+    assert sum(cell for row in grid for cell in row if cell) == 366
+    # 2024-01-01 is a Monday
+    assert grid[0][0] == 1
@@ -0,0 +1,73 @@
+import time
+
+from app import create_app
+from blocklist import BLOCKLIST, BloomFilter
+from cache import TTLCache
+from tests.conftest import auth_headers
+
+
+def test_logout_revokes_token(client, user):
+    headers = auth_headers(user)
+    assert client.get("/habit", headers=headers).status_code == 200
+
+    response = client.post("/logout", headers=headers)
+    assert response.status_code == 200
+
+    response = client.get("/habit", headers=headers)
+    assert response.status_code == 401
+    assert response.json["error"] == "token_revoked"
+
+
+def test_revocation_visible_through_backend_only(app):
+    BLOCKLIST.add("revoked-jti", time.time() + 60)
+    app.extensions["blocklist"].recent.clear()
+
+    assert "revoked-jti" in BLOCKLIST
+    assert "unknown-jti" not in BLOCKLIST
+
+
+def test_expired_entries_are_purged(app):
+    BLOCKLIST.add("old-jti", time.time() - 1)
+    BLOCKLIST.add("live-jti", time.time() + 60)
+    BLOCKLIST.purge_expired()
+    app.extensions["blocklist"].recent.clear()
+
+    assert "old-jti" not in BLOCKLIST
+    assert "live-jti" in BLOCKLIST
+
+
+def test_bloom_filter_file_is_shared(tmp_path):
+    path = str(tmp_path / "bloom")
+    writer = BloomFilter(1 << 16, path=path)
+    reader = BloomFilter(1 << 16, path=path)
+    assert writer.created and not reader.created
+
+    writer.add("some-jti")
+    assert "some-jti" in reader
+    assert "other-jti" not in reader
+
+
+def test_ttl_cache_evicts_and_expires():
+    now = [1000.0]
+    cache = TTLCache(maxsize=2, clock=lambda: now[0])
+    cache.set("a", 1, expires_at=1010)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert "a" not in cache
+    assert cache.get("b") == 2
+
+    cache.set("d", 4, expires_at=1005)
+    now[0] = 1006
+    assert cache.get("d") is None
+
+
+def test_database_backend_has_no_bloom_filter_unless_configured(tmp_path):
+    # A host-local filter would hide revocations made on other hosts.
+    app = create_app("sqlite:///:memory:", {"LOGIN_RATELIMIT_BACKEND": "memory", "JOBS_WORKERS": 0})
+    assert app.extensions["blocklist"].bloom is None
+
+    app = create_app(
+        "sqlite:///:memory:",
+        {"BLOCKLIST_BLOOM_PATH": str(tmp_path / "bloom"), "LOGIN_RATELIMIT_BACKEND": "memory", "JOBS_WORKERS": 0},
+    )
+    assert app.extensions["blocklist"].bloom.path == str(tmp_path / "bloom")
@@ -0,0 +1,139 @@
+from datetime import date, timedelta
+
+import pytest
+
+from db import db
+
+from models import HabitModel
+from tests.conftest import make_user, make_habits, auth_headers
+
+
+@pytest.fixture(autouse=True, params=["rows", "bitmap"])
+def history_storage(app, request):
+    app.config["HABIT_HISTORY_STORAGE"] = request.param
+    return request.param
+
+
+def checkin(client, user, habit_id, day):
+    return client.post(
+        f"/habit/{habit_id}/checkin",
+        json={"day": day.isoformat()},
+        headers=auth_headers(user),
+    )
+
+
+def test_streaks_are_maintained_incrementally(client, user):
+    make_habits(user, 1)
+    habit = HabitModel.query.first()
+    today = date.today()
+
+    for offset in (6, 5, 4, 2, 1, 0):
+        assert checkin(client, user, habit.id, today - timedelta(days=offset)).status_code == 201
+
+    response = client.get(
+        f"/habit/{habit.id}/stats", query_string={"days": 7}, headers=auth_headers(user)
+    )
+    assert response.json["current_streak"] == 3
+    assert response.json["longest_streak"] == 3
+    assert response.json["total_checkins"] == 6
+    assert response.json["completion_rate"] == 6 / 7
+
+
+def test_backfill_and_undo_recount(client, user):
+    make_habits(user, 1)
+    habit = HabitModel.query.first()
+    today = date.today()
+
+    checkin(client, user, habit.id, today)
+    checkin(client, user, habit.id, today - timedelta(days=2))
+    response = checkin(client, user, habit.id, today - timedelta(days=1))
+    assert response.json["current_streak"] == 3
+
+    response = client.delete(
+        f"/habit/{habit.id}/checkin",
+        query_string={"day": (today - timedelta(days=1)).isoformat()},
+        headers=auth_headers(user),
+    )
+    assert response.json["current_streak"] == 1
+    assert response.json["longest_streak"] == 1
+    assert response.json["total_checkins"] == 2
+
+
+def test_completion_rate_window(client, user):
+    make_habits(user, 2)
+    first, second = HabitModel.query.order_by(HabitModel.id).all()
+    today = date.today()
+    for offset in range(0, 20, 2):
+        checkin(client, user, first.id, today - timedelta(days=offset))
+
+    response = client.get(
+        "/habit/stats", query_string={"days": 10}, headers=auth_headers(user)
+    )
+    assert [stats["completion_rate"] for stats in response.json] == [0.5, 0.0]
+
+
+def test_checkin_rejects_future_and_foreign_habits(client, user):
+    make_habits(user, 1)
+    habit = HabitModel.query.first()
+    assert checkin(client, user, habit.id, date.today() + timedelta(days=1)).status_code == 400
+
+    stranger = make_user("stranger")
+    assert checkin(client, stranger, habit.id, date.today()).status_code == 404
+
+
+def test_checkin_defaults_to_today(client, user):
+    make_habits(user, 1)
+    habit = HabitModel.query.first()
+    response = client.post(f"/habit/{habit.id}/checkin", json={}, headers=auth_headers(user))
+    assert response.status_code == 201
+    assert response.json["last_checkin"] == date.today().isoformat()
+
+
+def test_history_summary_and_conversion(app, client, user, history_storage):
+    make_habits(user, 1)
+    habit = HabitModel.query.first()
+    assert habit.history_storage == history_storage
+
+    year = date.today().year
+    days = [date(year, 1, 1), date(year, 1, 2), date(year, 1, 9)]
+    for day in days:
+        habit.check_in(day)
+    db.session.commit()
+
+    response = client.get(
+        f"/habit/{habit.id}/history", query_string={"year": year}, headers=auth_headers(user)
+    )
+    assert response.json["total"] == 3
+    assert sum(response.json["weeks"]) == 3
+    weekday = days[0].weekday()
+    assert response.json["heatmap"][weekday][0] == 1
+
+    other = "bitmap" if history_storage == "rows" else "rows"
+    result = app.test_cli_runner().invoke(args=["convert-history", "--storage", other])
+    assert "Converted 1 habits" in result.output
+    db.session.expire_all()
+    assert habit.history_storage == other
+    assert habit.history.days() == days
+    assert habit.stats(days=3660)["total_checkins"] == 3
+
+
+def test_streaks_from_history_match_the_counters(app, user, history_storage):
+    make_habits(user, 1)
+    habit = HabitModel.query.first()
+    today = date.today()
+    # A long run across New Year, a gap, and a run up to yesterday.
+    start = date(today.year - 2, 12, 20)
+    for offset in range(20):
+        habit.check_in(start + timedelta(days=offset))
+    for offset in range(1, 4):
+        habit.check_in(today - timedelta(days=offset))
+    db.session.commit()
+    counters = (habit.current_streak, habit.longest_streak, habit.total_checkins, habit.last_checkin)
+    assert counters == (3, 20, 23, today - timedelta(days=1))
+
+    habit.recount()
+    assert (habit.current_streak, habit.longest_streak, habit.total_checkins, habit.last_checkin) == counters
+    stats = habit.stats(today=today)
+    assert (stats["current_streak"], stats["longest_streak"], stats["total_checkins"]) == (3, 20, 23)
+    assert habit.stats(today=today + timedelta(days=2))["current_streak"] == 0
+    assert habit.history.streaks(today)["current_streak"] == 3
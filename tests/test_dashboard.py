@@ -0,0 +1,63 @@
+from models import HabitModel
+from tests.conftest import make_habits, make_user
+from tests.test_identity import get_dashboard, login
+
+
+def test_toggle_is_one_update_and_returns_the_row(app, client, user, count_queries):
+    make_habits(user, 2)
+    login(app, client)
+    before = HabitModel.query.get(1).version
+
+    with count_queries() as counter:
+        response = client.patch("/dashboard/habits/1")
+    assert response.status_code == 200
+    assert response.data.startswith(b'<tr id="habit-1"')
+    assert b'value="Yes"  selected' in response.data
+    writes = [s for s in counter.statements if not s.startswith("SELECT")]
+    # The habit UPDATE, plus moving the checked count of its name rollup.
+    assert len(writes) == 2 and writes[0].startswith("UPDATE habits")
+    assert writes[1].startswith("INSERT INTO rollup_habit_names")
+    assert "FROM habits" not in " ".join(counter.statements)
+
+    habit = HabitModel.query.get(1)
+    assert habit.checked == "Yes" and habit.version == before + 1
+
+    response = client.patch(
+        "/dashboard/habits/1", json={"checked": "Yes"}, headers={"Accept": "application/json"}
+    )
+    assert response.json == {"id": 1, "name": "habit 0", "checked": "Yes"}
+    assert client.patch("/dashboard/habits/1", json={"checked": "maybe"}).status_code == 400
+
+
+def test_add_and_delete_only_touch_own_habits(app, client, user):
+    other = make_user("other")
+    make_habits(other, 1)
+    login(app, client)
+
+    response = client.post("/dashboard/habits", data={"name": "stretch"})
+    assert response.status_code == 201
+    assert b"stretch" in response.data
+    assert client.post("/dashboard/habits", data={"name": " "}).status_code == 400
+
+    assert client.patch("/dashboard/habits/1").status_code == 404
+    assert client.delete("/dashboard/habits/1").status_code == 404
+    assert HabitModel.query.get(1).checked == "No"
+
+    assert client.delete("/dashboard/habits/2").status_code == 204
+    assert b"stretch" not in get_dashboard(client).data
+
+
+def test_fragment_endpoints_need_login_and_csrf(app, client, user):
+    assert client.post("/dashboard/habits", data={"name": "x"}).status_code == 401
+    login(app, client)
+    app.config["WTF_CSRF_ENABLED"] = True
+    assert client.post("/dashboard/habits", data={"name": "x"}).status_code == 400
+
+
+def test_legacy_form_posts_still_work(app, client, user):
+    make_habits(user, 1)
+    login(app, client)
+    client.post("/dashboard", data={"update": "1", "habit_id": "1", "checked": "Yes"})
+    assert HabitModel.query.get(1).checked == "Yes"
+    client.post("/dashboard", data={"delete": "1", "habit_id": "1"})
+    assert HabitModel.query.count() == 0
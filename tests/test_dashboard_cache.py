@@ -0,0 +1,52 @@
+from cache import TTLCache
+from dashboard_cache import dashboard_cache
+from tests.conftest import auth_headers, make_habits
+from tests.test_identity import get_dashboard, login
+
+
+def test_dashboard_table_is_cached_until_habits_change(app, client, user, count_queries):
+    make_habits(user, 3)
+    login(app, client)
+    assert b"habit 2" in get_dashboard(client).data
+
+    with count_queries() as counter:
+        response = get_dashboard(client)
+    assert b"habit 2" in response.data
+    assert not any("FROM habits" in s and "count" not in s for s in counter.statements)
+    assert dashboard_cache.stats()["hits"] == 1
+
+    client.post("/dashboard", data={"add": "1", "habit_name": "stretch"})
+    assert dashboard_cache.stats()["size"] == 0
+    assert b"stretch" in get_dashboard(client).data
+
+
+def test_rest_writes_invalidate_and_tags_catch_other_workers(app, client, user):
+    make_habits(user, 1)
+    login(app, client)
+    get_dashboard(client)
+
+    client.put("/habit/1", json={"name": "renamed", "checked": "Yes"}, headers=auth_headers(user))
+    assert dashboard_cache.stats()["size"] == 0
+    assert b"renamed" in get_dashboard(client).data
+
+    # A write this worker never saw: the tag no longer matches the entry.
+    app.extensions["dashboard_cache"].set(user.id, ("stale-tag", "<table>old</table>"))
+    assert b"<table>old</table>" not in get_dashboard(client).data
+
+    client.delete("/habit/1", headers=auth_headers(user))
+    assert b"renamed" not in get_dashboard(client).data
+
+
+def test_ttl_cache_bounds_total_weight():
+    cache = TTLCache(maxsize=10, maxweight=10, weigh=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.get("a")
+    cache.set("c", "xxxx")
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.weight == 8
+
+    cache.set("huge", "x" * 11)
+    assert "huge" not in cache
+    cache.pop("a")
+    assert cache.stats()["weight"] == 4
@@ -0,0 +1,43 @@
+from flask import Flask
+from sqlalchemy import text
+
+from app import create_app
+from db import db
+from engine import configure_engine
+
+
+def test_sqlite_file_gets_wal_and_busy_timeout(tmp_path):
+    app = create_app(
+        f"sqlite:///{tmp_path / 'data.db'}",
+        {"BLOCKLIST_BACKEND": "memory", "SQLITE_BUSY_TIMEOUT_MS": 1234},
+    )
+    report = app.extensions["engine_profile"]
+    assert report["journal_mode"] == "wal"
+    assert report["busy_timeout"] == 1234
+
+    with app.app_context():
+        # Every pooled connection is set up, not just the self-check's.
+        with db.engine.connect() as conn:
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+
+
+def test_postgres_profile_options():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql://user:pwd@db/habits"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_size": 20}
+    app.config["DATABASE_STATEMENT_TIMEOUT_MS"] = 5000
+    configure_engine(app)
+
+    options = app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    assert options["pool_size"] == 20
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"]["options"] == "-c statement_timeout=5000"
+
+
+def test_self_check_can_be_disabled(tmp_path):
+    app = create_app(
+        f"sqlite:///{tmp_path / 'data.db'}",
+        {"BLOCKLIST_BACKEND": "memory", "DATABASE_SELF_CHECK": False},
+    )
+    assert app.extensions["engine_profile"] is None
@@ -0,0 +1,79 @@
+from tests.conftest import make_user, make_habits, auth_headers
+
+
+def test_habit_get_returns_304_for_matching_etag(client, user, count_queries):
+    make_habits(user, 1)
+    headers = auth_headers(user)
+
+    response = client.get("/habit/1", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    with count_queries() as counter:
+        response = client.get("/habit/1", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+    habit_selects = [s for s in counter.statements if "FROM habits" in s]
+    assert len(habit_selects) == 1
+    assert "habits.name" not in habit_selects[0]
+
+
+def test_habit_etag_changes_after_update(client, user):
+    make_habits(user, 1)
+    headers = auth_headers(user)
+    etag = client.get("/habit/1", headers=headers).headers["ETag"]
+
+    client.put("/habit/1", json={"name": "renamed", "checked": "Yes"}, headers=headers)
+
+    response = client.get("/habit/1", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json["name"] == "renamed"
+    assert response.headers["ETag"] != etag
+
+
+def test_habit_get_missing_is_404(client, user):
+    response = client.get("/habit/99", headers=auth_headers(user))
+    assert response.status_code == 404
+
+
+def test_habit_list_etag_tracks_inserts_and_deletes(client, user):
+    make_habits(user, 3)
+    headers = auth_headers(user)
+    etag = client.get("/habit", headers=headers).headers["ETag"]
+
+    response = client.get("/habit", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    make_habits(user, 1)
+    response = client.get("/habit", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    client.delete("/habit/1", headers=headers)
+    response = client.get("/habit", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json["habits"]) == 3
+
+
+def test_habit_list_etag_differs_per_page(client, user):
+    make_habits(user, 5)
+    headers = auth_headers(user)
+    first = client.get("/habit", query_string={"limit": 2}, headers=headers)
+    second = client.get(
+        "/habit",
+        query_string={"limit": 2, "cursor": first.json["next"]},
+        headers={**headers, "If-None-Match": first.headers["ETag"]},
+    )
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+def test_user_get_returns_304_for_matching_etag(client, user):
+    other = make_user("otheruser")
+    headers = auth_headers(user)
+    etag = client.get(f"/user/{other.id}", headers=headers).headers["ETag"]
+
+    response = client.get(f"/user/{other.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
@@ -0,0 +1,74 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date
+
+from commands import export_command
+from db import db
+from models import HabitModel
+from tests.conftest import make_user, make_habits, auth_headers
+
+
+def seed_history(user):
+    make_habits(user, 2)
+    rows, bitmap = HabitModel.query.filter_by(user_id=user.id).order_by(HabitModel.id).all()
+    bitmap.history_storage = "bitmap"
+    rows.check_in(date(2024, 3, 1))
+    rows.check_in(date(2024, 3, 2))
+    bitmap.check_in(date(2023, 12, 31))
+    db.session.commit()
+    return rows, bitmap
+
+
+def test_ndjson_export_streams_habits_and_history(client, user):
+    rows, bitmap = seed_history(user)
+    make_habits(make_user("otheruser"), 3)
+
+    response = client.get("/export", headers=auth_headers(user))
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    habits = [r for r in records if r["type"] == "habit"]
+    checkins = [(r["habit_id"], r["day"]) for r in records if r["type"] == "checkin"]
+    assert [h["id"] for h in habits] == [rows.id, bitmap.id]
+    assert habits[0]["total_checkins"] == 2
+    assert checkins == [
+        (rows.id, "2024-03-01"),
+        (rows.id, "2024-03-02"),
+        (bitmap.id, "2023-12-31"),
+    ]
+
+
+def test_csv_export_is_gzipped_when_accepted(client, user):
+    seed_history(user)
+    response = client.get(
+        "/export",
+        query_string={"format": "csv", "table": "checkins"},
+        headers={**auth_headers(user), "Accept-Encoding": "gzip"},
+    )
+    assert response.headers["Content-Encoding"] == "gzip"
+    text = gzip.decompress(response.get_data()).decode()
+    assert list(csv.reader(io.StringIO(text)))[0] == ["habit_id", "day"]
+    assert len(text.splitlines()) == 4
+
+
+def test_csv_export_needs_a_single_table(client, user):
+    response = client.get(
+        "/export", query_string={"format": "csv"}, headers=auth_headers(user)
+    )
+    assert response.status_code == 422
+
+
+def test_export_command(app, user, tmp_path):
+    seed_history(user)
+    output = tmp_path / "habits.csv.gz"
+    result = app.test_cli_runner().invoke(
+        export_command, ["--format", "csv", "--table", "habits", "--gzip", "-o", str(output)]
+    )
+    assert result.exit_code == 0, result.output
+    lines = gzip.decompress(output.read_bytes()).decode().splitlines()
+    assert lines[0].startswith("id,user_id,name")
+    assert len(lines) == 3
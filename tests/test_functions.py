@@ -5,7 +5,7 @@ from app import create_app
 
 @pytest.fixture
 def app():
-    app = create_app("sqlite:///:memory:")
+    app = create_app("sqlite:///:memory:", {"JOBS_WORKERS": 0})
     app.testing = True
     with app.test_client() as client:
         with app.app_context():
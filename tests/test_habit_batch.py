@@ -0,0 +1,116 @@
+from datetime import date
+from types import SimpleNamespace
+
+from db import db
+from models import HabitModel
+from resources import habit as habit_resource
+from rollups import rollups
+from tests.conftest import make_user, make_habits, auth_headers
+from tests.test_rollups import snapshot
+
+
+def test_batch_create_reports_per_item(client, user, count_queries):
+    habits = [{"name": f"habit {i}", "checked": "No"} for i in range(5)]
+    habits.insert(2, {"name": "missing checked"})
+
+    with count_queries() as counter:
+        response = client.post(
+            "/habit/batch", json={"habits": habits}, headers=auth_headers(user)
+        )
+
+    results = response.json["results"]
+    assert response.status_code == 200
+    assert [result["status"] for result in results] == [201, 201, 400, 201, 201, 201]
+    assert "checked" in results[2]["errors"]
+    assert HabitModel.query.filter_by(user_id=user.id).count() == 5
+    assert sum("INSERT INTO habits" in statement for statement in counter.statements) == 1
+
+
+def test_batch_update_only_touches_own_habits(client, user):
+    other = make_user("otheruser")
+    make_habits(user, 2)
+    make_habits(other, 1)
+    mine = [habit.id for habit in HabitModel.query.filter_by(user_id=user.id)]
+    theirs = HabitModel.query.filter_by(user_id=other.id).first().id
+
+    response = client.put(
+        "/habit/batch",
+        json={
+            "habits": [
+                {"id": mine[0], "checked": "Yes"},
+                {"id": mine[1], "name": "renamed"},
+                {"id": theirs, "checked": "Yes"},
+                {"id": mine[0], "user_id": other.id},
+            ]
+        },
+        headers=auth_headers(user),
+    )
+
+    assert [result["status"] for result in response.json["results"]] == [200, 200, 404, 400]
+    assert db.session.get(HabitModel, mine[0]).checked == "Yes"
+    assert db.session.get(HabitModel, mine[1]).name == "renamed"
+    assert db.session.get(HabitModel, theirs).checked == "No"
+
+
+def test_batch_delete(client, user):
+    make_habits(user, 3)
+    ids = [habit.id for habit in HabitModel.query.all()]
+    user_habit = db.session.get(HabitModel, ids[0])
+    user_habit.check_in(date.today())
+
+    response = client.delete(
+        "/habit/batch", json={"ids": ids[:2] + [9999]}, headers=auth_headers(user)
+    )
+
+    assert [result["status"] for result in response.json["results"]] == [200, 200, 404]
+    assert [habit.id for habit in HabitModel.query.all()] == ids[2:]
+
+
+def test_batch_create_ids_follow_input_order(client, user):
+    habits = [{"name": f"habit {i}", "checked": "No"} for i in range(20)]
+    response = client.post("/habit/batch", json={"habits": habits}, headers=auth_headers(user))
+    for result in response.json["results"]:
+        assert db.session.get(HabitModel, result["id"]).name == f"habit {result['index']}"
+
+
+def test_batch_create_failure_rolls_back(client, user):
+    # No such user: the habits' foreign key fails the bulk INSERT.
+    headers = auth_headers(SimpleNamespace(id=9999))
+    response = client.post(
+        "/habit/batch", json={"habits": [{"name": "orphan", "checked": "No"}]}, headers=headers
+    )
+    assert response.status_code == 500
+    assert HabitModel.query.count() == 0
+
+    response = client.post(
+        "/habit/batch", json={"habits": [{"name": "mine", "checked": "No"}]}, headers=auth_headers(user)
+    )
+    assert response.json["results"][0]["status"] == 201
+
+
+def test_batch_update_conflict_changes_nothing(client, user, monkeypatch):
+    make_habits(user, 2)
+    rollups.habits_added()
+    db.session.commit()
+    before = snapshot()
+    read_versions = habit_resource.owned_habit_versions
+
+    def concurrent_update(habit_ids):
+        # Another writer bumps a version after the batch has read them.
+        versions = read_versions(habit_ids)
+        db.session.execute(db.text("UPDATE habits SET version = version + 1 WHERE id = 2"))
+        return versions
+
+    monkeypatch.setattr(habit_resource, "owned_habit_versions", concurrent_update)
+    response = client.put(
+        "/habit/batch",
+        json={"habits": [{"id": 1, "name": "renamed", "checked": "Yes"}, {"id": 2, "checked": "Yes"}]},
+        headers=auth_headers(user),
+    )
+    assert response.status_code == 409
+    db.session.expire_all()
+    assert [(habit.name, habit.checked) for habit in HabitModel.query.order_by(HabitModel.id)] == [
+        ("habit 0", "No"),
+        ("habit 1", "No"),
+    ]
+    assert snapshot() == before
@@ -0,0 +1,86 @@
+from db import db
+from loading import eager_options
+from models import HabitModel
+from schemas import HabitSchema
+from tests.conftest import make_user, make_habits, auth_headers
+
+
+def test_habit_list_is_scoped_to_identity(client, user):
+    other = make_user("otheruser")
+    make_habits(user, 3)
+    make_habits(other, 2)
+
+    response = client.get("/habit", headers=auth_headers(user))
+    assert response.status_code == 200
+    assert len(response.json["habits"]) == 3
+    assert response.json["next"] is None
+
+
+def test_habit_list_keyset_pagination(client, user):
+    make_habits(user, 7)
+    headers = auth_headers(user)
+
+    seen = []
+    cursor = None
+    while True:
+        query = {"limit": 3}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/habit", query_string=query, headers=headers)
+        assert response.status_code == 200
+        page = response.json["habits"]
+        assert len(page) <= 3
+        seen.extend(habit["id"] for habit in page)
+        cursor = response.json["next"]
+        if cursor is None:
+            break
+
+    assert seen == sorted(seen)
+    assert len(set(seen)) == 7
+
+
+def test_habit_list_page_size_is_capped(client, user):
+    make_habits(user, 120)
+    response = client.get(
+        "/habit", query_string={"limit": 1000}, headers=auth_headers(user)
+    )
+    assert len(response.json["habits"]) == 100
+    assert response.json["next"] is not None
+
+
+def test_habit_list_rejects_bad_cursor(client, user):
+    response = client.get(
+        "/habit", query_string={"cursor": "!!"}, headers=auth_headers(user)
+    )
+    assert response.status_code == 400
+
+
+def test_habit_list_query_count_is_constant(client, count_queries):
+    client.get("/habit", headers=auth_headers(make_user("warmup")))
+    counts = []
+    for size in (1, 20):
+        user = make_user(f"user{size:04d}")
+        make_habits(user, size)
+        headers = auth_headers(user)
+        db.session.expunge_all()
+        with count_queries() as counter:
+            response = client.get("/habit", headers=headers)
+        assert len(response.json["habits"]) == size
+        assert all(habit["user"]["username"] for habit in response.json["habits"])
+        counts.append(counter.count)
+
+    assert counts[0] == counts[1]
+
+
+def test_eager_options_avoid_lazy_user_loads(app, count_queries):
+    for i in range(10):
+        make_habits(make_user(f"user{i:04d}"), 2)
+    db.session.expunge_all()
+
+    schema = HabitSchema(many=True)
+    with count_queries() as counter:
+        habits = HabitModel.query.options(*eager_options(HabitModel, schema)).all()
+        dumped = schema.dump(habits)
+
+    assert len(dumped) == 20
+    assert counter.count == 1
@@ -0,0 +1,41 @@
+from flask import g
+
+from identity import identity_cache
+from tests.conftest import make_user, auth_headers
+
+
+def login(app, client):
+    app.config["WTF_CSRF_ENABLED"] = False
+    response = client.post("/login_user", data={"username": "testuser", "pwd": "password"})
+    assert response.status_code == 302
+
+
+def get_dashboard(client):
+    # The test app context outlives requests; drop Flask-Login's per-context
+    # user so each request goes through the user loader like in production.
+    g.pop("_login_user", None)
+    return client.get("/dashboard")
+
+
+def test_dashboard_reuses_cached_identity(app, client, user, count_queries):
+    login(app, client)
+    get_dashboard(client)
+
+    with count_queries() as counter:
+        response = get_dashboard(client)
+    assert response.status_code == 200
+    assert b"Welcome, testuser" in response.data
+    assert not any("FROM users" in statement for statement in counter.statements)
+    assert identity_cache.stats()["hits"] >= 1
+
+
+def test_user_delete_invalidates_identity(app, client, user):
+    login(app, client)
+    get_dashboard(client)
+    assert identity_cache.stats()["size"] == 1
+
+    client.delete(f"/user/{user.id}")
+    assert identity_cache.stats()["size"] == 0
+
+    response = client.get("/user/identity-cache", headers=auth_headers(make_user("admin")))
+    assert set(response.json) == {"size", "maxsize", "hits", "misses"}
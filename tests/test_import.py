@@ -0,0 +1,74 @@
+import json
+
+from bulk_import import run_import
+from commands import import_command
+from models import HabitModel, JobModel, UserModel
+from passwords import crypt_context
+from tests.conftest import make_user
+
+
+def write_lines(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+
+def test_import_users_hashes_and_skips_duplicates(app, tmp_path):
+    make_user("existing")
+    path = write_lines(tmp_path / "users.ndjson", [
+        {"username": "alice", "pwd": "secret1"},
+        {"username": "existing", "pwd": "secret2"},
+        {"username": "alice", "pwd": "again"},
+        {"username": "bob"},
+    ])
+    errors = []
+    stats = run_import("users", path, chunk_size=2, on_error=lambda *error: errors.append(error))
+
+    assert stats == {"resumed_from": 0, "read": 4, "inserted": 1, "skipped": 2, "invalid": 1}
+    assert errors == [(4, {"pwd": ["Missing data for required field."]})]
+    alice = UserModel.query.filter_by(username="alice").one()
+    assert crypt_context(app.config["PASSWORD_HASH_ROUNDS"]).verify("secret1", alice.pwd)
+
+
+def test_import_pre_hashed_passwords_from_csv(app, tmp_path):
+    hashed = crypt_context(1000).hash("secret")
+    path = tmp_path / "users.csv"
+    path.write_text(f"username,pwd\ncarol,{hashed}\ndave,plaintext\n")
+
+    stats = run_import("users", str(path), pre_hashed=True)
+    assert stats["inserted"] == 1
+    assert stats["invalid"] == 1
+    assert UserModel.query.filter_by(username="carol").one().pwd == hashed
+
+
+def test_import_habits_resolves_usernames(app, user, tmp_path):
+    path = write_lines(tmp_path / "habits.ndjson", [
+        {"name": "read", "checked": "No", "username": user.username},
+        {"name": "run", "checked": "Yes", "user_id": user.id},
+        {"name": "swim", "checked": "No", "user_id": 999},
+        "not json",
+    ])
+    stats = run_import("habits", path)
+    assert stats["inserted"] == 2
+    assert stats["invalid"] == 2
+    assert sorted(h.name for h in HabitModel.query.filter_by(user_id=user.id)) == ["read", "run"]
+
+
+def test_import_resumes_from_checkpoint(app, user, tmp_path):
+    path = write_lines(tmp_path / "habits.ndjson", [
+        {"name": f"habit {number}", "checked": "No", "user_id": user.id} for number in range(5)
+    ])
+    # Workers configured as in a deployment; the command still starts none.
+    app.extensions["jobs"].size = 2
+    runner = app.test_cli_runner()
+    result = runner.invoke(import_command, ["habits", path, "--chunk-size", "2"])
+    assert result.exit_code == 0, result.output
+    assert "5 inserted" in result.output
+    assert "Queued a rollup rebuild" in result.output
+    assert not app.extensions["jobs"].threads
+    assert JobModel.query.one().status == "queued"
+
+    result = runner.invoke(import_command, ["habits", path])
+    assert "Resumed after row 5." in result.output
+    assert "0 rows read" in result.output
+    assert "Queued" not in result.output
+    assert HabitModel.query.count() == 5
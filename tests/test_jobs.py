@@ -0,0 +1,140 @@
+import gzip
+import json
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from db import db
+from jobs import TASKS, job_queue, sweep, task
+from models import JobModel
+from tests.conftest import auth_headers, make_habits
+
+calls = []
+
+
+@task("test_echo")
+def echo(value):
+    calls.append(value)
+    return {"value": value}
+
+
+@task("test_flaky", max_attempts=2)
+def flaky():
+    calls.append("flaky")
+    raise RuntimeError("boom")
+
+
+def test_jobs_run_retry_and_report(app):
+    app.config["JOBS_RETRY_DELAY"] = 0
+    calls.clear()
+    echo_job = job_queue.enqueue("test_echo", {"value": 1})
+    flaky_job = job_queue.enqueue("test_flaky")
+    db.session.commit()
+    assert job_queue.stats()["depth"] == 2
+
+    assert job_queue.run_pending() == 3
+    assert calls == [1, "flaky", "flaky"]
+    db.session.expire_all()
+    assert (echo_job.status, echo_job.result) == ("done", {"value": 1})
+    assert (flaky_job.status, flaky_job.attempts) == ("failed", 2)
+    assert flaky_job.error == "RuntimeError: boom"
+
+    stats = job_queue.stats()
+    assert (stats["depth"], stats["done"], stats["failed"]) == (0, 1, 1)
+    assert stats["run_ms"]["p50"] is not None
+
+
+def test_idempotency_key_holds_while_the_job_is_pending(app):
+    first = job_queue.enqueue("test_echo", {"value": 1}, key="once")
+    assert job_queue.enqueue("test_echo", {"value": 2}, key="once").id == first.id
+    db.session.commit()
+    job_queue.run_pending()
+
+    again = job_queue.enqueue("test_echo", {"value": 3}, key="once")
+    assert again.id != first.id
+    assert JobModel.query.count() == 2
+
+
+def test_sweep_requeues_abandoned_jobs_and_prunes_old_ones(app):
+    app.config.update(JOBS_LEASE=60, JOBS_RETENTION=60)
+    old = datetime.utcnow() - timedelta(minutes=5)
+    job_queue.enqueue("test_echo", {"value": 1})
+    job_queue.enqueue("test_echo", {"value": 2})
+    db.session.commit()
+    abandoned, finished = JobModel.query.order_by(JobModel.id).all()
+    abandoned.status, abandoned.started_at = "running", old
+    finished.status, finished.finished_at = "done", old
+    db.session.commit()
+
+    assert sweep() == (1, 0, 1)
+    assert [job.status for job in JobModel.query.all()] == ["queued"]
+
+
+def test_sweep_fails_abandoned_jobs_out_of_attempts(app):
+    # A job that keeps killing its worker is not requeued forever.
+    app.config["JOBS_LEASE"] = 60
+    job = job_queue.enqueue("test_echo", {"value": 1}, max_attempts=2)
+    db.session.commit()
+    for attempts, status in ((1, "queued"), (2, "failed")):
+        job.status, job.attempts = "running", attempts
+        job.started_at = datetime.utcnow() - timedelta(minutes=5)
+        db.session.commit()
+        sweep()
+        db.session.expire_all()
+        assert job.status == status
+    assert job.finished_at is not None
+    assert job.error == "Worker stopped responding after 60s"
+
+
+def test_export_job_writes_a_file_for_its_owner(app, client, user):
+    make_habits(user, 2)
+    headers = {**auth_headers(user), "Idempotency-Key": "abc"}
+
+    response = client.post("/export/jobs", json={"table": "habits"}, headers=headers)
+    assert response.status_code == 202
+    job_id = response.json["id"]
+    assert response.headers["Location"].endswith(f"/jobs/{job_id}")
+    assert client.post("/export/jobs", json={"table": "habits"}, headers=headers).json["id"] == job_id
+    assert client.get(f"/export/jobs/{job_id}/file", headers=headers).status_code == 409
+
+    job_queue.run_pending()
+    assert client.get(f"/jobs/{job_id}", headers=headers).json["status"] == "done"
+    response = client.get(f"/export/jobs/{job_id}/file", headers=headers)
+    lines = gzip.decompress(response.data).decode().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["habit 0", "habit 1"]
+    assert client.get("/jobs/stats", headers=headers).status_code == 403
+    app.config["SEARCH_STAFF_USER_IDS"] = {user.id}
+    assert client.get("/jobs/stats", headers=headers).json["done"] == 1
+
+
+def test_worker_threads_pick_up_jobs(tmp_path):
+    app = create_app(
+        f"sqlite:///{tmp_path / 'jobs.db'}",
+        {
+            "BLOCKLIST_BACKEND": "memory",
+            "LOGIN_RATELIMIT_BACKEND": "memory",
+            "JOBS_WORKERS": 1,
+            "JOBS_POLL_INTERVAL": 0.05,
+        },
+    )
+    with app.app_context():
+        db.create_all()
+        job = job_queue.enqueue("test_echo", {"value": "threaded"})
+        db.session.commit()
+        # Enqueueing outside a request (a CLI command) starts no workers.
+        assert job_queue.stats()["workers"] == 0
+        app.test_client().get("/jobs/stats")
+        try:
+            deadline = time.monotonic() + 5
+            while db.session.get(JobModel, job.id).status != "done" and time.monotonic() < deadline:
+                db.session.expire_all()
+                time.sleep(0.05)
+            assert db.session.get(JobModel, job.id).status == "done"
+            assert job_queue.stats()["workers"] == 1
+        finally:
+            job_queue.stop(timeout=5)
+            db.session.remove()
+
+
+def test_tasks_of_the_app_are_registered():
+    assert {"purge_user", "export", "rebuild_rollups"} <= set(TASKS)
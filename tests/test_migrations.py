@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+from flask_migrate import downgrade, upgrade
+
+import bitset
+from app import create_app
+from db import db
+from models import HabitCheckinBitmapModel, HabitCheckinModel
+from rollups import rollups
+from tests.conftest import make_habits, make_user
+from tests.test_rollups import snapshot
+
+ROLLUP_TABLES = (
+    "rollup_days", "rollup_habit_days", "rollup_habit_names",
+    "rollup_habits_per_user", "rollup_user_days",
+)
+DAY = date.today() - timedelta(days=3)
+
+
+def test_upgrade_backfills_the_rollups(tmp_path):
+    app = create_app(
+        f"sqlite:///{tmp_path / 'upgraded.db'}",
+        {"LOGIN_RATELIMIT_BACKEND": "memory", "JOBS_WORKERS": 0, "MIGRATE_ENABLED": True},
+    )
+    with app.app_context():
+        # A database from before the per-user habit counts, with history
+        # in both storage modes and rollups that were never filled in. The
+        # models follow head, so fill it there and step back down.
+        upgrade()
+        user, other = make_user(), make_user("other")
+        make_habits(user, 3, checked="Yes")
+        make_habits(other, 1)
+        db.session.add_all([
+            HabitCheckinModel(habit_id=1, day=DAY, running_total=1),
+            HabitCheckinModel(habit_id=2, day=DAY, running_total=1),
+            HabitCheckinBitmapModel(
+                habit_id=4, year=DAY.year, bits=bitset.with_day(bitset.empty(), bitset.day_index(DAY))
+            ),
+        ])
+        db.session.commit()
+        downgrade(revision="2d8c51f0b7e3")
+        for table in ROLLUP_TABLES:
+            db.session.execute(db.text(f"DELETE FROM {table}"))
+        db.session.commit()
+
+        upgrade()
+        upgraded = snapshot()
+        rollups.rebuild()
+        assert snapshot() == upgraded
+        assert ("rollup_days", DAY, 2, 3) in upgraded
+        assert ("rollup_habits_per_user", 3, 1) in upgraded
+        db.session.remove()
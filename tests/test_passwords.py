@@ -0,0 +1,48 @@
+from app import create_app
+from db import db
+from jobs import job_queue
+from models import UserModel
+from passwords import passwords
+
+
+def register_and_login(client):
+    response = client.post("/register", json={"username": "testuser", "pwd": "password"})
+    assert response.status_code == 201
+    return client.post("/login", json={"username": "testuser", "pwd": "password"})
+
+
+def test_login_rehashes_when_cost_changes(app, client):
+    app.extensions["passwords"].rounds = 1000
+    assert register_and_login(client).status_code == 200
+    assert "$1000$" in UserModel.query.one().pwd
+
+    app.extensions["passwords"].rounds = 2000
+    assert client.post("/login", json={"username": "testuser", "pwd": "password"}).status_code == 200
+    # The new hash is written by a job, after the response.
+    assert "$1000$" in UserModel.query.one().pwd
+    job_queue.run_pending()
+    db.session.expire_all()
+    assert "$2000$" in UserModel.query.one().pwd
+
+    response = client.post("/login", json={"username": "testuser", "pwd": "wrong"})
+    assert response.status_code == 401
+
+
+def test_hashing_in_process_pool(tmp_path):
+    app = create_app(
+        "sqlite:///:memory:",
+        {
+            "BLOCKLIST_BLOOM_PATH": str(tmp_path / "bloom"),
+            "PASSWORD_HASH_WORKERS": 1,
+            "PASSWORD_HASH_ROUNDS": 1000,
+            "LOGIN_RATELIMIT_BACKEND": "memory",
+            "JOBS_WORKERS": 0,
+        },
+    )
+    with app.app_context():
+        db.create_all()
+        try:
+            assert register_and_login(app.test_client()).status_code == 200
+            assert passwords.verify("password", UserModel.query.one().pwd) == (True, None)
+        finally:
+            app.extensions["passwords"].shutdown()
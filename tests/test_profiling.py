@@ -0,0 +1,103 @@
+import json
+import logging
+import threading
+import time
+
+import pytest
+from flask import g
+from marshmallow import Schema
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from db import db
+from profiling import StackSampler
+from serializers import CompiledSchema
+from tests.conftest import make_user, make_habits, auth_headers
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    app = create_app(
+        "sqlite:///:memory:",
+        {
+            "BLOCKLIST_BLOOM_PATH": str(tmp_path / "blocklist.bloom"),
+            "PASSWORD_HASH_WORKERS": 0,
+            "LOGIN_RATELIMIT_BACKEND": "memory",
+            "PROFILING_ENABLED": True,
+            "JOBS_WORKERS": 0,
+        },
+    )
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_metrics_disabled_by_default(client):
+    assert client.get("/metrics").status_code == 404
+
+
+def test_request_metrics_and_log(profiled_app, caplog):
+    client = profiled_app.test_client()
+    user = make_user()
+    make_habits(user, 3)
+
+    with caplog.at_level(logging.INFO, logger="profiling"):
+        response = client.get("/habit", headers=auth_headers(user))
+    assert response.status_code == 200
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["endpoint"] == "Habits.HabitList"
+    assert record["status"] == 200
+    assert record["sql_count"] >= 2
+    assert record["dump_ms"] > 0
+
+    metrics = client.get("/metrics")
+    assert metrics.mimetype == "text/plain"
+    body = metrics.get_data(as_text=True)
+    assert (
+        'http_request_duration_seconds_count{endpoint="Habits.HabitList",method="GET",status="200"} 1'
+        in body
+    )
+    assert f'db_statements_total{{endpoint="Habits.HabitList"}} {record["sql_count"]}' in body
+    assert 'endpoint="metrics"' not in body
+
+
+def test_only_the_apps_schemas_are_timed(profiled_app):
+    # marshmallow's own Schema (flask-smorest's, other libraries') is left alone.
+    assert Schema.dump.__module__ == "marshmallow.schema"
+    assert CompiledSchema.dump_hook is not None
+
+
+def test_failed_statements_leave_no_timer_behind(profiled_app):
+    with profiled_app.test_request_context("/"):
+        profiled_app.preprocess_request()
+        with pytest.raises(OperationalError):
+            db.session.execute(text("SELECT * FROM no_such_table"))
+        db.session.rollback()
+        db.session.execute(text("SELECT 1"))
+        assert db.session.connection().info["profile_start"] == []
+        assert g._profile["sql_count"] == 2
+
+
+def test_stack_sampler_only_samples_slow_threads():
+    sampler = StackSampler(slow_after=0.05, interval=0.005)
+    stop = threading.Event()
+
+    def busy():
+        sampler.start(threading.get_ident())
+        while not stop.is_set():
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=busy)
+    thread.start()
+    sampler.sample()
+    time.sleep(0.1)
+    stop.set()
+    thread.join()
+
+    samples = sampler.stop(thread.ident)
+    assert sum(samples.values()) >= 1
+    assert any("busy (test_profiling.py" in stack for stack in samples)
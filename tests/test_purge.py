@@ -0,0 +1,58 @@
+from datetime import date
+
+from db import db
+from models import HabitCheckinModel, HabitModel, UserModel
+from jobs import job_queue
+from tests.conftest import auth_headers, make_habits, make_user
+
+
+def add_history(user, habits):
+    make_habits(user, habits)
+    for habit in HabitModel.query.filter_by(user_id=user.id):
+        habit.check_in(date(2024, 1, 1))
+    db.session.commit()
+
+
+def test_user_delete_is_one_statement(app, client, user, count_queries):
+    user_id = user.id
+    add_history(user, 5)
+    other = make_user("other")
+    add_history(other, 1)
+
+    with count_queries() as counter:
+        response = client.delete(f"/user/{user_id}")
+    assert response.status_code == 200
+    deletes = [s for s in counter.statements if s.startswith("DELETE")]
+    assert deletes == ["DELETE FROM users WHERE users.id = ?"]
+
+    assert HabitModel.query.count() == 1
+    assert HabitCheckinModel.query.count() == 1
+    assert client.delete(f"/user/{user_id}").status_code == 404
+
+
+def test_large_accounts_are_purged_in_chunks_by_a_job(app, client, user):
+    app.config.update(USER_PURGE_THRESHOLD=3, USER_PURGE_CHUNK_SIZE=2)
+    add_history(user, 5)
+    headers = auth_headers(user)
+
+    response = client.delete(f"/user/{user.id}")
+    assert response.status_code == 202
+    job_id = response.json["job_id"]
+    # Deleting again while the purge is queued reuses its job.
+    assert client.delete(f"/user/{user.id}").json["job_id"] == job_id
+    assert client.get(f"/jobs/{job_id}", headers=headers).json["status"] == "queued"
+    # The purge, and the audit records of both deletes.
+    assert job_queue.run_pending() == 3
+    assert client.get(f"/jobs/{job_id}", headers=headers).json["status"] == "done"
+
+    assert UserModel.query.count() == 0
+    assert HabitModel.query.count() == 0
+    assert HabitCheckinModel.query.count() == 0
+
+
+def test_purge_user_command(app, user):
+    make_habits(user, 3)
+    result = app.test_cli_runner().invoke(args=["purge-user", str(user.id), "--chunk-size", "2"])
+    assert result.exit_code == 0, result.output
+    assert "3 habits" in result.output
+    assert UserModel.query.count() == 0
@@ -0,0 +1,47 @@
+from ratelimit import MemoryBackend, SQLiteBackend
+from tests.conftest import make_user
+
+
+def test_login_is_throttled_before_lookup(app, client, count_queries):
+    app.extensions["login_limiter"].limits["user"] = (3, 60)
+    make_user()
+
+    for _ in range(3):
+        response = client.post("/login", json={"username": "testuser", "pwd": "wrong"})
+        assert response.status_code == 401
+
+    with count_queries() as counter:
+        response = client.post("/login", json={"username": "testuser", "pwd": "password"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert counter.count == 0
+
+    response = client.post("/login", json={"username": "otheruser", "pwd": "password"})
+    assert response.status_code == 401
+
+
+def test_sliding_window_weights_previous_window():
+    backend = MemoryBackend(max_keys=10)
+    assert all(backend.hit("k", 4, 10, 100 + i) for i in range(4))
+    assert not backend.hit("k", 4, 10, 109)
+    # Half-way into the next window half of the previous count still applies.
+    assert backend.hit("k", 4, 10, 115)
+    assert backend.hit("k", 4, 10, 115)
+    assert not backend.hit("k", 4, 10, 115)
+
+
+def test_memory_backend_is_bounded():
+    backend = MemoryBackend(max_keys=2)
+    for key in "abc":
+        backend.hit(key, 1, 10, 100)
+    assert backend.hit("a", 1, 10, 101)
+    assert not backend.hit("c", 1, 10, 101)
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    path = str(tmp_path / "ratelimit.sqlite")
+    first = SQLiteBackend(path, max_keys=10, max_period=10)
+    second = SQLiteBackend(path, max_keys=10, max_period=10)
+    assert first.hit("k", 2, 10, 100)
+    assert second.hit("k", 2, 10, 101)
+    assert not first.hit("k", 2, 10, 102)
@@ -0,0 +1,121 @@
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from db import db
+from models import HabitModel
+from rollups import ROLLUP_MODELS, rollups
+from tests.conftest import auth_headers, make_habits, make_user
+from tests.test_identity import login
+
+DAY = date.today() - timedelta(days=3)
+
+
+def snapshot():
+    """Every rollup row with a non-zero counter, as plain tuples."""
+    rows = set()
+    for model in ROLLUP_MODELS:
+        table = model.__table__
+        counters = [column.name for column in table.columns if not column.primary_key]
+        for row in db.session.execute(select(table)).mappings():
+            if any(row[column] for column in counters):
+                rows.add((table.name,) + tuple(row.values()))
+    return rows
+
+
+def exercise(app, client, user):
+    other = make_user("other")
+    make_habits(other, 2)
+    rollups.habits_added()  # make_habits bypasses the API: count every habit in.
+    headers = auth_headers(user)
+
+    client.post("/habit", json={"name": "read", "checked": "No", "user_id": user.id}, headers=headers)
+    client.post("/habit/batch", json={"habits": [{"name": "run", "checked": "Yes"}, {"name": "read", "checked": "No"}]}, headers=headers)
+    for habit_id in (3, 4, 5):
+        client.post(f"/habit/{habit_id}/checkin", json={"day": DAY.isoformat()}, headers=headers)
+    client.post("/habit/3/checkin", json={"day": (DAY - timedelta(days=1)).isoformat()}, headers=headers)
+    client.delete(f"/habit/4/checkin?day={DAY.isoformat()}", headers=headers)
+    client.put("/habit/3", json={"name": "read more", "checked": "Yes"}, headers=headers)
+
+    app.config["HABIT_HISTORY_STORAGE"] = "bitmap"
+    login(app, client)
+    client.post("/dashboard/habits", data={"name": "stretch"})
+    client.post("/habit/6/checkin", json={"day": DAY.isoformat()}, headers=headers)
+    client.patch("/dashboard/habits/6")
+    client.patch("/dashboard/habits/4", json={"checked": "Yes"})
+    client.delete("/dashboard/habits/5")
+    client.put("/habit/batch", json={"habits": [{"id": 6, "name": "yoga"}]}, headers=headers)
+    return other
+
+
+def test_incremental_rollups_match_a_rebuild(app, client, user):
+    other = exercise(app, client, user)
+    client.delete(f"/user/{other.id}")
+
+    incremental = snapshot()
+    rollups.rebuild(chunk_size=1)
+    assert snapshot() == incremental
+    assert ("rollup_days", DAY, 1, 2) in incremental
+    assert ("rollup_habit_names", "yoga", 1, 1) in incremental
+
+
+def test_analytics_endpoints_read_the_rollups(app, client, user, count_queries):
+    exercise(app, client, user)
+    headers = auth_headers(user)
+
+    with count_queries() as counter:
+        days = client.get(
+            f"/analytics/days?start={(DAY - timedelta(days=1)).isoformat()}&end={DAY.isoformat()}",
+            headers=headers,
+        ).json
+    assert not any("FROM habits" in statement for statement in counter.statements)
+    assert days == [
+        {"day": (DAY - timedelta(days=1)).isoformat(), "active_users": 1, "completions": 1},
+        {"day": DAY.isoformat(), "active_users": 1, "completions": 2},
+    ]
+
+    completions = client.get(f"/analytics/completions?day={DAY.isoformat()}", headers=headers).json
+    assert completions == [{"name": "read more", "completions": 1}, {"name": "yoga", "completions": 1}]
+
+    names = client.get("/analytics/habit-names?limit=2", headers=headers).json
+    assert names == [
+        {"name": "habit 0", "habits": 1, "checked": 0},
+        {"name": "habit 1", "habits": 1, "checked": 0},
+    ]
+    assert client.get("/analytics/habits-per-user", headers=headers).json == [
+        {"habits": 2, "users": 1},
+        {"habits": 3, "users": 1},
+    ]
+    assert client.get("/analytics/days?start=2024-01-01&end=2023-01-01", headers=headers).status_code == 422
+
+
+def test_rebuild_rollups_command(app, user):
+    make_habits(user, 3, checked="Yes")
+    result = app.test_cli_runner().invoke(args=["rebuild-rollups"])
+    assert result.exit_code == 0, result.output
+    assert "1 users" in result.output
+    assert ("rollup_habits_per_user", 3, 1) in snapshot()
+
+
+def test_concurrent_writers_keep_habits_per_user(app, user):
+    # Two writers each insert a habit, and both commit before either counts
+    # its habit in: each must see the count its own change moved.
+    make_habits(user, 2)
+    rollups.habits_added(HabitModel.id == 1)
+    rollups.habits_added(HabitModel.id == 2)
+
+    incremental = snapshot()
+    rollups.rebuild()
+    assert snapshot() == incremental
+    assert ("rollup_habits_per_user", 2, 1) in incremental
+
+
+def test_dashboard_rejects_unknown_checked_values(app, client, user):
+    make_habits(user, 1)
+    rollups.habits_added()
+    login(app, client)
+    before = snapshot()
+    response = client.post("/dashboard", data={"habit_id": 1, "update": "", "checked": "Maybe"})
+    assert response.status_code == 400
+    assert db.session.get(HabitModel, 1).checked == "No"
+    assert snapshot() == before
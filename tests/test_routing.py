@@ -0,0 +1,92 @@
+import pytest
+from flask_jwt_extended import decode_token
+from sqlalchemy import text
+
+from app import create_app
+from db import db
+from models import HabitModel, TokenBlocklistModel
+from routing import read_routing
+from tests.conftest import auth_headers, make_habits, make_user
+
+
+@pytest.fixture
+def replicated(tmp_path):
+    app = create_app(
+        f"sqlite:///{tmp_path / 'primary.db'}",
+        {
+            # Multi-host setting: every token is checked against the table.
+            "BLOCKLIST_BLOOM_PATH": None,
+            "PASSWORD_HASH_WORKERS": 0,
+            "LOGIN_RATELIMIT_BACKEND": "memory",
+            "JOBS_WORKERS": 0,
+            "DATABASE_REPLICA_URLS": f"sqlite:///{tmp_path / 'replica.db'}",
+        },
+    )
+    app.testing = True
+    with app.app_context():
+        db.create_all()
+        user = make_user()
+        make_habits(user, 1)
+        headers = auth_headers(user)
+        db.session.remove()
+    result = app.test_cli_runner().invoke(args=["sync-replicas"])
+    assert "replica.db" in result.output
+    with app.app_context():
+        # A write the replica has not caught up with yet.
+        db.session.execute(text("UPDATE habits SET name = 'fresh'"))
+        db.session.commit()
+        db.session.remove()
+    return app, headers
+
+
+def test_get_reads_from_the_replica(replicated):
+    app, headers = replicated
+    client = app.test_client()
+    assert client.get("/habit/1", headers=headers).json["name"] == "habit 0"
+    # Outside a request, reads go to the primary.
+    with app.app_context():
+        assert db.session.execute(text("SELECT name FROM habits")).scalar() == "fresh"
+
+
+def test_writers_read_their_writes_until_the_window_ends(replicated):
+    app, headers = replicated
+    client = app.test_client()
+    response = client.put("/habit/1", json={"name": "mine", "checked": "No"}, headers=headers)
+    assert response.status_code == 200
+    assert "read_primary=1" in response.headers["Set-Cookie"]
+    assert client.get("/habit/1", headers=headers).json["name"] == "mine"
+
+    # Without the cookie the user is still remembered as a recent writer.
+    client.delete_cookie("read_primary")
+    assert client.get("/habit/1", headers=headers).json["name"] == "mine"
+
+    app.extensions["read_routing"].recent_writers.clear()
+    assert client.get("/habit/1", headers=headers).json["name"] == "habit 0"
+
+
+def test_revocations_are_checked_on_the_primary(replicated):
+    app, headers = replicated
+    client = app.test_client()
+    assert client.get("/habit/1", headers=headers).status_code == 200
+    with app.app_context():
+        token = headers["Authorization"].split()[1]
+        decoded = decode_token(token)
+        db.session.add(TokenBlocklistModel(jti=decoded["jti"], expires_at=decoded["exp"]))
+        db.session.commit()
+        db.session.remove()
+    assert client.get("/habit/1", headers=headers).status_code == 401
+
+
+def test_replica_is_read_only_and_locking_reads_use_the_primary(replicated):
+    app, _ = replicated
+    with app.test_request_context("/habit/1", method="GET"):
+        assert db.session.get(HabitModel, 1).name == "habit 0"
+        assert read_routing.reading_from_replica()
+        locked = db.session.get(HabitModel, 1, with_for_update=True, populate_existing=True)
+        assert locked.name == "fresh"
+        db.session.remove()
+
+    with app.app_context():
+        with pytest.raises(Exception, match="readonly"):
+            with db.engines["replica0"].begin() as conn:
+                conn.execute(text("DELETE FROM habits"))
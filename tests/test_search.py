@@ -0,0 +1,71 @@
+from db import db
+from models import HabitModel
+from tests.conftest import auth_headers, make_user
+
+NAMES = ["Bread baking", "Morning read", "Reading list", "Read", "Meditate", "Run"]
+
+
+def add_habits(user, names):
+    db.session.add_all(HabitModel(name=name, checked="No", user_id=user.id) for name in names)
+    db.session.commit()
+
+
+def search(client, user, q, **args):
+    response = client.get("/habit/search", query_string={"q": q, **args}, headers=auth_headers(user))
+    assert response.status_code == 200
+    return [habit["name"] for habit in response.json["habits"]], response.json["next"]
+
+
+def test_ranks_exact_prefix_word_and_substring_matches(client, user):
+    add_habits(user, NAMES)
+    assert search(client, user, "read")[0] == ["Read", "Reading list", "Morning read", "Bread baking"]
+    assert search(client, user, "RE")[0] == ["Read", "Reading list"]
+
+
+def test_tolerates_typos(app, client, user):
+    add_habits(user, NAMES)
+    assert search(client, user, "meditaet")[0] == ["Meditate"]
+    assert search(client, user, "raeding")[0] == ["Reading list"]
+    app.config["SEARCH_STAFF_USER_IDS"] = {user.id}
+    assert search(client, user, "meditaet", all_users="true")[0] == ["Meditate"]
+    assert search(client, user, "xyzzy")[0] == []
+
+
+def test_only_staff_search_other_accounts(app, client, user):
+    add_habits(user, ["Read"])
+    add_habits(make_user("other"), ["Read more"])
+    assert search(client, user, "read")[0] == ["Read"]
+    response = client.get(
+        "/habit/search", query_string={"q": "read", "all_users": "true"}, headers=auth_headers(user)
+    )
+    assert response.status_code == 403
+
+    app.config["SEARCH_STAFF_USER_IDS"] = {user.id}
+    assert search(client, user, "read", all_users="true")[0] == ["Read", "Read more"]
+
+
+def test_pages_through_ranked_results(client, user, count_queries):
+    add_habits(user, NAMES)
+    with count_queries() as counter:
+        first, cursor = search(client, user, "read", limit=3)
+    assert first == ["Read", "Reading list", "Morning read"]
+    # The ranked candidates, then the page's habits.
+    assert len([statement for statement in counter.statements if "FROM habits" in statement]) == 2
+    assert search(client, user, "read", limit=3, cursor=cursor) == (["Bread baking"], None)
+
+
+def test_index_follows_renames_and_deletes(client, user):
+    add_habits(user, ["Read", "Run"])
+    read = HabitModel.query.filter_by(name="Read").one()
+    response = client.put(
+        f"/habit/{read.id}", json={"name": "Swim", "checked": "No"}, headers=auth_headers(user)
+    )
+    assert response.status_code == 200
+    assert search(client, user, "read")[0] == []
+    assert search(client, user, "swim")[0] == ["Swim"]
+
+    client.delete(f"/habit/{read.id}", headers=auth_headers(user))
+    assert search(client, user, "swim")[0] == []
+    db.session.delete(user)
+    db.session.commit()
+    assert db.session.execute(db.text("SELECT count(*) FROM habits_search")).scalar() == 0
@@ -0,0 +1,99 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from marshmallow import fields, post_dump, pre_dump
+
+from serializers import CompiledSchema
+from schemas import (
+    HabitPageSchema,
+    HabitSchema,
+    HabitStatsSchema,
+    HabitYearSchema,
+    UserSchema,
+)
+from models import HabitModel, UserModel
+from tests.conftest import make_habits, make_user
+
+
+@pytest.fixture
+def plain(monkeypatch):
+    """Dump through marshmallow's own field-by-field path."""
+
+    def dump(schema, obj, many=None):
+        with monkeypatch.context() as patch:
+            patch.setattr(CompiledSchema, "compiled", False)
+            return schema.dump(obj, many=many)
+
+    return dump
+
+
+def test_habit_and_user_payloads_match(app, plain):
+    user = make_user()
+    make_habits(user, 3)
+    habits = HabitModel.query.all()
+    users = UserModel.query.all()
+
+    for schema, obj, many in (
+        (HabitSchema(), habits[0], None),
+        (HabitSchema(many=True), habits, None),
+        (UserSchema(), users[0], None),
+        (UserSchema(), users, True),
+        (HabitPageSchema(), {"habits": habits, "next": "abc"}, None),
+        (HabitPageSchema(), {"habits": [], "next": None}, None),
+    ):
+        assert schema.dump(obj, many=many) == plain(schema, obj, many)
+    assert list(HabitSchema().dump(habits[0])) == list(plain(HabitSchema(), habits[0]))
+
+
+def test_values_and_missing_attributes_match(plain):
+    stats = {
+        "id": "7",
+        "name": b"read",
+        "current_streak": 2.0,
+        "longest_streak": None,
+        "last_checkin": date(2024, 2, 29),
+        "completion_rate": 1,
+    }
+    year = SimpleNamespace(year=2024, total=3, weeks=[1, 2], heatmap=[[None, 1], [0, None]])
+
+    assert HabitStatsSchema().dump(stats) == plain(HabitStatsSchema(), stats)
+    assert HabitYearSchema().dump(year) == plain(HabitYearSchema(), year)
+    assert HabitSchema().dump(SimpleNamespace(id=1, user=None)) == {"id": 1, "user": None}
+    assert HabitSchema().dump(None, many=True) == plain(HabitSchema(), None, True)
+
+
+def test_fields_it_cannot_inline_fall_back(plain):
+    class Inner(CompiledSchema):
+        value = fields.Int()
+
+        @pre_dump
+        def double(self, obj, **kwargs):
+            return {"value": obj["value"] * 2}
+
+    class Outer(CompiledSchema):
+        renamed = fields.Str(attribute="name", data_key="label")
+        nested = fields.Nested(Inner)
+        dotted = fields.Int(attribute="inner.value")
+        constant = fields.Int(dump_default=5)
+        method = fields.Method("describe")
+        as_text = fields.Int(as_string=True)
+        when = fields.DateTime()
+
+        def describe(self, obj):
+            return obj["name"].upper()
+
+        @post_dump
+        def mark(self, data, **kwargs):
+            data["marked"] = True
+            return data
+
+    obj = {
+        "name": "x",
+        "nested": {"value": 2},
+        "inner": {"value": 3},
+        "as_text": 4,
+        "when": None,
+    }
+    assert Outer().dump(obj) == plain(Outer(), obj)
+    assert Outer().dump(obj)["nested"] == {"value": 4}
@@ -0,0 +1,76 @@
+import json
+import subprocess
+import sys
+
+from app import create_app
+from benchmarks.startup import parse_importtime
+
+
+def api_app(tmp_path, **config):
+    return create_app(
+        "sqlite:///:memory:",
+        {
+            "BLOCKLIST_BLOOM_PATH": str(tmp_path / "blocklist.bloom"),
+            "LOGIN_RATELIMIT_BACKEND": "memory",
+            "HTML_ENABLED": False,
+            "JOBS_WORKERS": 0,
+            **config,
+        },
+    )
+
+
+def test_api_only_app_has_no_html_pages_or_migrate(tmp_path):
+    app = api_app(tmp_path)
+    rules = {rule.rule for rule in app.url_map.iter_rules()}
+    assert "/login" in rules
+    assert "/login_user" not in rules and "/dashboard" not in rules
+    assert "login_manager" not in app.extensions
+    assert "migrate" not in app.extensions
+
+    assert "migrate" in api_app(tmp_path, MIGRATE_ENABLED=True).extensions
+
+
+def test_api_only_app_does_not_import_flask_login():
+    script = (
+        "import sys; from app import create_app; "
+        "create_app('sqlite:///:memory:', {'HTML_ENABLED': False, 'JOBS_WORKERS': 0, "
+        "'BLOCKLIST_BLOOM_PATH': None, 'LOGIN_RATELIMIT_BACKEND': 'memory'}); "
+        "print('flask_login' in sys.modules)"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_openapi_document_is_built_on_first_request(tmp_path):
+    app = api_app(tmp_path)
+    api = app.extensions["flask-smorest"]["apis"][""]["ext_obj"]
+    assert api._spec is None
+
+    client = app.test_client()
+    document = client.get("/openapi.json").json
+    assert "/habit/{habit_id}" in document["paths"]
+    assert [tag["name"] for tag in document["tags"]] == ["Habits", "Users", "Export", "Analytics", "Jobs"]
+    assert api._spec_json is not None
+    assert client.get("/openapi.json").json == document
+
+
+def test_openapi_document_served_from_file(tmp_path):
+    path = tmp_path / "openapi.json"
+    path.write_text(json.dumps({"openapi": "3.0.3", "paths": {}}))
+    app = api_app(tmp_path, OPENAPI_SPEC_FILE=str(path))
+
+    assert app.test_client().get("/openapi.json").json == {"openapi": "3.0.3", "paths": {}}
+    assert app.extensions["flask-smorest"]["apis"][""]["ext_obj"]._spec is None
+
+
+def test_parse_importtime_sums_self_time_per_package():
+    stderr = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |     sqlalchemy.util",
+            "import time:       250 |        350 |   sqlalchemy",
+            "import time:        40 |         40 | app",
+            "unrelated warning",
+        ]
+    )
+    assert parse_importtime(stderr) == {"sqlalchemy": 350, "app": 40}
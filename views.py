@@ -0,0 +1,191 @@
+"""
+views.py
+
+The server-rendered pages (login, register, dashboard) and the Flask-Login /
+Flask-WTF stack they need. Only imported by ``create_app`` when
+``HTML_ENABLED`` is set, so API-only deployments never load them.
+"""
+
+from flask import render_template, url_for, redirect, session, request, flash, jsonify
+from flask_jwt_extended import create_access_token
+from flask_login import login_user, LoginManager, login_required, logout_user, current_user
+from flask_smorest import abort
+from flask_wtf.csrf import generate_csrf, validate_csrf
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from wtforms.validators import ValidationError
+
+from accounts import audit
+from dashboard_cache import dashboard_cache
+from db import db
+from forms import LoginForm, RegisterForm
+from identity import CachedUser, identity_cache
+from models import UserModel, HabitModel
+from passwords import passwords
+from ratelimit import login_limiter
+from schemas import PlainHabitSchema
+from resources.user import verify_password
+from rollups import rollups
+
+
+def init_views(app):
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.login_view = "login"
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        user = identity_cache.load(user_id)
+        if user is None:
+            abort(404)
+        return user
+
+    @app.route("/")
+    def base():
+        return redirect(url_for('loginUser'))
+
+    @app.route('/register_user', methods=["GET","POST"])
+    def registerUser():
+        form = RegisterForm()
+        if form.validate_on_submit():
+            hashed_pwd = passwords.hash(form.pwd.data)
+            user = UserModel(username = form.username.data, pwd = hashed_pwd)
+            try:
+                db.session.add(user)
+                db.session.commit()
+            except IntegrityError:
+                abort(400, message="User with that name alredy exists.")
+            except SQLAlchemyError:
+                abort(500, message="Cant add user.")
+            app.logger.info("Registered user %s", user.id)
+            return redirect(url_for('loginUser'))
+        return render_template("register_page.html", form=form)
+
+    @app.route('/login_user', methods=["GET","POST"])
+    def loginUser():
+        form = LoginForm()
+        if form.validate_on_submit():
+            if login_limiter.retry_after(form.username.data, request.remote_addr):
+                flash("Too many login attempts, try again later.")
+                return render_template('login_page.html', form=form), 429
+            user = UserModel.query.filter(UserModel.username == form.username.data).first()
+            if user and verify_password(user, form.pwd.data):
+                audit("login", user.id)
+                db.session.commit()
+                login_user(CachedUser(user.id, user.username))
+                app.logger.debug("User %s logged in", user.id)
+                session['access_token'] = create_access_token(identity=user.id)
+                return redirect(url_for('dashboard'))
+        return render_template('login_page.html', form=form)
+
+    def is_logged_in():
+        return 'access_token' in session
+
+    @app.route('/dashboard', methods=['GET', 'POST'])
+    def dashboard():
+        if is_logged_in():
+            user_name = current_user.username
+            user_id = current_user.id
+
+            if request.method == 'POST':
+                habit_id = request.form.get('habit_id', type=int)
+                if 'delete' in request.form:
+                    rollups.habits_removed(HabitModel.id == habit_id, HabitModel.user_id == user_id)
+                    HabitModel.delete_owned([habit_id], user_id)
+                    db.session.commit()
+
+                elif 'update' in request.form:
+                    checked = request.form.get('checked')
+                    if checked not in (None, 'Yes', 'No'):
+                        abort(400, message="checked must be Yes or No.")
+                    row = HabitModel.set_checked(habit_id, user_id, checked)
+                    if row is not None:
+                        rollups.checked(row.name, row.checked)
+                    db.session.commit()
+
+                elif 'add' in request.form:
+                    row = HabitModel.create(user_id, request.form.get('habit_name'))
+                    rollups.habits_added(HabitModel.id == row.id)
+                    db.session.commit()
+
+                dashboard_cache.invalidate(user_id)
+                return redirect(url_for('dashboard'))
+
+            habit_table = dashboard_cache.habit_table(
+                user_id,
+                lambda: render_template(
+                    'habit_table.html', habits=HabitModel.query.filter_by(user_id=user_id).all()
+                ),
+            )
+            return render_template(
+                'dashboard.html', habit_table=habit_table, user_name=user_name, csrf_token=generate_csrf()
+            )
+        else:
+            return redirect(url_for('loginUser'))
+
+    # Used by static/dashboard.js: each change is one statement and the
+    # response is just the affected row (HTML, or JSON when asked for).
+    def fragment_user():
+        if not is_logged_in():
+            abort(401, message="Not logged in.")
+        if app.config.get("WTF_CSRF_ENABLED", True):
+            try:
+                validate_csrf(request.headers.get("X-CSRFToken"))
+            except ValidationError:
+                abort(400, message="Invalid CSRF token.")
+        return current_user.id
+
+    def habit_row(row, status=200):
+        if request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json":
+            return jsonify(PlainHabitSchema().dump(row._asdict())), status
+        return render_template('habit_row.html', habit=row), status
+
+    @app.route('/dashboard/habits', methods=['POST'])
+    def dashboard_add_habit():
+        user_id = fragment_user()
+        data = request.get_json(silent=True) or request.form
+        name = (data.get('name') or data.get('habit_name') or '').strip()
+        if not 0 < len(name) <= 80:
+            abort(400, message="Habit name must be 1 to 80 characters.")
+        row = HabitModel.create(user_id, name)
+        rollups.habits_added(HabitModel.id == row.id)
+        db.session.commit()
+        dashboard_cache.invalidate(user_id)
+        return habit_row(row, 201)
+
+    @app.route('/dashboard/habits/<int:habit_id>', methods=['PATCH', 'DELETE'])
+    def dashboard_habit(habit_id):
+        user_id = fragment_user()
+        if request.method == 'DELETE':
+            rollups.habits_removed(HabitModel.id == habit_id, HabitModel.user_id == user_id)
+            deleted = HabitModel.delete_owned([habit_id], user_id)
+            db.session.commit()
+            if not deleted:
+                abort(404, message="Habit not found.")
+            dashboard_cache.invalidate(user_id)
+            return '', 204
+
+        data = request.get_json(silent=True) or request.form
+        checked = data.get('checked')
+        if checked not in (None, 'Yes', 'No'):
+            abort(400, message="checked must be Yes or No.")
+        # Without a value the habit is toggled.
+        row = HabitModel.set_checked(habit_id, user_id, checked)
+        if row is None:
+            # Not owned, or already set to ``checked``.
+            row = HabitModel.owned_row(habit_id, user_id)
+            if row is None:
+                abort(404, message="Habit not found.")
+            return habit_row(row)
+        rollups.checked(row.name, row.checked)
+        db.session.commit()
+        dashboard_cache.invalidate(user_id)
+        return habit_row(row)
+
+    @app.route('/logout', methods=['GET', 'POST'])
+    @login_required
+    def logout_button():
+        audit("logout", current_user.id)
+        db.session.commit()
+        logout_user()
+        session.pop('access_token', None)
+        return redirect(url_for('loginUser'))